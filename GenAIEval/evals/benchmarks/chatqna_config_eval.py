@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Config-Driven ChatQnA Evaluation Script
+This script runs the test suite of a chatqna_eval_config.yaml-style file against a ChatQnA service.
+
+Every user_queries entry becomes one run of that many queries at the constant load shape's
+concurrent_level, bounded by query_timeout per query and run_time per run. Prompt selection
+is seeded, so the same config sends the same queries in the same order, and all runs end up
+in one consolidated report.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import yaml
+
+from chatqna_simple_eval import ChatQnAEvaluator, aiohttp
+from result_store import record_run
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatqna_eval_config.yaml")
+
+
+def parse_duration(value) -> float | None:
+    """Seconds of a run_time value such as 90, "30s", "10m" or "1h"; None when unset"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*", str(value))
+    if not match:
+        raise ValueError(f"Invalid run_time: {value!r}")
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
+def load_config(path: str) -> Dict[str, Any]:
+    """Read a config file and resolve the settings the runner uses"""
+    with open(path) as f:
+        config = yaml.safe_load(f)
+
+    suite = config.get("test_suite_config", {})
+    e2e = config.get("test_cases", {}).get("chatqna", {}).get("e2e", {})
+
+    load_shape = suite.get("load_shape") or {"name": "constant"}
+    if load_shape.get("name", "constant") != "constant":
+        raise ValueError(f"Unsupported load shape: {load_shape['name']} (only constant is supported)")
+    constant = (load_shape.get("params") or {}).get("constant") or {}
+
+    prompts = e2e.get("prompts") or ""
+    if isinstance(prompts, str):
+        prompts = [line.strip() for line in prompts.splitlines() if line.strip()]
+
+    return {
+        "service_url": f"http://{suite.get('service_ip', 'localhost')}:{suite.get('service_port', 8888)}",
+        "warm_ups": int(suite.get("warm_ups") or 0),
+        "user_queries": list(suite.get("user_queries") or [len(prompts)]),
+        "concurrency": int(constant.get("concurrent_level") or 1),
+        "run_time": parse_duration(suite.get("run_time")),
+        "seed": suite.get("seed"),
+        "query_timeout": int(suite.get("query_timeout") or 120),
+        "random_prompt": bool(suite.get("random_prompt", False)),
+        "test_output_dir": suite.get("test_output_dir"),
+        "run_test": bool(e2e.get("run_test", True)),
+        "prompts": prompts,
+        "max_output": e2e.get("max_output"),
+        "llm_model": suite.get("llm_model"),
+        "raw": config,
+    }
+
+
+def select_queries(prompts: List[str], count: int, rng: random.Random, random_prompt: bool) -> List[str]:
+    """`count` queries from the prompts, cycled in order or sampled with the seeded rng"""
+    if random_prompt:
+        return [rng.choice(prompts) for _ in range(count)]
+    return [prompts[i % len(prompts)] for i in range(count)]
+
+
+def run_suite(config_path: str, output_file: str | None = None, wait_for_service: bool = True,
+              service_url: str | None = None, results_db: str | None = None,
+              run_label: str | None = None) -> Dict[str, Any]:
+    """Run every user_queries entry of the config and write one consolidated report
+
+    With results_db every run is also appended to that result store.
+    """
+    settings = load_config(config_path)
+    if not settings["run_test"]:
+        print("⚠️  test_cases.chatqna.e2e.run_test is false, nothing to run")
+        return {"error": "run_test disabled"}
+    if not settings["prompts"]:
+        print("❌ No prompts configured in test_cases.chatqna.e2e.prompts")
+        return {"error": "No prompts"}
+
+    evaluator = ChatQnAEvaluator(service_url or settings["service_url"], pool_size=max(10, settings["concurrency"]),
+                                 max_tokens=settings["max_output"], tokenizer_model=settings["llm_model"])
+    concurrency = settings["concurrency"]
+    if concurrency > 1 and aiohttp is None:
+        print("⚠️  aiohttp is not installed, falling back to sequential queries (pip install aiohttp)")
+        concurrency = 1
+    rng = random.Random(settings["seed"])
+
+    print(f"🚀 Running test suite {config_path}")
+    print(f"Service URL: {evaluator.service_url}")
+    print(f"Runs: {settings['user_queries']} queries at concurrency {concurrency}, "
+          f"run_time {settings['run_time'] or 'unbounded'}s, seed {settings['seed']}")
+
+    if wait_for_service and not evaluator.wait_for_service():
+        print("❌ Cannot proceed with evaluation - service is not ready")
+        return {"error": "Service not ready"}
+
+    if concurrency > 1:
+        warmup, runs = asyncio.run(run_all_async(evaluator, settings, concurrency, rng, results_db, run_label))
+    else:
+        warmup = None
+        if settings["warm_ups"] > 0:
+            warmup = evaluator.run_warmup(settings["prompts"], settings["warm_ups"], settings["query_timeout"])
+        runs = []
+        for user_queries in settings["user_queries"]:
+            queries = select_queries(settings["prompts"], int(user_queries), rng, settings["random_prompt"])
+            print(f"\n▶️  Run with {len(queries)} queries (concurrency={concurrency})")
+            run_start = time.perf_counter()
+            deadline = run_start + settings["run_time"] if settings["run_time"] else None
+            results = evaluator.run_queries(queries, settings["query_timeout"], deadline)
+            runs.append(finish_run(evaluator, settings, queries, results, time.perf_counter() - run_start,
+                                   concurrency, results_db, run_label))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config_file": os.path.abspath(config_path),
+        "service_url": evaluator.service_url,
+        "settings": {key: value for key, value in settings.items() if key not in ("raw", "prompts")},
+        "readiness": evaluator.readiness,
+        "warmup": warmup,
+        "runs": runs
+    }
+
+    if output_file is None and settings["test_output_dir"]:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(settings["test_output_dir"], f"chatqna_suite_{stamp}.json")
+    if output_file:
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {output_file}")
+
+    print_suite_summary(runs)
+    return report
+
+
+async def run_all_async(evaluator: ChatQnAEvaluator, settings: Dict[str, Any], concurrency: int,
+                        rng: random.Random, results_db: str | None, run_label: str | None):
+    """Warm-up and every run over one aiohttp session; returns the warm-up report and the runs
+
+    The measured runs start on the connections the warm-up opened, as in
+    ChatQnAEvaluator.run_evaluation, rather than on a cold pool each.
+    """
+    async with evaluator.aiohttp_session(concurrency) as session:
+        warmup = None
+        if settings["warm_ups"] > 0:
+            warmup = await evaluator.run_warmup_async(settings["prompts"], settings["warm_ups"],
+                                                      settings["query_timeout"], concurrency=concurrency,
+                                                      session=session)
+        runs = []
+        for user_queries in settings["user_queries"]:
+            queries = select_queries(settings["prompts"], int(user_queries), rng, settings["random_prompt"])
+            print(f"\n▶️  Run with {len(queries)} queries (concurrency={concurrency})")
+            run_start = time.perf_counter()
+            deadline = run_start + settings["run_time"] if settings["run_time"] else None
+            results = await evaluator.run_queries_async(queries, concurrency, settings["query_timeout"], deadline,
+                                                        session=session)
+            runs.append(finish_run(evaluator, settings, queries, results, time.perf_counter() - run_start,
+                                   concurrency, results_db, run_label))
+        return warmup, runs
+
+
+def finish_run(evaluator: ChatQnAEvaluator, settings: Dict[str, Any], queries: List[str],
+               results: List[Dict[str, Any]], duration: float, concurrency: int,
+               results_db: str | None, run_label: str | None) -> Dict[str, Any]:
+    """Evaluate, store and print one run of the suite"""
+    evaluation = evaluator.evaluate_responses(results, duration)
+    successful = evaluation.get("successful_queries", 0)
+    run = {
+        "user_queries": len(queries),
+        "concurrency": concurrency,
+        "queries_sent": len(results),
+        "queries_skipped": len(queries) - len(results),
+        "duration": duration,
+        "throughput_qps": successful / duration if duration > 0 else 0,
+        "evaluation_summary": evaluation,
+        "detailed_results": results
+    }
+    record_run(results_db, results, tool="chatqna_config_eval", test="suite",
+               service_url=evaluator.service_url, label=run_label, concurrency=concurrency, duration=duration,
+               settings={key: value for key, value in settings.items() if key not in ("raw", "prompts")},
+               summary={key: value for key, value in evaluation.items() if key != "distributions"})
+    if len(results) < len(queries):
+        print(f"⏱️  run_time reached, {len(queries) - len(results)} queries not sent")
+    evaluator.print_summary(evaluation)
+    return run
+
+
+def print_suite_summary(runs: List[Dict[str, Any]]):
+    """One line per run of the suite"""
+    print("\n" + "="*96)
+    print("TEST SUITE SUMMARY")
+    print("="*96)
+    print(f"{'queries':>8} {'sent':>6} {'success':>8} {'qps':>7} {'mean s':>8} {'p99 s':>8} "
+          f"{'TTFT p50 ms':>12} {'TTFT p99 ms':>12} {'out tok/s':>10} {'goodput':>8}")
+    for run in runs:
+        summary = run["evaluation_summary"]
+        if "error" in summary:
+            print(f"{run['user_queries']:>8} {run['queries_sent']:>6}   {summary['error']}")
+            continue
+        # Like format_token_summary: goodput is None without timings, the aggregate rate without a duration
+        tokens = summary["token_stats"]
+        rate = tokens["aggregate_output_tokens_per_second"]
+        rate = f"{rate:>10.1f}" if rate is not None else f"{'n/a':>10}"
+        good = tokens["goodput"]
+        goodput = f"{good['fraction'] * 100:>7.1f}%" if good else f"{'n/a':>8}"
+        print(f"{run['user_queries']:>8} {run['queries_sent']:>6} {summary['success_rate']:>7.1f}% "
+              f"{run['throughput_qps']:>7.2f} {summary['response_time_stats']['mean']:>8.2f} "
+              f"{summary['stream_time_stats']['p99']:>8.2f} {summary['ttft_stats']['p50'] * 1000:>12.1f} "
+              f"{summary['ttft_stats']['p99'] * 1000:>12.1f} {rate} {goodput}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Config-driven ChatQnA Evaluation")
+    parser.add_argument("--config", default=DEFAULT_CONFIG,
+                       help="Test suite config file (chatqna_eval_config.yaml format)")
+    parser.add_argument("--output", default=None,
+                       help="Output file for the consolidated report (default: test_output_dir of the config)")
+    parser.add_argument("--service-url", default=None,
+                       help="Override the service_ip/service_port of the config")
+    parser.add_argument("--no-wait", action="store_true",
+                       help="Don't wait for service to be ready")
+    parser.add_argument("--results-db", default=os.environ.get("OPEA_EVAL_RESULTS_DB"),
+                       help="Also append every run to this result store (default: $OPEA_EVAL_RESULTS_DB)")
+    parser.add_argument("--run-label", default=None,
+                       help="Label of the runs in the result store, e.g. an image tag")
+
+    args = parser.parse_args()
+    run_suite(args.config, args.output, not args.no_wait, args.service_url, args.results_db, args.run_label)
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,6 @@ Lightweight ChatQnA Evaluation Script
 This script evaluates a ChatQnA service with shorter timeouts and simpler queries for quick testing.
 """
 
-import requests
 import json
 import time
 import statistics
@@ -13,40 +12,36 @@ import argparse
 from datetime import datetime
 import os
 
+from eval_stats import format_stats, report_stats
+from http_session import PooledSession, connection_stats, drain
+from readiness import ReadinessProbe, default_checks, print_readiness
+from result_store import record_run
+from sse_decoder import SSEStreamDecoder
+from token_metrics import TokenCounter, default_model, format_token_summary, token_summary
+
 class LightweightChatQnAEvaluator:
-    def __init__(self, service_url: str = "http://localhost:8888"):
+    def __init__(self, service_url: str = "http://localhost:8888", pool_size: int = 4,
+                 keep_alive: bool = True, retries: int = 3, retry_backoff: float = 0.5,
+                 readiness_services: List[str] | None = None, tokenizer_model: str | None = None):
         self.service_url = service_url
+        self.tokenizer_model = tokenizer_model
         self.results = []
+        self.readiness_services = readiness_services
+        self.readiness = {}
+        self.session = PooledSession(pool_size, keep_alive, retries, retry_backoff)
         
     def wait_for_service(self, max_wait_time: int = 60) -> bool:
-        """Wait for the ChatQnA service to be ready (shorter timeout)"""
-        print(f"Waiting for ChatQnA service to be ready (max {max_wait_time}s)...")
+        """Wait for the ChatQnA microservices to be ready, probing their health endpoints"""
+        checks = default_checks(self.service_url, session=self.session)
+        if self.readiness_services:
+            checks = [check for check in checks if check.name in self.readiness_services]
+        print(f"Waiting for {len(checks)} ChatQnA services to be ready (max {max_wait_time}s)...")
         
-        start_time = time.time()
-        while time.time() - start_time < max_wait_time:
-            try:
-                response = requests.post(
-                    f"{self.service_url}/v1/chatqna",
-                    headers={"Content-Type": "application/json"},
-                    json={"messages": "test"},
-                    timeout=5  # Shorter timeout
-                )
-                
-                if response.status_code == 200:
-                    print("✅ ChatQnA service is ready!")
-                    return True
-                elif response.status_code == 500:
-                    # Service is running but model is still warming up
-                    print("⏳ Service is running, waiting for model to warm up...")
-                    time.sleep(10)  # Shorter wait
-                    continue
-                else:
-                    print(f"⚠️  Service returned status {response.status_code}")
-                    time.sleep(5)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"⏳ Service not ready yet: {e}")
-                time.sleep(5)
+        self.readiness = ReadinessProbe(checks).wait(max_wait_time)
+        print_readiness(self.readiness)
+        if all(result["ready"] for result in self.readiness.values()):
+            print("✅ ChatQnA service is ready!")
+            return True
                 
         print("❌ Service did not become ready within the timeout period")
         return False
@@ -60,7 +55,7 @@ class LightweightChatQnAEvaluator:
                 "messages": query
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.service_url}/v1/chatqna",
                 headers={"Content-Type": "application/json"},
                 json=payload,
@@ -73,28 +68,25 @@ class LightweightChatQnAEvaluator:
             
             if response.status_code == 200:
                 # Handle Server-Sent Events (SSE) response
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        line_str = line.decode('utf-8')
-                        if line_str.startswith('data: '):
-                            data = line_str[6:]  # Remove 'data: ' prefix
-                            if data == '[DONE]':
-                                break
-                            elif data and data != '':
-                                try:
-                                    import base64
-                                    decoded = base64.b64decode(data).decode('utf-8')
-                                    full_response += decoded
-                                except:
-                                    full_response += data
+                decoder = SSEStreamDecoder()
+                lines = response.iter_lines()
+                output_chunks = 0
+                for line in lines:
+                    if decoder.feed_line(line) is not None:
+                        output_chunks += 1
+                    if decoder.done:
+                        break
+                drain(lines)
                 
                 return {
                     "query": query,
-                    "response": full_response,
-                    "response_time": response_time,
+                    "response": decoder.text,
+                    # Until the end of the stream, so tokens/s covers the whole answer
+                    "response_time": time.time() - start_time,
                     "status": "success",
-                    "status_code": response.status_code
+                    "status_code": response.status_code,
+                    "connection_reused": response.connection_reused,
+                    "output_chunks": output_chunks
                 }
             else:
                 return {
@@ -103,6 +95,7 @@ class LightweightChatQnAEvaluator:
                     "response_time": response_time,
                     "status": "error",
                     "status_code": response.status_code,
+                    "connection_reused": response.connection_reused,
                     "error": response.text
                 }
                 
@@ -115,8 +108,9 @@ class LightweightChatQnAEvaluator:
                 "error": str(e)
             }
     
-    def run_quick_test(self, output_file: str | None = None) -> Dict[str, Any]:
-        """Run a quick test with simple queries"""
+    def run_quick_test(self, output_file: str | None = None, results_db: str | None = None,
+                       run_label: str | None = None) -> Dict[str, Any]:
+        """Run a quick test with simple queries, appended to the result store results_db if set"""
         print("🚀 Starting lightweight ChatQnA evaluation...")
         print(f"Service URL: {self.service_url}")
         
@@ -134,6 +128,7 @@ class LightweightChatQnAEvaluator:
             return {"error": "Service not ready"}
         
         results = []
+        run_start = time.time()
         
         for i, query in enumerate(test_queries, 1):
             print(f"Query {i}/{len(test_queries)}: {query}")
@@ -146,7 +141,10 @@ class LightweightChatQnAEvaluator:
             else:
                 print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
         
-        # Calculate basic metrics
+        duration = time.time() - run_start
+        
+        # Calculate basic metrics; token counts are added to the results before the distributions
+        tokens = token_summary(results, TokenCounter(self.tokenizer_model), duration)
         successful_results = [r for r in results if r["status"] == "success"]
         success_rate = len(successful_results) / len(results) * 100 if results else 0
         
@@ -167,8 +165,12 @@ class LightweightChatQnAEvaluator:
                 "successful_queries": len(successful_results),
                 "success_rate": success_rate,
                 "avg_response_time": avg_response_time,
-                "avg_response_length": avg_response_length
+                "avg_response_length": avg_response_length,
+                "connection_stats": connection_stats(results),
+                "token_stats": tokens,
+                "distributions": report_stats(results)
             },
+            "readiness": self.readiness,
             "detailed_results": results
         }
         
@@ -179,6 +181,10 @@ class LightweightChatQnAEvaluator:
                 json.dump(report, f, indent=2)
             print(f"\nResults saved to: {output_file}")
         
+        summary = {key: value for key, value in report["evaluation_summary"].items() if key != "distributions"}
+        record_run(results_db, results, tool="chatqna_lightweight_eval", test="quick_test",
+                   service_url=self.service_url, label=run_label, concurrency=1, duration=duration, summary=summary)
+        
         # Print summary
         print(f"\n📊 Quick Test Results:")
         print(f"  Total Queries: {len(results)}")
@@ -186,6 +192,12 @@ class LightweightChatQnAEvaluator:
         print(f"  Success Rate: {success_rate:.1f}%")
         print(f"  Avg Response Time: {avg_response_time:.2f}s")
         print(f"  Avg Response Length: {avg_response_length:.0f} chars")
+        if successful_results:
+            print(f"  {format_stats('Latency', report['evaluation_summary']['distributions']['latency'], 's')}")
+            for line in format_token_summary(tokens):
+                print(f"  {line}")
+        conn = report["evaluation_summary"]["connection_stats"]
+        print(f"  Reused Connections: {conn['reused']}/{conn['requests']}")
         
         return report
 
@@ -195,11 +207,29 @@ def main():
                        help="ChatQnA service URL")
     parser.add_argument("--output", default="/home/yw/Desktop/OPEA/evaluation_results/chatqna_quick_test.json",
                        help="Output file path")
+    parser.add_argument("--readiness-services", nargs="+",
+                       help="Only wait for these services (chatqna-backend, tei-embedding, tei-reranking, "
+                            "retriever, dataprep, redis, vllm/tgi)")
+    parser.add_argument("--pool-size", type=int, default=4,
+                       help="Maximum number of pooled keep-alive connections")
+    parser.add_argument("--no-keep-alive", action="store_true",
+                       help="Open a new connection for every request")
+    parser.add_argument("--retries", type=int, default=3,
+                       help="Retries on connection errors and 502/503/504 responses")
+    parser.add_argument("--tokenizer-model", default=default_model(),
+                       help="Model whose tokenizer counts tokens (default: $LLM_MODEL; none counts streamed chunks)")
+    parser.add_argument("--results-db", default=os.environ.get("OPEA_EVAL_RESULTS_DB"),
+                       help="Also append the run to this result store (default: $OPEA_EVAL_RESULTS_DB)")
+    parser.add_argument("--run-label", default=None,
+                       help="Label of the run in the result store, e.g. an image tag")
     
     args = parser.parse_args()
     
-    evaluator = LightweightChatQnAEvaluator(args.service_url)
-    evaluator.run_quick_test(args.output)
+    evaluator = LightweightChatQnAEvaluator(args.service_url, pool_size=args.pool_size,
+                                            keep_alive=not args.no_keep_alive, retries=args.retries,
+                                            readiness_services=args.readiness_services,
+                                            tokenizer_model=args.tokenizer_model)
+    evaluator.run_quick_test(args.output, args.results_db, args.run_label)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,7 +4,7 @@ Simple ChatQnA Evaluation Script
 This script evaluates a ChatQnA service by sending test queries and measuring response quality.
 """
 
-import requests
+import asyncio
 import json
 import time
 import statistics
@@ -13,98 +13,183 @@ import argparse
 from datetime import datetime
 import os
 
+from eval_stats import describe, format_stats, report_stats
+from http_session import RETRY_STATUSES, PooledSession, aiohttp_trace_config, connection_stats, drain
+from readiness import ReadinessProbe, default_checks, print_readiness
+from result_store import record_run
+from sse_decoder import SSEStreamDecoder
+from token_metrics import (DEFAULT_TPOT_SLO, DEFAULT_TTFT_SLO, TokenCounter, default_model, format_token_summary,
+                           token_summary)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+def stream_timing(start: float, chunk_times: List[float], end: float) -> Dict[str, Any]:
+    """Derive streaming latency metrics from the arrival time of each SSE data chunk.
+
+    All timestamps are time.perf_counter() values; every data chunk counts as one output token.
+    """
+    ttft = chunk_times[0] - start if chunk_times else end - start
+    inter_token_latencies = [b - a for a, b in zip(chunk_times, chunk_times[1:])]
+    tpot = (chunk_times[-1] - chunk_times[0]) / (len(chunk_times) - 1) if len(chunk_times) > 1 else 0
+    return {
+        "ttft": ttft,
+        "tpot": tpot,
+        "inter_token_latencies": inter_token_latencies,
+        "output_chunks": len(chunk_times),
+        "stream_time": end - start
+    }
+
+
+class WarmupMonitor:
+    """Tracks whether the warm-up latencies converged
+
+    After the first `warm_ups` queries, warming continues while the coefficient of variation
+    (std / mean) of the latest response times is above cv_threshold, up to max_warm_ups queries
+    (default 3 * warm_ups).
+    """
+
+    def __init__(self, warm_ups: int, cv_threshold: float = 0.1, max_warm_ups: int | None = None):
+        self.warm_ups = warm_ups
+        self.max_warm_ups = max(warm_ups, max_warm_ups or 3 * warm_ups)
+        self.cv_threshold = cv_threshold
+        self.window = max(2, min(warm_ups, 5))
+        self.results = []
+        self.response_times = []
+        self.cv = None
+        self.converged = False
+
+    @property
+    def done(self) -> bool:
+        return self.converged or len(self.results) >= self.max_warm_ups
+
+    def add(self, result: Dict[str, Any]):
+        self.results.append(result)
+        if result["status"] != "success":
+            print(f"  Warm-up {len(self.results)}: failed ({result.get('error', 'Unknown error')})")
+            return
+
+        self.response_times.append(result["response_time"])
+        recent = self.response_times[-self.window:]
+        if len(recent) == self.window:
+            self.cv = statistics.stdev(recent) / statistics.mean(recent)
+        cv_text = f"cv {self.cv:.3f}" if self.cv is not None else "cv n/a"
+        print(f"  Warm-up {len(self.results)}: {result['response_time']:.2f}s ({cv_text})")
+        if len(self.results) >= self.warm_ups and self.cv is not None and self.cv <= self.cv_threshold:
+            self.converged = True
+
+    def report(self) -> Dict[str, Any]:
+        if self.converged:
+            print(f"✅ Warm-up converged after {len(self.results)} queries")
+        else:
+            print(f"⚠️  Warm-up did not converge after {len(self.results)} queries, latencies may still drift")
+
+        return {
+            "queries": len(self.results),
+            "converged": self.converged,
+            "cv": self.cv,
+            "cv_threshold": self.cv_threshold,
+            "response_time_stats": describe(self.response_times),
+            "ttft_stats": describe([r["ttft"] for r in self.results if r["status"] == "success"]),
+            "results": self.results
+        }
+
+
 class ChatQnAEvaluator:
-    def __init__(self, service_url: str = "http://localhost:8888"):
+    def __init__(self, service_url: str = "http://localhost:8888", pool_size: int = 10,
+                 keep_alive: bool = True, retries: int = 3, retry_backoff: float = 0.5,
+                 readiness_services: List[str] | None = None, max_tokens: int | None = None,
+                 tokenizer_model: str | None = None, ttft_slo: float = DEFAULT_TTFT_SLO,
+                 tpot_slo: float = DEFAULT_TPOT_SLO):
         self.service_url = service_url
+        self.max_tokens = max_tokens
+        self.tokenizer_model = tokenizer_model
+        self.ttft_slo = ttft_slo
+        self.tpot_slo = tpot_slo
+        # Loaded on the first evaluation, then reused for the rest of the run
+        self.token_counter = None
         self.results = []
+        self.readiness_services = readiness_services
+        self.readiness = {}
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.session = PooledSession(pool_size, keep_alive, retries, retry_backoff)
         
     def wait_for_service(self, max_wait_time: int = 300) -> bool:
-        """Wait for the ChatQnA service to be ready"""
-        print(f"Waiting for ChatQnA service to be ready (max {max_wait_time}s)...")
+        """Wait for the ChatQnA microservices to be ready, probing their health endpoints"""
+        checks = default_checks(self.service_url, session=self.session)
+        if self.readiness_services:
+            checks = [check for check in checks if check.name in self.readiness_services]
+        print(f"Waiting for {len(checks)} ChatQnA services to be ready (max {max_wait_time}s)...")
         
-        start_time = time.time()
-        while time.time() - start_time < max_wait_time:
-            try:
-                response = requests.post(
-                    f"{self.service_url}/v1/chatqna",
-                    headers={"Content-Type": "application/json"},
-                    json={"messages": "test"},
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    print("✅ ChatQnA service is ready!")
-                    return True
-                elif response.status_code == 500:
-                    # Service is running but model is still warming up
-                    print("⏳ Service is running, waiting for model to warm up...")
-                    time.sleep(30)
-                    continue
-                else:
-                    print(f"⚠️  Service returned status {response.status_code}")
-                    time.sleep(10)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"⏳ Service not ready yet: {e}")
-                time.sleep(10)
+        self.readiness = ReadinessProbe(checks).wait(max_wait_time)
+        print_readiness(self.readiness)
+        if all(result["ready"] for result in self.readiness.values()):
+            print("✅ ChatQnA service is ready!")
+            return True
                 
         print("❌ Service did not become ready within the timeout period")
         return False
         
-    def test_query(self, query: str) -> Dict[str, Any]:
+    def build_payload(self, query: str) -> Dict[str, Any]:
+        """Request body of a query; max_tokens is only sent when configured"""
+        payload = {"messages": query}
+        if self.max_tokens:
+            payload["max_tokens"] = self.max_tokens
+        return payload
+        
+    def test_query(self, query: str, timeout: int = 120) -> Dict[str, Any]:
         """Send a single query to the ChatQnA service"""
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             
-            payload = {
-                "messages": query
-            }
+            payload = self.build_payload(query)
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.service_url}/v1/chatqna",
                 headers={"Content-Type": "application/json"},
                 json=payload,
-                timeout=120,
+                timeout=timeout,
                 stream=True  # Enable streaming for SSE
             )
             
-            end_time = time.time()
-            response_time = end_time - start_time
+            # Only the response headers have arrived at this point
+            headers_time = time.perf_counter() - start_time
             
             if response.status_code == 200:
                 # Handle Server-Sent Events (SSE) response
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        line_str = line.decode('utf-8')
-                        if line_str.startswith('data: '):
-                            data = line_str[6:]  # Remove 'data: ' prefix
-                            if data == '[DONE]':
-                                break
-                            elif data and data != '':
-                                # Decode base64 if needed, otherwise use as-is
-                                try:
-                                    import base64
-                                    decoded = base64.b64decode(data).decode('utf-8')
-                                    full_response += decoded
-                                except:
-                                    # If not base64, use as plain text
-                                    full_response += data
+                decoder = SSEStreamDecoder()
+                chunk_times = []
+                lines = response.iter_lines()
+                for line in lines:
+                    if decoder.feed_line(line) is not None:
+                        chunk_times.append(time.perf_counter())
+                    elif decoder.done:
+                        break
+                end_time = time.perf_counter()
+                drain(lines)
                 
                 return {
                     "query": query,
-                    "response": full_response,
-                    "response_time": response_time,
+                    "response": decoder.text,
+                    "response_time": end_time - start_time,
                     "status": "success",
-                    "status_code": response.status_code
+                    "status_code": response.status_code,
+                    "connection_reused": response.connection_reused,
+                    **stream_timing(start_time, chunk_times, end_time)
                 }
             else:
                 return {
                     "query": query,
                     "response": "",
-                    "response_time": response_time,
+                    "response_time": headers_time,
                     "status": "error",
                     "status_code": response.status_code,
+                    "connection_reused": response.connection_reused,
                     "error": response.text
                 }
                 
@@ -116,14 +201,224 @@ class ChatQnAEvaluator:
                 "status": "exception",
                 "error": str(e)
             }
+
+    async def test_query_async(self, session, query: str, timeout: int = 120) -> Dict[str, Any]:
+        """Send a single query to the ChatQnA service over a shared aiohttp session"""
+        trace_ctx = {}
+        try:
+            start_time = time.perf_counter()
+            
+            payload = self.build_payload(query)
+            
+            async with await self._post_with_retries(
+                session,
+                f"{self.service_url}/v1/chatqna",
+                trace_ctx,
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                # Only the response headers have arrived at this point
+                headers_time = time.perf_counter() - start_time
+                
+                if response.status == 200:
+                    # Handle Server-Sent Events (SSE) response
+                    decoder = SSEStreamDecoder()
+                    chunk_times = []
+                    async for line in response.content:
+                        if decoder.feed_line(line) is not None:
+                            chunk_times.append(time.perf_counter())
+                        elif decoder.done:
+                            break
+                    end_time = time.perf_counter()
+                    # Unread body would make aiohttp close the connection instead of pooling it
+                    await response.content.read()
+                    
+                    return {
+                        "query": query,
+                        "response": decoder.text,
+                        "response_time": end_time - start_time,
+                        "status": "success",
+                        "status_code": response.status,
+                        "connection_reused": trace_ctx.get("connection_reused"),
+                        "retries": trace_ctx.get("retries", 0),
+                        **stream_timing(start_time, chunk_times, end_time)
+                    }
+                else:
+                    return {
+                        "query": query,
+                        "response": "",
+                        "response_time": headers_time,
+                        "status": "error",
+                        "status_code": response.status,
+                        "connection_reused": trace_ctx.get("connection_reused"),
+                        "retries": trace_ctx.get("retries", 0),
+                        "error": await response.text()
+                    }
+                
+        except Exception as e:
+            return {
+                "query": query,
+                "response": "",
+                "response_time": 0,
+                "status": "exception",
+                "retries": trace_ctx.get("retries", 0),
+                # asyncio.TimeoutError has an empty message
+                "error": str(e) or e.__class__.__name__
+            }
+
+    async def _post_with_retries(self, session, url: str, trace_ctx: Dict[str, Any], **kwargs):
+        """session.post with the retry policy of PooledSession; returns the response to be entered
+
+        trace_ctx["retries"] counts the attempts that were retried.
+        """
+        for attempt in range(self.retries + 1):
+            trace_ctx["retries"] = attempt
+            last = attempt == self.retries
+            try:
+                response = await session.post(url, trace_request_ctx=trace_ctx, **kwargs)
+            except aiohttp.ClientConnectionError:
+                if last:
+                    raise
+            else:
+                if last or response.status not in RETRY_STATUSES:
+                    return response
+                response.release()
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    def aiohttp_session(self, concurrency: int):
+        """aiohttp session with a connection per in-flight query, recording connection reuse"""
+        # A smaller pool would queue queries on a connection inside the timed part of
+        # test_query_async and cap the concurrency at the pool size
+        connector = aiohttp.TCPConnector(limit=max(concurrency, self.pool_size), force_close=not self.keep_alive)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[aiohttp_trace_config()])
+
+    async def run_queries_async(self, queries: List[str], concurrency: int = 4, query_timeout: int = 120,
+                                deadline: float | None = None, session=None,
+                                quiet: bool = False) -> List[Dict[str, Any]]:
+        """Send all queries concurrently, at most `concurrency` in flight, over one connection pool
+
+        Queries that have not started by `deadline` (a time.perf_counter() value) are dropped.
+        A `session` from aiohttp_session() is reused, e.g. the one already warmed up.
+        """
+        if session is None:
+            async with self.aiohttp_session(concurrency) as session:
+                return await self.run_queries_async(queries, concurrency, query_timeout, deadline, session, quiet)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        completed = 0
+        
+        async def run_one(query: str) -> Dict[str, Any] | None:
+            nonlocal completed
+            async with semaphore:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                result = await self.test_query_async(session, query, query_timeout)
+            completed += 1
+            if quiet:
+                return result
+            if result["status"] == "success":
+                print(f"  ✓ [{completed}/{len(queries)}] Success ({result['response_time']:.2f}s): {query[:50]}...")
+            else:
+                print(f"  ✗ [{completed}/{len(queries)}] Failed: {result.get('error', 'Unknown error')}")
+            return result
+        
+        # gather keeps the results in query order
+        results = await asyncio.gather(*(run_one(query) for query in queries))
+        return [result for result in results if result is not None]
     
-    def evaluate_responses(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Evaluate the quality of responses"""
+    def run_queries(self, queries: List[str], query_timeout: int = 120,
+                    deadline: float | None = None) -> List[Dict[str, Any]]:
+        """Send all queries one after another, until `deadline` (a time.perf_counter() value) if set"""
+        results = []
+        
+        for i, query in enumerate(queries, 1):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            print(f"Query {i}/{len(queries)}: {query[:50]}...")
+            result = self.test_query(query, query_timeout)
+            results.append(result)
+            
+            if result["status"] == "success":
+                print(f"  ✓ Success ({result['response_time']:.2f}s)")
+            else:
+                print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
+        
+        return results
+    
+    def run_warmup(self, queries: List[str], warm_ups: int, query_timeout: int = 120,
+                   cv_threshold: float = 0.1, max_warm_ups: int | None = None,
+                   concurrency: int = 1) -> Dict[str, Any] | None:
+        """Send warm-up queries until latency converges; they stay out of the headline statistics
+
+        Cycles through the queries until the WarmupMonitor is done. With concurrency > 1 the
+        warm-up runs at that concurrency (see run_warmup_async). None without queries.
+        """
+        if concurrency > 1:
+            return asyncio.run(self.run_warmup_async(queries, warm_ups, query_timeout, cv_threshold, max_warm_ups,
+                                                     concurrency))
+        if not queries:
+            print("⚠️  No queries to warm up with")
+            return None
+        monitor = WarmupMonitor(warm_ups, cv_threshold, max_warm_ups)
+        
+        print(f"\n🔥 Warming up with {warm_ups}-{monitor.max_warm_ups} queries "
+              f"(converged at cv <= {cv_threshold})...")
+        while not monitor.done:
+            monitor.add(self.test_query(queries[len(monitor.results) % len(queries)], query_timeout))
+        return monitor.report()
+    
+    async def run_warmup_async(self, queries: List[str], warm_ups: int, query_timeout: int = 120,
+                               cv_threshold: float = 0.1, max_warm_ups: int | None = None, concurrency: int = 4,
+                               session=None) -> Dict[str, Any] | None:
+        """Warm up in rounds of `concurrency` concurrent queries, like run_warmup
+
+        The server warms up at the batch size of the measured run, and a `session` from
+        aiohttp_session() keeps the warmed connections for it.
+        """
+        if not queries:
+            print("⚠️  No queries to warm up with")
+            return None
+        if session is None:
+            async with self.aiohttp_session(concurrency) as session:
+                return await self.run_warmup_async(queries, warm_ups, query_timeout, cv_threshold, max_warm_ups,
+                                                   concurrency, session)
+        monitor = WarmupMonitor(warm_ups, cv_threshold, max_warm_ups)
+        
+        print(f"\n🔥 Warming up with {warm_ups}-{monitor.max_warm_ups} queries at concurrency {concurrency} "
+              f"(converged at cv <= {cv_threshold})...")
+        while not monitor.done:
+            sent = len(monitor.results)
+            batch = [queries[(sent + i) % len(queries)] for i in range(min(concurrency, monitor.max_warm_ups - sent))]
+            for result in await self.run_queries_async(batch, concurrency, query_timeout, session=session, quiet=True):
+                monitor.add(result)
+        return monitor.report()
+    
+    async def _run_queries_warm(self, queries: List[str], concurrency: int, query_timeout: int, warm_ups: int,
+                                warmup_cv: float, max_warm_ups: int | None):
+        """Warm-up and measured queries over one aiohttp session; returns warmup, results, duration"""
+        async with self.aiohttp_session(concurrency) as session:
+            warmup = None
+            if warm_ups > 0:
+                warmup = await self.run_warmup_async(queries, warm_ups, query_timeout, warmup_cv, max_warm_ups,
+                                                     concurrency, session)
+            print(f"Running queries concurrently (concurrency={concurrency}, timeout={query_timeout}s)")
+            eval_start = time.time()
+            results = await self.run_queries_async(queries, concurrency, query_timeout, session=session)
+            return warmup, results, time.time() - eval_start
+    
+    def evaluate_responses(self, results: List[Dict[str, Any]], duration: float | None = None) -> Dict[str, Any]:
+        """Evaluate the quality of responses; duration is the wall time of the run, for aggregate rates"""
         successful_results = [r for r in results if r["status"] == "success"]
         
         if not successful_results:
             return {"error": "No successful responses to evaluate"}
         
+        if self.token_counter is None:
+            self.token_counter = TokenCounter(self.tokenizer_model)
+        # Adds the token counts to the results, before the distributions are computed
+        tokens = token_summary(results, self.token_counter, duration, self.ttft_slo, self.tpot_slo)
+        
         # Calculate response time statistics
         response_times = [r["response_time"] for r in successful_results]
         
@@ -133,25 +428,40 @@ class ChatQnAEvaluator:
         # Calculate success rate
         success_rate = len(successful_results) / len(results) * 100
         
+        # Streaming latency distributions, pooled over all requests for ITL
+        inter_token_latencies = [itl for r in successful_results for itl in r["inter_token_latencies"]]
+        
         return {
             "total_queries": len(results),
             "successful_queries": len(successful_results),
             "success_rate": success_rate,
-            "response_time_stats": {
-                "mean": statistics.mean(response_times),
-                "median": statistics.median(response_times),
-                "min": min(response_times),
-                "max": max(response_times),
-                "std": statistics.stdev(response_times) if len(response_times) > 1 else 0
-            },
+            "response_time_stats": describe(response_times),
+            "ttft_stats": describe([r["ttft"] for r in successful_results]),
+            "tpot_stats": describe([r["tpot"] for r in successful_results if r["output_chunks"] > 1]),
+            "itl_stats": describe(inter_token_latencies),
+            "stream_time_stats": describe([r["stream_time"] for r in successful_results]),
+            "connection_stats": connection_stats(results),
+            "token_stats": tokens,
+            # Percentiles, bootstrap CIs and histograms of latency, TTFT, tokens/s and length
+            "distributions": report_stats(results),
             "response_quality": {
                 "avg_response_length": avg_response_length,
                 "avg_response_length_chars": avg_response_length
             }
         }
     
-    def run_evaluation(self, queries: List[str], output_file: str | None = None, wait_for_service: bool = True) -> Dict[str, Any]:
-        """Run the complete evaluation"""
+    def run_evaluation(self, queries: List[str], output_file: str | None = None, wait_for_service: bool = True,
+                       concurrency: int = 1, query_timeout: int = 120, warm_ups: int = 0,
+                       warmup_cv: float = 0.1, max_warm_ups: int | None = None, results_db: str | None = None,
+                       run_label: str | None = None) -> Dict[str, Any]:
+        """Run the complete evaluation
+
+        With concurrency > 1 the queries are sent through asyncio/aiohttp with at most
+        `concurrency` requests in flight; the report has the same schema either way.
+        With warm_ups > 0 a warm-up stage runs first, at the same concurrency and over the same
+        connections, and is reported under "warmup" only.
+        With results_db the run is also appended to that result store.
+        """
         print(f"Starting ChatQnA evaluation with {len(queries)} queries...")
         print(f"Service URL: {self.service_url}")
         
@@ -161,26 +471,33 @@ class ChatQnAEvaluator:
                 print("❌ Cannot proceed with evaluation - service is not ready")
                 return {"error": "Service not ready"}
         
-        results = []
+        if concurrency > 1 and aiohttp is None:
+            print("⚠️  aiohttp is not installed, falling back to sequential queries (pip install aiohttp)")
+            concurrency = 1
         
-        for i, query in enumerate(queries, 1):
-            print(f"Query {i}/{len(queries)}: {query[:50]}...")
-            result = self.test_query(query)
-            results.append(result)
-            
-            if result["status"] == "success":
-                print(f"  ✓ Success ({result['response_time']:.2f}s)")
-            else:
-                print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
+        if concurrency > 1:
+            warmup, results, duration = asyncio.run(self._run_queries_warm(queries, concurrency, query_timeout,
+                                                                           warm_ups, warmup_cv, max_warm_ups))
+        else:
+            warmup = None
+            if warm_ups > 0:
+                warmup = self.run_warmup(queries, warm_ups, query_timeout, warmup_cv, max_warm_ups)
+            eval_start = time.time()
+            results = self.run_queries(queries, query_timeout)
+            duration = time.time() - eval_start
+        print(f"\nAll queries finished in {duration:.2f}s")
         
         # Evaluate results
-        evaluation = self.evaluate_responses(results)
+        evaluation = self.evaluate_responses(results, duration)
         
         # Prepare final report
         report = {
             "timestamp": datetime.now().isoformat(),
             "service_url": self.service_url,
+            "duration": duration,
             "evaluation_summary": evaluation,
+            "readiness": self.readiness,
+            "warmup": warmup,
             "detailed_results": results
         }
         
@@ -191,6 +508,12 @@ class ChatQnAEvaluator:
                 json.dump(report, f, indent=2)
             print(f"\nResults saved to: {output_file}")
         
+        settings = {"concurrency": concurrency, "query_timeout": query_timeout, "warm_ups": warm_ups,
+                    "max_tokens": self.max_tokens, "keep_alive": self.keep_alive}
+        record_run(results_db, results, tool="chatqna_simple_eval", test="evaluation", service_url=self.service_url,
+                   label=run_label, concurrency=concurrency, duration=duration, settings=settings,
+                   summary={key: value for key, value in evaluation.items() if key != "distributions"})
+        
         # Print summary
         self.print_summary(evaluation)
         
@@ -218,6 +541,30 @@ class ChatQnAEvaluator:
         print(f"  Max: {rt_stats['max']:.2f}s")
         print(f"  Std Dev: {rt_stats['std']:.2f}s")
         
+        print("\nStreaming Latency (p50 / p90 / p95 / p99 / p99.9):")
+        for label, key in [("TTFT", "ttft_stats"), ("TPOT", "tpot_stats"),
+                           ("ITL", "itl_stats"), ("Stream Time", "stream_time_stats")]:
+            pct = evaluation[key]
+            print(f"  {label}: {pct['p50'] * 1000:.1f} / {pct['p90'] * 1000:.1f} / {pct['p95'] * 1000:.1f} / "
+                  f"{pct['p99'] * 1000:.1f} / {pct['p99.9'] * 1000:.1f} ms")
+        
+        print("\nDistributions (mean [95% CI]):")
+        distributions = evaluation['distributions']
+        for label, key, unit, scale in [("Latency", "latency", "s", 1), ("TTFT", "ttft", " ms", 1000),
+                                        ("Chunks/s", "tokens_per_second", "", 1),
+                                        ("Output Tokens/s", "output_tokens_per_second", "", 1),
+                                        ("Response Length", "response_length", " chars", 1)]:
+            if key in distributions:
+                print(f"  {format_stats(label, distributions[key], unit, scale)}")
+        
+        conn = evaluation['connection_stats']
+        print(f"\nConnections: {conn['reused']}/{conn['requests']} requests reused a connection "
+              f"({conn['reuse_rate']:.1f}%), {conn['new']} new")
+        
+        print("\nToken Throughput:")
+        for line in format_token_summary(evaluation['token_stats']):
+            print(f"  {line}")
+        
         print("\nResponse Quality:")
         quality = evaluation['response_quality']
         print(f"  Average Response Length: {quality['avg_response_length']:.0f} characters")
@@ -244,14 +591,51 @@ def main():
                        help="List of queries to test")
     parser.add_argument("--no-wait", action="store_true",
                        help="Don't wait for service to be ready")
+    parser.add_argument("--concurrency", type=int, default=1,
+                       help="Maximum number of queries in flight (>1 uses asyncio/aiohttp)")
+    parser.add_argument("--query-timeout", type=int, default=120,
+                       help="Per-query timeout in seconds")
+    parser.add_argument("--warm-ups", type=int, default=0,
+                       help="Minimum number of warm-up queries, excluded from the statistics")
+    parser.add_argument("--warmup-cv", type=float, default=0.1,
+                       help="Warm up until the coefficient of variation of recent latencies is at most this")
+    parser.add_argument("--max-warm-ups", type=int, default=None,
+                       help="Maximum number of warm-up queries (default: 3x --warm-ups)")
+    parser.add_argument("--readiness-services", nargs="+",
+                       help="Only wait for these services (chatqna-backend, tei-embedding, tei-reranking, "
+                            "retriever, dataprep, redis, vllm/tgi)")
+    parser.add_argument("--pool-size", type=int, default=10,
+                       help="Maximum number of pooled keep-alive connections (at least --concurrency)")
+    parser.add_argument("--no-keep-alive", action="store_true",
+                       help="Open a new connection for every request")
+    parser.add_argument("--retries", type=int, default=3,
+                       help="Retries on connection errors and 502/503/504 responses")
+    parser.add_argument("--retry-backoff", type=float, default=0.5,
+                       help="Backoff factor in seconds, doubled after every retry")
+    parser.add_argument("--tokenizer-model", default=default_model(),
+                       help="Model whose tokenizer counts tokens (default: $LLM_MODEL; none counts streamed chunks)")
+    parser.add_argument("--ttft-slo", type=float, default=DEFAULT_TTFT_SLO * 1000,
+                       help="Goodput TTFT SLO in milliseconds")
+    parser.add_argument("--tpot-slo", type=float, default=DEFAULT_TPOT_SLO * 1000,
+                       help="Goodput TPOT SLO in milliseconds")
+    parser.add_argument("--results-db", default=os.environ.get("OPEA_EVAL_RESULTS_DB"),
+                       help="Also append the run to this result store (default: $OPEA_EVAL_RESULTS_DB)")
+    parser.add_argument("--run-label", default=None,
+                       help="Label of the run in the result store, e.g. an image tag")
     
     args = parser.parse_args()
     
     # Create evaluator
-    evaluator = ChatQnAEvaluator(args.service_url)
+    evaluator = ChatQnAEvaluator(args.service_url, pool_size=args.pool_size, keep_alive=not args.no_keep_alive,
+                                 retries=args.retries, retry_backoff=args.retry_backoff,
+                                 readiness_services=args.readiness_services, tokenizer_model=args.tokenizer_model,
+                                 ttft_slo=args.ttft_slo / 1000, tpot_slo=args.tpot_slo / 1000)
     
     # Run evaluation
-    evaluator.run_evaluation(args.queries, args.output, not args.no_wait)
+    evaluator.run_evaluation(args.queries, args.output, not args.no_wait,
+                             concurrency=args.concurrency, query_timeout=args.query_timeout,
+                             warm_ups=args.warm_ups, warmup_cv=args.warmup_cv, max_warm_ups=args.max_warm_ups,
+                             results_db=args.results_db, run_label=args.run_label)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Evaluation Statistics
+Percentiles, histograms and bootstrap confidence intervals shared by the evaluator reports.
+
+Every report uses the same definitions, so numbers from the evaluators and from
+performance_evaluation.sh can be compared directly:
+  - percentiles interpolate linearly between the closest ranks (p50/p90/p95/p99/p99.9)
+  - std is the sample standard deviation (ddof=1), 0 for fewer than two values
+  - histograms use log-spaced buckets with a bounded relative error (the HDR histogram layout)
+  - confidence intervals are percentile bootstrap intervals of the mean and the median
+  - two samples are compared with the Mann-Whitney U test (normal approximation with tie
+    correction) and bootstrap intervals of the ratio of their means or medians
+
+All computations are vectorised with NumPy. Run the module on a file (or stdin) with one
+number per line for a summary:
+
+    python eval_stats.py latencies.txt
+"""
+
+import argparse
+import json
+import math
+import sys
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+# Upper bound on resampled values held in memory at once by bootstrap_ci
+_BOOTSTRAP_CHUNK = 4_000_000
+# Resampled values per interval when bootstrap_ci picks the number of resamples itself
+_BOOTSTRAP_BUDGET = 20_000_000
+
+
+def _as_array(values: Iterable[float]) -> np.ndarray:
+    return np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=float)
+
+
+def percentile_key(pct: float) -> str:
+    return f"p{pct:g}"
+
+
+def describe(values: Iterable[float], percentiles: Sequence[float] = PERCENTILES) -> Dict[str, float]:
+    """count, mean, median, std, min, max and the percentiles of a sample"""
+    data = _as_array(values)
+    if data.size == 0:
+        return {"count": 0, "mean": 0, "median": 0, "std": 0, "min": 0, "max": 0,
+                **{percentile_key(p): 0 for p in percentiles}}
+    points = np.percentile(data, percentiles)
+    return {
+        "count": int(data.size),
+        "mean": float(data.mean()),
+        "median": float(np.median(data)),
+        "std": float(data.std(ddof=1)) if data.size > 1 else 0.0,
+        "min": float(data.min()),
+        "max": float(data.max()),
+        **{percentile_key(p): float(v) for p, v in zip(percentiles, points)}
+    }
+
+
+def bootstrap_ci(values: Iterable[float], statistic: str | float = "mean", confidence: float = 0.95,
+                 n_resamples: int | None = None, seed: int = 0) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the mean or of a percentile (e.g. 50)
+
+    By default 1000 resamples are drawn, fewer (at least 100) for samples so large that
+    the resampling would dominate the report time.
+    """
+    data = _as_array(values)
+    if data.size < 2:
+        value = float(data[0]) if data.size else 0.0
+        return value, value
+    if n_resamples is None:
+        n_resamples = min(1000, max(100, _BOOTSTRAP_BUDGET // data.size))
+
+    rng = np.random.default_rng(seed)
+    estimates = _bootstrap_estimates(data, statistic, n_resamples, rng)
+    alpha = (1 - confidence) / 2 * 100
+    low, high = np.percentile(estimates, [alpha, 100 - alpha])
+    return float(low), float(high)
+
+
+def _bootstrap_estimates(data: np.ndarray, statistic: str | float, n_resamples: int,
+                         rng: np.random.Generator) -> np.ndarray:
+    rows = max(1, _BOOTSTRAP_CHUNK // data.size)
+    estimates = []
+    for start in range(0, n_resamples, rows):
+        resamples = data[rng.integers(0, data.size, size=(min(rows, n_resamples - start), data.size))]
+        if statistic == "mean":
+            estimates.append(resamples.mean(axis=1))
+        else:
+            estimates.append(np.percentile(resamples, float(statistic), axis=1))
+    return np.concatenate(estimates)
+
+
+def bootstrap_ratio_ci(baseline: Iterable[float], candidate: Iterable[float], statistic: str | float = "mean",
+                       confidence: float = 0.95, n_resamples: int | None = None,
+                       seed: int = 0) -> Tuple[float, float, float]:
+    """Ratio candidate / baseline of the mean or a percentile, with a percentile bootstrap interval
+
+    The two samples are resampled independently. Returns (ratio, low, high).
+    """
+    a, b = _as_array(baseline), _as_array(candidate)
+    if a.size == 0 or b.size == 0:
+        raise ValueError("bootstrap_ratio_ci needs two non-empty samples")
+
+    def point(data):
+        return data.mean() if statistic == "mean" else np.percentile(data, float(statistic))
+
+    ratio = float(point(b) / point(a))
+    if n_resamples is None:
+        n_resamples = min(1000, max(100, _BOOTSTRAP_BUDGET // max(a.size, b.size)))
+    rng = np.random.default_rng(seed)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = _bootstrap_estimates(b, statistic, n_resamples, rng) / _bootstrap_estimates(a, statistic, n_resamples, rng)
+    alpha = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(ratios, [alpha, 100 - alpha])
+    return ratio, float(low), float(high)
+
+
+def mann_whitney_u(baseline: Iterable[float], candidate: Iterable[float],
+                   alternative: str = "two-sided") -> Dict[str, float]:
+    """Mann-Whitney U test of candidate against baseline
+
+    alternative "greater" tests whether candidate values tend to be larger, "less" smaller.
+    The p-value uses the normal approximation with tie and continuity correction, which is
+    accurate from about 10 values per sample. prob_greater is the probability that a
+    random candidate value exceeds a random baseline value (ties count half).
+    """
+    a, b = _as_array(baseline), _as_array(candidate)
+    n1, n2 = b.size, a.size
+    if n1 == 0 or n2 == 0:
+        raise ValueError("mann_whitney_u needs two non-empty samples")
+    combined = np.concatenate([b, a])
+    _, inverse, counts = np.unique(combined, return_inverse=True, return_counts=True)
+    # Average rank of every distinct value, 1-based
+    average_ranks = np.cumsum(counts) - (counts - 1) / 2
+    u = float(average_ranks[inverse][:n1].sum() - n1 * (n1 + 1) / 2)
+
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    ties = float((counts ** 3 - counts).sum())
+    std = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))) if n > 1 else 0.0
+    if std == 0:
+        p_value = 1.0
+    elif alternative == "greater":
+        p_value = 0.5 * math.erfc((u - mean - 0.5) / std / math.sqrt(2))
+    elif alternative == "less":
+        p_value = 0.5 * math.erfc(-(u - mean + 0.5) / std / math.sqrt(2))
+    else:
+        p_value = min(1.0, math.erfc(max(abs(u - mean) - 0.5, 0) / std / math.sqrt(2)))
+    return {"u": u, "p_value": p_value, "prob_greater": u / (n1 * n2), "alternative": alternative}
+
+
+def log_histogram(values: Iterable[float], relative_error: float = 0.01) -> Dict[str, Any]:
+    """Counts per log-spaced bucket; every value lies within relative_error of its bucket's midpoint
+
+    Only non-empty buckets are listed, as [lower, upper, count]. Values <= 0 share one
+    bucket with upper bound 0.
+    """
+    data = _as_array(values)
+    gamma = (1 + relative_error) / (1 - relative_error)
+    buckets: List[List[float]] = []
+    non_positive = int((data <= 0).sum())
+    if non_positive:
+        buckets.append([float(data.min()), 0.0, non_positive])
+    positive = data[data > 0]
+    if positive.size:
+        indices = np.ceil(np.log(positive) / np.log(gamma)).astype(np.int64)
+        unique, counts = np.unique(indices, return_counts=True)
+        for index, count in zip(unique, counts):
+            buckets.append([float(gamma ** (index - 1)), float(gamma ** index), int(count)])
+    return {"relative_error": relative_error, "buckets": buckets}
+
+
+def summarize(values: Iterable[float], confidence: float = 0.95, histogram: bool = True) -> Dict[str, Any]:
+    """describe() plus bootstrap intervals of the mean and median, and optionally a histogram"""
+    data = _as_array(values)
+    summary = describe(data)
+    summary["ci"] = {
+        "confidence": confidence,
+        "mean": list(bootstrap_ci(data, "mean", confidence)),
+        "median": list(bootstrap_ci(data, 50, confidence)),
+    }
+    if histogram:
+        summary["histogram"] = log_histogram(data)
+    return summary
+
+
+def response_metrics(results: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Per-request metric arrays of successful evaluator results
+
+    latency is the full response time in seconds, ttft the time to the first streamed
+    chunk, tokens_per_second the streamed chunks over the stream time and
+    response_length the answer length in characters. output_tokens and
+    output_tokens_per_second are added by token_metrics.annotate(). Metrics an evaluator
+    does not record are left out.
+    """
+    ok = [r for r in results if r.get("status") == "success"]
+    metrics = {
+        "latency": np.array([r["response_time"] for r in ok], dtype=float),
+        "response_length": np.array([len(r["response"]) for r in ok], dtype=float),
+    }
+    if ok and all("ttft" in r for r in ok):
+        metrics["ttft"] = np.array([r["ttft"] for r in ok], dtype=float)
+    if ok and all("output_chunks" in r and "stream_time" in r for r in ok):
+        chunks = np.array([r["output_chunks"] for r in ok], dtype=float)
+        stream_time = np.array([r["stream_time"] for r in ok], dtype=float)
+        metrics["tokens_per_second"] = np.divide(chunks, stream_time, out=np.zeros_like(chunks),
+                                                 where=stream_time > 0)
+    for name in ("output_tokens", "output_tokens_per_second"):
+        if ok and all(name in r for r in ok):
+            metrics[name] = np.array([r[name] for r in ok], dtype=float)
+    return metrics
+
+
+def report_stats(results: List[Dict[str, Any]], confidence: float = 0.95) -> Dict[str, Dict[str, Any]]:
+    """summarize() of every response metric, the "distributions" section of a report"""
+    return {name: summarize(values, confidence) for name, values in response_metrics(results).items()}
+
+
+def format_stats(name: str, stats: Dict[str, Any], unit: str = "", scale: float = 1) -> str:
+    """One line with the mean, its confidence interval and the percentiles"""
+    line = f"{name}: mean {stats['mean'] * scale:.2f}{unit}"
+    if "ci" in stats:
+        low, high = stats["ci"]["mean"]
+        line += f" [{low * scale:.2f}, {high * scale:.2f}]"
+    percentiles = " / ".join(f"{stats[percentile_key(p)] * scale:.2f}" for p in PERCENTILES)
+    return f"{line}, p50/p90/p95/p99/p99.9 {percentiles}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary statistics of a list of numbers")
+    parser.add_argument("file", nargs="?", default="-", help="One number per line, - for stdin")
+    parser.add_argument("--name", default="values", help="Label of the summary line")
+    parser.add_argument("--unit", default="", help="Unit appended to the printed values")
+    parser.add_argument("--json", action="store_true", help="Print the full summary as JSON")
+    args = parser.parse_args()
+
+    stream = sys.stdin if args.file == "-" else open(args.file)
+    with stream:
+        values = [float(line) for line in stream if line.strip()]
+    stats = summarize(values, histogram=args.json)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    print(f"count {stats['count']}, min {stats['min']:.3f}{args.unit}, max {stats['max']:.3f}{args.unit}, "
+          f"std {stats['std']:.3f}{args.unit}")
+    print(format_stats(args.name, stats, args.unit))
+
+if __name__ == "__main__":
+    main()
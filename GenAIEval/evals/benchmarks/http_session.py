@@ -0,0 +1,120 @@
+"""
+Pooled HTTP Session
+Keep-alive connection pool shared by the ChatQnA evaluators.
+
+All probes and queries of an evaluator go through one PooledSession instead of the
+module-level requests.post, so consecutive requests reuse an open TCP connection. The
+pool size, keep-alive and retries with exponential backoff are tunable, and every
+request reports whether it was served on a reused connection. The aiohttp helpers give
+the concurrent mode of chatqna_simple_eval.py the same settings.
+"""
+
+import weakref
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Statuses of a gateway or service that is restarting or overloaded, worth a retry
+RETRY_STATUSES = (502, 503, 504)
+
+
+class PooledSession:
+    """requests.Session with a tuned connection pool that tracks connection reuse
+
+    Retries cover connection errors and RETRY_STATUSES, with a sleep of
+    backoff * 2 ** (retry - 1) seconds between attempts. When they are exhausted the
+    last response is returned, as a single requests.post would have.
+
+    Reuse is detected from the socket a response is read from: one that already served
+    a request of this session is a reused keep-alive connection.
+    """
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True, retries: int = 3, backoff: float = 0.5):
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=None,  # Queries are POSTs, retry them as well
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+        # Sockets that already served a request; closed sockets drop out
+        self._sockets = weakref.WeakSet()
+
+    def _connection_reused(self, response: requests.Response) -> Optional[bool]:
+        if not self.keep_alive:
+            return False
+        sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+        if sock is None:
+            return None
+        reused = sock in self._sockets
+        self._sockets.add(sock)
+        return reused
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the pool; response.connection_reused tells whether a connection was reused"""
+        stream = kwargs.pop("stream", False)
+        # Streamed, so the connection is still attached to the response
+        response = self.session.post(url, stream=True, **kwargs)
+        response.connection_reused = self._connection_reused(response)
+        if not stream:
+            # Read the body now, as requests does, which hands the connection back
+            response.content
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET through the pool, e.g. the health probes of readiness.py"""
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def drain(stream):
+    """Read what is left of a streamed response body
+
+    A requests iter_lines() generator abandoned mid-body closes its connection when it
+    is collected. Reading the remainder, normally just the end of the chunked body after
+    [DONE], lets the connection go back to the pool for the next request.
+    """
+    for _ in stream:
+        pass
+
+
+def connection_stats(results) -> Dict[str, Any]:
+    """Connection reuse summary of evaluator results carrying `connection_reused`"""
+    flags = [r["connection_reused"] for r in results if r.get("connection_reused") is not None]
+    reused = sum(flags)
+    return {
+        "requests": len(flags),
+        "reused": reused,
+        "new": len(flags) - reused,
+        "reuse_rate": reused / len(flags) * 100 if flags else 0,
+    }
+
+
+def aiohttp_trace_config():
+    """aiohttp TraceConfig setting trace_request_ctx["connection_reused"] on every request"""
+    import aiohttp
+
+    async def on_reuse(session, ctx, params):
+        ctx.trace_request_ctx["connection_reused"] = True
+
+    async def on_create(session, ctx, params):
+        ctx.trace_request_ctx["connection_reused"] = False
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_reuseconn.append(on_reuse)
+    trace_config.on_connection_create_end.append(on_create)
+    return trace_config
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+ChatQnA Performance Evaluation
+Latency and throughput measurement engine behind performance_evaluation.sh.
+
+Requests are timed with time.perf_counter() and sent from asyncio workers over one pooled
+aiohttp session, so at most `concurrency` requests are in flight and no process is forked
+per request. Failed requests are not retried unless --retries is given, since a replayed
+overload failure would be timed as one slow success; retried requests are counted in the
+report. Every run writes a text report (the format performance_evaluation.sh has always
+produced, so its summary step keeps working) and a JSON report with the full distributions,
+and is appended to the result store (result_store.py) in the same directory.
+
+    python performance_evaluation.py latency --requests 20
+    python performance_evaluation.py throughput --duration 60 --concurrency 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from chatqna_simple_eval import ChatQnAEvaluator, aiohttp
+from eval_stats import describe, format_stats, report_stats
+from http_session import aiohttp_trace_config, connection_stats
+from result_store import record_run
+from token_metrics import (DEFAULT_TPOT_SLO, DEFAULT_TTFT_SLO, TokenCounter, default_model, format_token_summary,
+                           token_summary)
+
+LATENCY_QUESTIONS = [
+    "What is machine learning?",
+    "Explain artificial intelligence",
+    "How does deep learning work?",
+    "What are neural networks?",
+    "Explain natural language processing"
+]
+
+THROUGHPUT_QUESTIONS = [
+    "What is AI?",
+    "Explain ML",
+    "What is NLP?",
+    "How does DL work?",
+    "What are neural networks?"
+]
+
+
+async def run_load(evaluator: ChatQnAEvaluator, questions: List[str], concurrency: int, query_timeout: int,
+                   requests: int | None = None, duration: float | None = None, seed: int | None = None,
+                   verbose: bool = False) -> Dict[str, Any]:
+    """Closed loop of `concurrency` workers until `requests` were sent or `duration` seconds passed"""
+    rng = random.Random(seed)
+    results = []
+    sent = 0
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def more() -> bool:
+        if requests is not None and sent >= requests:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    async def worker(session):
+        nonlocal sent
+        while more():
+            sent += 1
+            number = sent
+            result = await evaluator.test_query_async(session, rng.choice(questions), query_timeout)
+            result["finished_at"] = time.perf_counter() - start
+            results.append(result)
+            if verbose:
+                status = f"{result['response_time']:.3f}s" if result["status"] == "success" else result["status"]
+                print(f"Request {number}: {status} (HTTP: {result.get('status_code', '---')})")
+
+    connector = aiohttp.TCPConnector(limit=concurrency, force_close=not evaluator.keep_alive)
+    async with aiohttp.ClientSession(connector=connector, trace_configs=[aiohttp_trace_config()]) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"results": results, "elapsed": elapsed}
+
+
+def build_report(kind: str, url: str, concurrency: int, run: Dict[str, Any], counter: TokenCounter,
+                 ttft_slo: float = DEFAULT_TTFT_SLO, tpot_slo: float = DEFAULT_TPOT_SLO) -> Dict[str, Any]:
+    results = run["results"]
+    successful = [r for r in results if r["status"] == "success"]
+    retried = [r for r in results if r.get("retries")]
+    elapsed = run["elapsed"]
+    # Adds the token counts to the results, before the distributions are computed
+    tokens = token_summary(results, counter, elapsed, ttft_slo, tpot_slo)
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "test": kind,
+        "url": url,
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "requests": len(results),
+        "successful_requests": len(successful),
+        "failed_requests": len(results) - len(successful),
+        "success_rate": len(successful) / len(results) * 100 if results else 0,
+        "retried_requests": len(retried),
+        "retries": sum(r["retries"] for r in retried),
+        "throughput_rps": len(successful) / elapsed if elapsed > 0 else 0,
+        "latency_stats": describe([r["response_time"] for r in successful]),
+        "connection_stats": connection_stats(results),
+        "token_stats": tokens,
+        "distributions": report_stats(results),
+        "detailed_results": results
+    }
+
+
+def report_lines(report: Dict[str, Any]) -> List[str]:
+    """Statistics section of the text report"""
+    lines = [""]
+    if report["test"] == "throughput":
+        lines += [
+            "Test Results:",
+            f"  Duration: {report['elapsed']:.2f}s",
+            f"  Successful Requests: {report['successful_requests']}",
+            f"  Failed Requests: {report['failed_requests']}",
+            f"  Retried Requests: {report['retried_requests']} ({report['retries']} retries)",
+            f"  Throughput: {report['throughput_rps']:.2f} requests/second",
+            f"  Success Rate: {report['success_rate']:.2f}%",
+            "",
+        ]
+    stats = report["distributions"].get("latency")
+    if stats and stats["count"]:
+        lines += [
+            "Latency Statistics:",
+            f"  Average: {stats['mean']:.3f}s",
+            f"  Median:  {stats['median']:.3f}s",
+            f"  Min:     {stats['min']:.3f}s",
+            f"  Max:     {stats['max']:.3f}s",
+            f"  {format_stats('Latency', stats, 's')}",
+        ]
+        if "ttft" in report["distributions"]:
+            lines.append(f"  {format_stats('TTFT', report['distributions']['ttft'], ' ms', 1000)}")
+        lines += ["", "Token Throughput:"] + [f"  {line}" for line in format_token_summary(report["token_stats"])]
+    else:
+        lines.append("No successful requests")
+    if report["test"] != "throughput" and report["retried_requests"]:
+        lines += ["", f"Retried Requests: {report['retried_requests']} ({report['retries']} retries)"]
+    return lines
+
+
+def run_test(args, kind: str) -> Dict[str, Any]:
+    if aiohttp is None:
+        print("❌ aiohttp is required for the performance evaluation (pip install aiohttp)")
+        sys.exit(1)
+
+    evaluator = ChatQnAEvaluator(args.url, retries=args.retries)
+    if kind == "latency":
+        concurrency = 1
+        header = [f"Latency Test Results - {datetime.now().strftime('%c')}", "================================="]
+        print(f"Measuring latency for {args.requests} requests...")
+        run = asyncio.run(run_load(evaluator, LATENCY_QUESTIONS, concurrency, args.query_timeout,
+                                   requests=args.requests, seed=args.seed, verbose=True))
+    else:
+        concurrency = args.concurrency
+        header = [f"Throughput Test Results - {datetime.now().strftime('%c')}", "===================================",
+                  f"Duration: {args.duration}s", f"Concurrency: {concurrency}"]
+        print(f"Measuring throughput for {args.duration}s with {concurrency} concurrent requests...")
+        run = asyncio.run(run_load(evaluator, THROUGHPUT_QUESTIONS, concurrency, args.query_timeout,
+                                   duration=args.duration, seed=args.seed))
+
+    report = build_report(kind, evaluator.service_url, concurrency, run, TokenCounter(args.tokenizer_model),
+                          args.ttft_slo / 1000, args.tpot_slo / 1000)
+    lines = report_lines(report)
+    for line in lines:
+        print(line)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    base = os.path.join(args.results_dir, f"{kind}_{args.timestamp}")
+    with open(f"{base}.txt", "w") as f:
+        detail = [f"Request {i}: {r['response_time']:.3f}s (HTTP: {r.get('status_code', '---')})"
+                  for i, r in enumerate(report["detailed_results"], 1)] if kind == "latency" else []
+        f.write("\n".join(header + detail + lines) + "\n")
+    with open(f"{base}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {base}.txt and {base}.json")
+    summary = {key: report[key] for key in ("throughput_rps", "success_rate", "retried_requests", "latency_stats",
+                                            "token_stats")}
+    record_run(args.results_db or os.path.join(args.results_dir, "results.db"), report["detailed_results"],
+               tool="performance_evaluation", test=kind, service_url=report["url"], label=args.run_label,
+               concurrency=concurrency, duration=report["elapsed"], summary=summary,
+               settings={key: value for key, value in vars(args).items() if key not in ("results_db", "run_label")})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatQnA performance evaluation")
+    parser.add_argument("--url", default="http://localhost:8890",
+                       help="ChatQnA backend URL, without /v1/chatqna")
+    parser.add_argument("--results-dir", default="./performance_results",
+                       help="Directory for the text and JSON reports")
+    parser.add_argument("--timestamp", default=datetime.now().strftime("%Y%m%d_%H%M%S"),
+                       help="Suffix of the report file names")
+    parser.add_argument("--query-timeout", type=int, default=120,
+                       help="Per-request timeout in seconds")
+    parser.add_argument("--retries", type=int, default=0,
+                       help="Retries on connection errors and 502/503/504 responses, counted in the report; "
+                            "retried requests are timed from their first attempt")
+    parser.add_argument("--seed", type=int, default=None,
+                       help="Seed of the question selection")
+    parser.add_argument("--tokenizer-model", default=default_model(),
+                       help="Model whose tokenizer counts tokens (default: $LLM_MODEL; none counts streamed chunks)")
+    parser.add_argument("--ttft-slo", type=float, default=DEFAULT_TTFT_SLO * 1000,
+                       help="Goodput TTFT SLO in milliseconds")
+    parser.add_argument("--tpot-slo", type=float, default=DEFAULT_TPOT_SLO * 1000,
+                       help="Goodput TPOT SLO in milliseconds")
+    parser.add_argument("--results-db", default=os.environ.get("OPEA_EVAL_RESULTS_DB"),
+                       help="Result store the run is appended to (default: $OPEA_EVAL_RESULTS_DB or "
+                            "results.db in --results-dir)")
+    parser.add_argument("--run-label", default=None,
+                       help="Label of the run in the result store, e.g. an image tag")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    latency = subparsers.add_parser("latency", help="Sequential requests, latency distribution")
+    latency.add_argument("--requests", type=int, default=10, help="Number of requests")
+
+    throughput = subparsers.add_parser("throughput", help="Concurrent requests for a fixed duration")
+    throughput.add_argument("--duration", type=float, default=60, help="Test duration in seconds")
+    throughput.add_argument("--concurrency", type=int, default=5, help="Requests in flight")
+
+    args = parser.parse_args()
+    run_test(args, args.command)
+
+if __name__ == "__main__":
+    main()
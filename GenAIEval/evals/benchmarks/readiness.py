@@ -0,0 +1,199 @@
+"""
+Readiness Probe
+Waits for the ChatQnA microservices through their health endpoints instead of full chat requests.
+
+Each service is polled in its own thread with exponential backoff, so a cold start costs no
+LLM generations and the report tells when every service became ready:
+  - ChatQnA backend, retriever, dataprep: GET /v1/health_check
+  - TEI embedding and reranking: GET /health
+  - vLLM: GET /health and /v1/models (TGI: GET /health)
+  - Redis: PING, plus FT.INFO on the vector index
+
+Ports come from the CHATQNA_* variables exported by set_env*.sh. Without them, the backend
+port picks the stack: 8889 the TGI ports of set_env.sh, 8890 the vLLM ports of
+set_env_vllm.sh. For any other backend only its /v1/health_check is probed.
+"""
+
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from urllib.parse import urlparse
+
+import requests
+
+# Host ports of the stacks deployed by set_env.sh (TGI) and set_env_vllm.sh (vLLM), by backend port
+STACK_PORTS = {
+    8889: {
+        "CHATQNA_TEI_EMBEDDING_PORT": 18090,
+        "CHATQNA_TEI_RERANKING_PORT": 18808,
+        "CHATQNA_REDIS_RETRIEVER_PORT": 7000,
+        "CHATQNA_REDIS_DATAPREP_PORT": 18103,
+        "CHATQNA_REDIS_VECTOR_PORT": 6379,
+        "CHATQNA_TGI_SERVICE_PORT": 18008,
+    },
+    8890: {
+        "CHATQNA_TEI_EMBEDDING_PORT": 18091,
+        "CHATQNA_TEI_RERANKING_PORT": 18809,
+        "CHATQNA_REDIS_RETRIEVER_PORT": 7001,
+        "CHATQNA_REDIS_DATAPREP_PORT": 18104,
+        "CHATQNA_REDIS_VECTOR_PORT": 6380,
+        "CHATQNA_VLLM_SERVICE_PORT": 18009,
+    },
+}
+
+
+class HTTPHealthCheck:
+    """Ready once every path of the service answers 200"""
+
+    def __init__(self, name: str, base_url: str, paths: Sequence[str] = ("/v1/health_check",), session=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.paths = tuple(paths)
+        # The evaluator's PooledSession, or a plain requests.Session
+        self.session = session or requests.Session()
+
+    def probe(self, timeout: float) -> Optional[str]:
+        """None when ready, otherwise why not"""
+        for path in self.paths:
+            try:
+                response = self.session.get(f"{self.base_url}{path}", timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                return f"{path}: {e.__class__.__name__}"
+            if response.status_code != 200:
+                return f"{path}: HTTP {response.status_code}"
+        return None
+
+    def __repr__(self):
+        return f"{self.name} ({self.base_url}{', '.join(self.paths)})"
+
+
+class RedisCheck:
+    """Ready once Redis answers PING; a missing vector index is reported as a warning
+
+    The index only exists after dataprep ingested a first document, retrieval then
+    returns no context but the pipeline still answers.
+    """
+
+    def __init__(self, name: str, host: str, port: int, index: Optional[str] = None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.index = index
+        self.warning = None
+
+    def probe(self, timeout: float) -> Optional[str]:
+        try:
+            reply = redis_command(self.host, self.port, "PING", timeout=timeout)
+            if reply != "+PONG":
+                return f"PING: {reply}"
+            if self.index:
+                reply = redis_command(self.host, self.port, "FT.INFO", self.index, timeout=timeout)
+                self.warning = f"FT.INFO {self.index}: {reply[1:]}" if reply.startswith("-") else None
+        except OSError as e:
+            return f"{e.__class__.__name__}: {e}"
+        return None
+
+    def __repr__(self):
+        return f"{self.name} (redis://{self.host}:{self.port})"
+
+
+def redis_command(host: str, port: int, *args: str, timeout: float = 5.0) -> str:
+    """Send one RESP command and return the first line of the reply, e.g. "+PONG" or "-ERR ..." """
+    command = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode()
+        command.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(b"".join(command))
+        reply = b""
+        while b"\r\n" not in reply:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return reply.split(b"\r\n", 1)[0].decode("utf-8", errors="replace")
+
+
+def default_checks(service_url: str, env: Mapping[str, str] = os.environ, session=None) -> List[Any]:
+    """Checks for the ChatQnA deployment behind service_url
+
+    The CHATQNA_* variables are used when they describe this backend (no or the same
+    CHATQNA_BACKEND_SERVICE_PORT), on top of the STACK_PORTS of its port.
+    """
+    parsed = urlparse(service_url)
+    host = parsed.hostname or "localhost"
+    ports = dict(STACK_PORTS.get(parsed.port, {}))
+    if env.get("CHATQNA_BACKEND_SERVICE_PORT") in (None, str(parsed.port)):
+        ports.update({var: env[var] for stack in STACK_PORTS.values() for var in stack if var in env})
+
+    def url(port_var: str) -> str:
+        return f"http://{host}:{ports[port_var]}"
+
+    checks = [HTTPHealthCheck("chatqna-backend", service_url, session=session)]
+    for name, port_var, paths in [
+        ("tei-embedding", "CHATQNA_TEI_EMBEDDING_PORT", ["/health"]),
+        ("tei-reranking", "CHATQNA_TEI_RERANKING_PORT", ["/health"]),
+        ("retriever", "CHATQNA_REDIS_RETRIEVER_PORT", ["/v1/health_check"]),
+        ("dataprep", "CHATQNA_REDIS_DATAPREP_PORT", ["/v1/health_check"]),
+    ]:
+        if port_var in ports:
+            checks.append(HTTPHealthCheck(name, url(port_var), paths, session=session))
+    if "CHATQNA_REDIS_VECTOR_PORT" in ports:
+        checks.append(RedisCheck("redis", host, int(ports["CHATQNA_REDIS_VECTOR_PORT"]),
+                                 env.get("CHATQNA_INDEX_NAME", "rag-redis")))
+    # set_env.sh and set_env_lightweight.sh deploy TGI, set_env_vllm.sh deploys vLLM
+    if "CHATQNA_VLLM_SERVICE_PORT" in ports:
+        checks.append(HTTPHealthCheck("vllm", url("CHATQNA_VLLM_SERVICE_PORT"), ["/health", "/v1/models"],
+                                      session=session))
+    elif "CHATQNA_TGI_SERVICE_PORT" in ports:
+        checks.append(HTTPHealthCheck("tgi", url("CHATQNA_TGI_SERVICE_PORT"), ["/health"], session=session))
+    return checks
+
+
+class ReadinessProbe:
+    """Polls every check in parallel until all are ready or the time is up"""
+
+    def __init__(self, checks: Sequence[Any], initial_delay: float = 0.5, max_delay: float = 10,
+                 probe_timeout: float = 5):
+        self.checks = list(checks)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.probe_timeout = probe_timeout
+
+    def _wait_one(self, check, start: float, deadline: float) -> Dict[str, Any]:
+        delay = self.initial_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            error = check.probe(self.probe_timeout)
+            now = time.monotonic()
+            if error is None:
+                result = {"ready": True, "ready_time": now - start, "attempts": attempts}
+                if getattr(check, "warning", None):
+                    result["warning"] = check.warning
+                return result
+            if now >= deadline:
+                return {"ready": False, "ready_time": None, "attempts": attempts, "last_error": error}
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, self.max_delay)
+
+    def wait(self, max_wait_time: float) -> Dict[str, Dict[str, Any]]:
+        """Per-service readiness: ready, ready_time (seconds from the start), attempts"""
+        start = time.monotonic()
+        deadline = start + max_wait_time
+        with ThreadPoolExecutor(max_workers=max(1, len(self.checks))) as pool:
+            futures = {check.name: pool.submit(self._wait_one, check, start, deadline) for check in self.checks}
+            return {name: future.result() for name, future in futures.items()}
+
+
+def print_readiness(readiness: Dict[str, Dict[str, Any]]):
+    """Per-service ready times, slowest last"""
+    for name, result in sorted(readiness.items(), key=lambda item: item[1]["ready_time"] if item[1]["ready"] else float("inf")):
+        if result["ready"]:
+            print(f"  ✅ {name}: ready after {result['ready_time']:.1f}s ({result['attempts']} probes)")
+            if "warning" in result:
+                print(f"     ⚠️  {result['warning']}")
+        else:
+            print(f"  ❌ {name}: not ready after {result['attempts']} probes ({result['last_error']})")
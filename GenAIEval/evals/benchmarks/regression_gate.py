@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Regression Gate
+Compares benchmark runs against a baseline and fails on a significant performance regression.
+
+Runs come from the result store (a run id, or label=NAME for every run with that label) or
+from JSON reports of the evaluators and performance_evaluation.py. Every candidate is
+compared against the baseline, metric by metric:
+  - latency, TTFT and output TPOT (lower is better) and output tokens/s per request (higher
+    is better): one-sided Mann-Whitney U test towards the worse side of the metric, fixed per
+    metric rather than picked from the data, plus the ratio of the medians (latencies) or
+    means (tokens/s) with a bootstrap confidence interval
+  - throughput (successful requests per second of run time): the ratio with a bootstrap
+    interval over runs when both sides have several runs; with one run a side, over requests,
+    scaling each run's throughput inversely to its resampled mean latency (Little's law for a
+    closed loop at fixed concurrency)
+
+A metric regresses when it changed for the worse by more than the --tolerance in relative
+terms and the change is statistically significant: p < --alpha for the per-request metrics,
+the whole interval on the worse side for throughput, which has no test. Improvements are
+reported from the opposite one-sided test and do not affect the gate. The exit
+status is 1 on any regression, 2 when the runs cannot be compared, 0 otherwise, so the
+gate can guard vLLM/TEI image or TAG upgrades:
+
+    python regression_gate.py --db results.db --baseline label=vllm-v0.9 --candidate label=vllm-v0.10
+    python regression_gate.py --baseline base.json --candidate new.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+import numpy as np
+
+from eval_stats import bootstrap_ratio_ci, mann_whitney_u
+from result_store import ResultStore
+
+# metric: (statistic of the ratio, True when lower is better)
+METRICS = {
+    "response_time": ("median", True),
+    "ttft": ("median", True),
+    "output_tpot": ("median", True),
+    "output_tokens_per_second": ("mean", False),
+}
+MIN_SAMPLES = 5
+
+
+def load_runs(selector: str, db: str | None) -> Dict[str, Any]:
+    """Per-request metrics and per-run throughput of a run id, label=NAME or JSON report"""
+    if selector.endswith(".json") or os.path.isfile(selector):
+        return _load_report(selector)
+    if not db:
+        raise ValueError(f"{selector}: run ids and labels need --db")
+    store = ResultStore(db)
+    try:
+        if selector.startswith("label="):
+            run_ids = [run["run_id"] for run in store.runs(label=selector[len("label="):])]
+        else:
+            run_ids = [int(selector)]
+        runs = store.runs(run_ids=run_ids) if run_ids else []
+        if not runs:
+            raise ValueError(f"{selector}: no such runs in {db}")
+        metrics = {metric: np.concatenate(list(store.metric(metric, run_ids=run_ids, status="success").values())
+                                          or [np.array([])])
+                   for metric in METRICS}
+        throughputs = [run["successful"] / run["duration"] for run in runs if run["duration"]]
+        return {"name": selector, "runs": len(runs), "metrics": metrics, "throughputs": throughputs}
+    finally:
+        store.close()
+
+
+def _load_report(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        report = json.load(f)
+    if "runs" in report:
+        runs = [(run["detailed_results"], run.get("duration")) for run in report["runs"]]
+    elif "detailed_results" in report:
+        # performance_evaluation.py reports carry the run time as elapsed
+        runs = [(report["detailed_results"], report.get("elapsed", report.get("duration")))]
+    else:
+        raise ValueError(f"{path}: not an evaluator report")
+
+    ok = [r for results, _ in runs for r in results if r.get("status") == "success"]
+    metrics = {metric: np.array([r[metric] for r in ok if r.get(metric) is not None], dtype=float)
+               for metric in METRICS}
+    throughputs = [sum(1 for r in results if r.get("status") == "success") / duration
+                   for results, duration in runs if duration]
+    return {"name": path, "runs": len(runs), "metrics": metrics, "throughputs": throughputs}
+
+
+def _verdict(worse: bool, significant: bool, change: float, tolerance: float) -> str:
+    if significant and worse and abs(change) > tolerance:
+        return "regression"
+    if significant and not worse and abs(change) > tolerance:
+        return "improvement"
+    return "unchanged"
+
+
+def compare_metric(metric: str, baseline: np.ndarray, candidate: np.ndarray, alpha: float, tolerance: float,
+                   confidence: float) -> Dict[str, Any]:
+    statistic, lower_is_better = METRICS[metric]
+    if min(baseline.size, candidate.size) < MIN_SAMPLES:
+        return {"metric": metric, "verdict": "skipped",
+                "reason": f"fewer than {MIN_SAMPLES} values ({baseline.size} vs {candidate.size})"}
+    ratio, low, high = bootstrap_ratio_ci(baseline, candidate, 50 if statistic == "median" else "mean", confidence)
+    change = ratio - 1
+    # Choosing the side after seeing the change would double the false-positive rate
+    worse_side, better_side = ("greater", "less") if lower_is_better else ("less", "greater")
+    p_value = mann_whitney_u(baseline, candidate, worse_side)["p_value"]
+    p_improvement = mann_whitney_u(baseline, candidate, better_side)["p_value"]
+    worse = (change > 0) == lower_is_better
+    return {
+        "metric": metric,
+        "statistic": statistic,
+        "baseline": float(np.median(baseline) if statistic == "median" else baseline.mean()),
+        "candidate": float(np.median(candidate) if statistic == "median" else candidate.mean()),
+        "change": change,
+        "ci": [low - 1, high - 1],
+        "p_value": p_value,
+        "p_improvement": p_improvement,
+        "verdict": _verdict(worse, (p_value if worse else p_improvement) < alpha, change, tolerance),
+    }
+
+
+def compare_throughput(baseline: Dict[str, Any], candidate: Dict[str, Any], tolerance: float,
+                       confidence: float) -> Dict[str, Any]:
+    base, cand = baseline["throughputs"], candidate["throughputs"]
+    if not base or not cand:
+        return {"metric": "throughput", "verdict": "skipped", "reason": "run time not recorded"}
+    if len(base) > 1 and len(cand) > 1:
+        ratio, low, high = bootstrap_ratio_ci(base, cand, "mean", confidence)
+    else:
+        # Throughput ~ concurrency / mean latency: resample latencies, scale each side's throughput
+        base_latency = baseline["metrics"]["response_time"]
+        cand_latency = candidate["metrics"]["response_time"]
+        if min(base_latency.size, cand_latency.size) < MIN_SAMPLES:
+            return {"metric": "throughput", "verdict": "skipped", "reason": "too few requests"}
+        latency_ratio, low, high = bootstrap_ratio_ci(cand_latency, base_latency, "mean", confidence)
+        ratio = np.mean(cand) / np.mean(base)
+        low, high = ratio * low / latency_ratio, ratio * high / latency_ratio
+    change = ratio - 1
+    significant = high < 1 or low > 1
+    return {
+        "metric": "throughput",
+        "statistic": "mean",
+        "baseline": float(np.mean(base)),
+        "candidate": float(np.mean(cand)),
+        "change": float(change),
+        "ci": [float(low - 1), float(high - 1)],
+        "p_value": None,
+        "p_improvement": None,
+        "verdict": _verdict(change < 0, significant, change, tolerance),
+    }
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], alpha: float = 0.05, tolerance: float = 0.05,
+            confidence: float = 0.95) -> List[Dict[str, Any]]:
+    """Per-metric comparison of a candidate against the baseline"""
+    checks = [compare_metric(metric, baseline["metrics"][metric], candidate["metrics"][metric], alpha, tolerance,
+                             confidence) for metric in METRICS]
+    checks.append(compare_throughput(baseline, candidate, tolerance, confidence))
+    return checks
+
+
+def print_comparison(baseline: Dict[str, Any], candidate: Dict[str, Any], checks: List[Dict[str, Any]]):
+    print(f"\n{candidate['name']} ({candidate['runs']} runs) vs baseline {baseline['name']} ({baseline['runs']} runs)")
+    print(f"  {'metric':<26} {'baseline':>10} {'candidate':>10} {'change':>9} {'95% CI':>19} {'p worse':>8}  verdict")
+    icons = {"regression": "❌", "improvement": "✅", "unchanged": "➖", "skipped": "⚠️ "}
+    for check in checks:
+        if check["verdict"] == "skipped":
+            print(f"  {check['metric']:<26} {'':>10} {'':>10} {'':>9} {'':>19} {'':>8}  "
+                  f"{icons['skipped']} skipped ({check['reason']})")
+            continue
+        low, high = check["ci"]
+        p_value = f"{check['p_value']:.4f}" if check["p_value"] is not None else "-"
+        print(f"  {check['metric']:<26} {check['baseline']:>10.4f} {check['candidate']:>10.4f} "
+              f"{check['change'] * 100:>+8.1f}% [{low * 100:>+7.1f}%, {high * 100:>+7.1f}%] {p_value:>8}  "
+              f"{icons[check['verdict']]} {check['verdict']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail on a significant performance regression against a baseline")
+    parser.add_argument("--baseline", required=True,
+                       help="Run id, label=NAME (result store) or JSON report")
+    parser.add_argument("--candidate", required=True, nargs="+",
+                       help="One or more runs compared against the baseline, same forms as --baseline")
+    parser.add_argument("--db", default=os.environ.get("OPEA_EVAL_RESULTS_DB"),
+                       help="Result store for run ids and labels (default: $OPEA_EVAL_RESULTS_DB)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                       help="Significance level of the Mann-Whitney tests")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                       help="Relative change tolerated before a significant change counts (0.05 = 5%%)")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                       help="Confidence level of the bootstrap intervals")
+    parser.add_argument("--output", default=None,
+                       help="Write the comparison as JSON to this file")
+    parser.add_argument("--report-only", action="store_true",
+                       help="Always exit 0, only print the comparison")
+
+    args = parser.parse_args()
+    try:
+        baseline = load_runs(args.baseline, args.db)
+        candidates = [load_runs(selector, args.db) for selector in args.candidate]
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    comparisons = []
+    for candidate in candidates:
+        checks = compare(baseline, candidate, args.alpha, args.tolerance, args.confidence)
+        print_comparison(baseline, candidate, checks)
+        comparisons.append({"candidate": candidate["name"], "checks": checks})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"baseline": baseline["name"], "alpha": args.alpha, "tolerance": args.tolerance,
+                       "comparisons": comparisons}, f, indent=2)
+
+    regressions = [(c["candidate"], check["metric"]) for c in comparisons for check in c["checks"]
+                   if check["verdict"] == "regression"]
+    compared = any(check["verdict"] != "skipped" for c in comparisons for check in c["checks"])
+    if regressions:
+        print(f"\n❌ Regression: {', '.join(f'{metric} of {name}' for name, metric in regressions)}")
+    elif not compared:
+        print("\n⚠️  Nothing could be compared")
+    else:
+        print("\n✅ No significant regression")
+    if args.report_only:
+        return
+    sys.exit(1 if regressions else 0 if compared else 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Result Store
+Append-only SQLite store of benchmark runs, one row per request, with a query CLI.
+
+Every evaluator run becomes one row of the `runs` table (tool, test, service URL, label,
+concurrency, duration, settings and headline summary) and one row per request in the
+`requests` table, so hundreds of runs can be filtered and aggregated with a single query
+instead of re-parsing every JSON report. SQLite ships with Python and the file can be
+shared or copied like a report; WAL mode lets a query run while an evaluator appends.
+
+    python result_store.py --db results.db runs --tool performance_evaluation
+    python result_store.py --db results.db stats --metric ttft --group-by service_url
+    python result_store.py --db results.db import evaluation_results/*.json
+    python result_store.py --db results.db sql "SELECT status, COUNT(*) FROM requests GROUP BY status"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from eval_stats import PERCENTILES, describe, percentile_key
+
+RUN_COLUMNS = ["created", "tool", "test", "service_url", "label", "concurrency", "duration",
+               "requests", "successful", "settings", "summary"]
+# Per-request fields of the evaluator results, in table order; missing fields are stored as NULL
+REQUEST_COLUMNS = ["seq", "query", "status", "status_code", "response_time", "ttft", "tpot", "output_tpot",
+                   "stream_time", "output_chunks", "output_tokens", "prompt_tokens", "output_tokens_per_second",
+                   "response_length", "connection_reused", "finished_at", "error"]
+# Columns stats can aggregate
+METRICS = ["response_time", "ttft", "tpot", "output_tpot", "stream_time", "output_chunks", "output_tokens",
+           "prompt_tokens", "output_tokens_per_second", "response_length"]
+GROUP_COLUMNS = ["run_id", "tool", "test", "service_url", "label", "concurrency", "status"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    tool TEXT,
+    test TEXT,
+    service_url TEXT,
+    label TEXT,
+    concurrency INTEGER,
+    duration REAL,
+    requests INTEGER,
+    successful INTEGER,
+    settings TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS requests (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    query TEXT,
+    status TEXT,
+    status_code INTEGER,
+    response_time REAL,
+    ttft REAL,
+    tpot REAL,
+    output_tpot REAL,
+    stream_time REAL,
+    output_chunks INTEGER,
+    output_tokens INTEGER,
+    prompt_tokens INTEGER,
+    output_tokens_per_second REAL,
+    response_length INTEGER,
+    connection_reused INTEGER,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS requests_run ON requests(run_id);
+CREATE INDEX IF NOT EXISTS runs_service ON runs(service_url, created);
+"""
+
+
+def _request_row(run_id: int, seq: int, result: Dict[str, Any]) -> tuple:
+    values = dict(result, seq=seq, response_length=len(result.get("response") or ""))
+    if values.get("connection_reused") is not None:
+        values["connection_reused"] = int(values["connection_reused"])
+    return (run_id, *(values.get(column) for column in REQUEST_COLUMNS))
+
+
+class ResultStore:
+    """Runs and their requests in one SQLite file; runs are only ever appended"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def add_run(self, results: List[Dict[str, Any]], tool: str, test: str, service_url: str | None = None,
+                label: str | None = None, concurrency: int | None = None, duration: float | None = None,
+                settings: Dict[str, Any] | None = None, summary: Dict[str, Any] | None = None,
+                created: str | None = None) -> int:
+        """Store a run and its per-request results in one transaction; returns the run_id"""
+        run = {
+            "created": created or datetime.now().isoformat(),
+            "tool": tool,
+            "test": test,
+            "service_url": service_url,
+            "label": label,
+            "concurrency": concurrency,
+            "duration": duration,
+            "requests": len(results),
+            "successful": sum(1 for r in results if r.get("status") == "success"),
+            "settings": json.dumps(settings or {}),
+            "summary": json.dumps(summary or {}),
+        }
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                [run[column] for column in RUN_COLUMNS],
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                f"INSERT INTO requests (run_id, {', '.join(REQUEST_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(REQUEST_COLUMNS) + 1))})",
+                (_request_row(run_id, seq, result) for seq, result in enumerate(results)),
+            )
+        return run_id
+
+    def _filters(self, filters: Dict[str, Any]) -> tuple:
+        clauses, params = [], []
+        for column in ("tool", "test", "service_url", "label"):
+            if filters.get(column) is not None:
+                clauses.append(f"runs.{column} = ?")
+                params.append(filters[column])
+        if filters.get("run_ids"):
+            clauses.append(f"runs.run_id IN ({', '.join('?' * len(filters['run_ids']))})")
+            params.extend(filters["run_ids"])
+        if filters.get("since"):
+            clauses.append("runs.created >= ?")
+            params.append(filters["since"])
+        if filters.get("status"):
+            clauses.append("requests.status = ?")
+            params.append(filters["status"])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def runs(self, **filters) -> List[Dict[str, Any]]:
+        """Run metadata, newest first"""
+        filters.pop("status", None)
+        where, params = self._filters(filters)
+        cursor = self.conn.execute(
+            f"SELECT run_id, {', '.join(RUN_COLUMNS)} FROM runs{where} ORDER BY run_id DESC", params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def metric(self, metric: str, group_by: str = "run_id", **filters) -> Dict[Any, np.ndarray]:
+        """Values of one request column per group; only that column is read"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, choose from {', '.join(METRICS)}")
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown group {group_by!r}, choose from {', '.join(GROUP_COLUMNS)}")
+        where, params = self._filters(filters)
+        table = "requests" if group_by in ("run_id", "status") else "runs"
+        where = where + (" AND " if where else " WHERE ") + f"requests.{metric} IS NOT NULL"
+        rows = self.conn.execute(
+            f"SELECT {table}.{group_by}, requests.{metric} FROM requests JOIN runs USING (run_id)"
+            f"{where} ORDER BY 1", params).fetchall()
+        groups: Dict[Any, List[float]] = {}
+        for key, value in rows:
+            groups.setdefault(key, []).append(value)
+        return {key: np.array(values, dtype=float) for key, values in groups.items()}
+
+    def stats(self, metric: str, group_by: str = "run_id", **filters) -> Dict[Any, Dict[str, float]]:
+        """describe() of a metric per group"""
+        return {key: describe(values) for key, values in self.metric(metric, group_by, **filters).items()}
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> tuple:
+        """Column names and rows of a free-form SQL query"""
+        cursor = self.conn.execute(sql, params)
+        return [d[0] for d in cursor.description or []], cursor.fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def record_run(path: str | None, results: List[Dict[str, Any]], **metadata) -> Optional[int]:
+    """Append a run to the store at path, if one is configured"""
+    if not path:
+        return None
+    store = ResultStore(path)
+    try:
+        run_id = store.add_run(results, **metadata)
+    finally:
+        store.close()
+    print(f"🗄️  Stored run {run_id} ({len(results)} requests) in {path}")
+    return run_id
+
+
+def _summary_headline(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary without the per-bucket distributions, which the requests table already holds"""
+    return {key: value for key, value in summary.items() if key != "distributions"}
+
+
+def import_report(store: ResultStore, path: str, label: str | None = None) -> List[int]:
+    """Store the runs of an existing JSON report of the evaluators or performance_evaluation.py"""
+    with open(path) as f:
+        report = json.load(f)
+    label = label or os.path.basename(path)
+    created = report.get("timestamp")
+    if "runs" in report:
+        # chatqna_config_eval.py suite report
+        return [store.add_run(run["detailed_results"], "chatqna_config_eval", "suite", report.get("service_url"),
+                              label, run.get("concurrency"), run.get("duration"), report.get("settings"),
+                              _summary_headline(run.get("evaluation_summary", {})), created)
+                for run in report["runs"]]
+    if "test" in report:
+        # performance_evaluation.py report
+        summary = {key: report[key] for key in ("throughput_rps", "success_rate", "latency_stats", "token_stats")
+                   if key in report}
+        return [store.add_run(report["detailed_results"], "performance_evaluation", report["test"], report.get("url"),
+                              label, report.get("concurrency"), report.get("elapsed"), None, summary, created)]
+    if "detailed_results" in report:
+        summary = report.get("evaluation_summary", {})
+        return [store.add_run(report["detailed_results"], "chatqna_eval", "evaluation", report.get("service_url"),
+                              label, None, report.get("duration"), None, _summary_headline(summary), created)]
+    raise ValueError(f"{path}: not an evaluator report")
+
+
+def _print_table(columns: List[str], rows: Iterable[Sequence[Any]]):
+    rows = [["" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value) for value in row]
+            for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the benchmark result store")
+    parser.add_argument("--db", default=os.environ.get("OPEA_EVAL_RESULTS_DB", "results.db"),
+                       help="Store file (default: $OPEA_EVAL_RESULTS_DB or results.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(sub):
+        sub.add_argument("--tool", help="Only runs of this tool, e.g. chatqna_simple_eval")
+        sub.add_argument("--test", help="Only runs of this test, e.g. latency or throughput")
+        sub.add_argument("--service-url", help="Only runs against this service URL")
+        sub.add_argument("--label", help="Only runs with this label")
+        sub.add_argument("--run-ids", type=int, nargs="+", help="Only these runs")
+        sub.add_argument("--since", help="Only runs created at or after this ISO date")
+
+    runs = subparsers.add_parser("runs", help="List runs with their headline numbers")
+    add_filters(runs)
+    runs.add_argument("--limit", type=int, default=50, help="Maximum number of runs listed")
+
+    stats = subparsers.add_parser("stats", help="Aggregate a request metric per group")
+    add_filters(stats)
+    stats.add_argument("--metric", default="response_time", choices=METRICS, help="Request column")
+    stats.add_argument("--group-by", default="run_id", choices=GROUP_COLUMNS, help="Grouping column")
+    stats.add_argument("--status", default="success", help="Only requests with this status ('' for all)")
+    stats.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    sql = subparsers.add_parser("sql", help="Run a free-form SQL query")
+    sql.add_argument("query", help="SQL over the runs and requests tables")
+
+    imports = subparsers.add_parser("import", help="Store existing JSON reports")
+    imports.add_argument("files", nargs="+", help="Reports of the evaluators or performance_evaluation.py")
+    imports.add_argument("--label", help="Label of the imported runs (default: the file name)")
+
+    args = parser.parse_args()
+    if args.command != "import" and not os.path.exists(args.db):
+        print(f"❌ No result store at {args.db}")
+        sys.exit(1)
+    store = ResultStore(args.db)
+    filters = {key: getattr(args, key, None) for key in ("tool", "test", "service_url", "label", "run_ids", "since")}
+
+    if args.command == "runs":
+        rows = []
+        for run in store.runs(**filters)[:args.limit]:
+            rate = run["successful"] / run["requests"] * 100 if run["requests"] else 0
+            rows.append([run["run_id"], run["created"][:19], run["tool"], run["test"], run["service_url"],
+                         run["label"], run["concurrency"], run["duration"], run["requests"], f"{rate:.1f}%"])
+        _print_table(["run", "created", "tool", "test", "service_url", "label", "conc", "duration s",
+                      "requests", "success"], rows)
+    elif args.command == "stats":
+        result = store.stats(args.metric, args.group_by, status=args.status or None, **filters)
+        if args.json:
+            print(json.dumps({str(key): value for key, value in result.items()}, indent=2))
+        else:
+            _print_table([args.group_by, "count", "mean", "std"] + [percentile_key(p) for p in PERCENTILES],
+                         [[key, value["count"], value["mean"], value["std"]] +
+                          [value[percentile_key(p)] for p in PERCENTILES] for key, value in result.items()])
+    elif args.command == "sql":
+        columns, rows = store.query(args.query)
+        _print_table(columns, rows)
+    else:
+        for path in args.files:
+            run_ids = import_report(store, path, args.label)
+            print(f"🗄️  {path}: stored run(s) {', '.join(map(str, run_ids))}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
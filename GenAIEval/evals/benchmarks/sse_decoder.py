@@ -0,0 +1,120 @@
+"""
+Incremental SSE Decoder
+Decodes the Server-Sent Events streams returned by ChatQnA-style services.
+
+Shared by the ChatQnA evaluators and the locust stress harness (stresscli/locust/aistress.py).
+The payload format is detected once on the first data event of a stream; every later event
+is decoded on that format's fast path without exception handling in the loop, and decoded
+chunks are kept in a list that is joined once when the text is requested.
+"""
+
+import base64
+import binascii
+import re
+from typing import List, Optional, Union
+
+DONE_MARKER = "[DONE]"
+
+# Payload formats seen on ChatQnA-style streams
+FORMAT_BASE64 = "base64"                # data: SGVsbG8=
+FORMAT_BYTES_LITERAL = "bytes_literal"  # data: b'Hello'
+FORMAT_JSON = "json"                    # data: {..., "text":"Hello", ...}
+FORMAT_TEXT = "text"                    # data: Hello
+
+_BASE64_RE = re.compile(r"[A-Za-z0-9+/]+={0,2}")
+_JSON_TEXT_RE = re.compile(r'"text":"(.*?)"')
+# Final event of a langchain log stream, carries the whole generation
+_LLM_RESULT_MARKER = '"type":"LLMResult"'
+
+
+def sse_data(line: Union[bytes, str]) -> Optional[str]:
+    """Return the payload of an SSE `data:` line, or None for any other line"""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    line = line.rstrip("\r\n")
+    if not line.startswith("data:"):
+        return None
+    data = line[5:]
+    # A single space after the colon belongs to the framing, not the payload
+    return data[1:] if data.startswith(" ") else data
+
+
+def is_base64(data: str) -> bool:
+    """Cheap syntactic check; a payload passing it can be b64decoded without raising"""
+    return len(data) % 4 == 0 and _BASE64_RE.fullmatch(data) is not None
+
+
+def is_bytes_literal(data: str) -> bool:
+    return len(data) >= 3 and data.startswith("b'") and data.endswith("'")
+
+
+def detect_format(data: str) -> str:
+    """Guess the payload format of a stream from its first data event"""
+    if is_bytes_literal(data):
+        return FORMAT_BYTES_LITERAL
+    if data.startswith("{"):
+        return FORMAT_JSON
+    if is_base64(data):
+        try:
+            base64.b64decode(data).decode("utf-8")
+            return FORMAT_BASE64
+        except (binascii.Error, UnicodeDecodeError):
+            pass
+    return FORMAT_TEXT
+
+
+class SSEStreamDecoder:
+    """Incremental decoder for one SSE response stream
+
+    Feed it raw lines (feed_line) or data payloads (feed) as they arrive and read the
+    accumulated answer from `text` at the end. `done` becomes True once the stream
+    signalled completion, either with [DONE] or with a final LLMResult event.
+    """
+
+    def __init__(self, payload_format: Optional[str] = None):
+        self.payload_format = payload_format
+        self.done = False
+        self._chunks: List[str] = []
+
+    def feed(self, data: str) -> Optional[str]:
+        """Decode one data payload and buffer it
+
+        Returns the decoded text ("" when an event carries no text), or None when the
+        payload is empty or the [DONE] marker.
+        """
+        if not data:
+            return None
+        if data == DONE_MARKER:
+            self.done = True
+            return None
+
+        payload_format = self.payload_format
+        if payload_format is None:
+            payload_format = self.payload_format = detect_format(data)
+
+        if payload_format == FORMAT_BASE64:
+            # Streams may interleave unencoded events, keep those verbatim
+            text = base64.b64decode(data).decode("utf-8", errors="replace") if is_base64(data) else data
+        elif payload_format == FORMAT_BYTES_LITERAL:
+            text = data[2:-1] if is_bytes_literal(data) else data
+        elif payload_format == FORMAT_JSON:
+            match = _JSON_TEXT_RE.search(data)
+            text = match.group(1) if match else ""
+            if _LLM_RESULT_MARKER in data:
+                self.done = True
+        else:
+            text = data
+
+        self._chunks.append(text)
+        return text
+
+    def feed_line(self, line: Union[bytes, str]) -> Optional[str]:
+        """Feed one raw SSE line; non-data lines return None"""
+        data = sse_data(line)
+        if data is None:
+            return None
+        return self.feed(data)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
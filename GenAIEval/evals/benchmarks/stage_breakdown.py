@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+ChatQnA Stage Breakdown
+Benchmarks every microservice of the ChatQnA pipeline directly and attributes the latency to stages.
+
+Each query runs the megaservice's payload flow against the services' exposed ports
+(resolved like readiness.default_checks: the CHATQNA_*_PORT variables of set_env*.sh, else the
+ports of the TGI (8889) or vLLM (8890) stack the backend port belongs to):
+  1. embedding  - TEI embedding  POST /embed                 {"inputs": query}
+  2. retrieval  - retriever      POST /v1/retrieval          {"text", "embedding", "k"}
+  3. rerank     - TEI reranking  POST /rerank                {"query", "texts"}
+  4. llm        - vLLM (or TGI)  POST /v1/chat/completions   RAG prompt over the top documents, streamed
+
+The flow runs at every concurrency level as a closed loop, and optionally the end-to-end
+/v1/chatqna request as well. The report gives per-stage latency distributions, the share of
+the end-to-end mean each stage accounts for (the remainder is megaservice overhead), and
+for every stage the concurrency at which its median latency inflated by --saturation-factor
+over the lowest level, i.e. which stage saturates first.
+
+    python stage_breakdown.py --service-url http://localhost:8890 --concurrency 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping
+
+from chatqna_simple_eval import ChatQnAEvaluator, aiohttp
+from eval_stats import describe
+from performance_evaluation import run_load
+from readiness import default_checks
+from sse_decoder import DONE_MARKER, sse_data
+from token_metrics import default_model
+
+STAGES = ("embedding", "retrieval", "rerank", "llm")
+
+# Prompt template of the ChatQnA megaservice
+RAG_PROMPT = """### You are a helpful, respectful and honest assistant to help the user with questions. \
+Please refer to the search results obtained from the local knowledge base. \
+But be careful to not incorporate the information that you think is not relevant to the question. \
+If you don't know the answer to a question, please don't share false information.
+### Search results: {context}
+### Question: {question}
+### Answer:"""
+
+DEFAULT_QUERIES = [
+    "What is artificial intelligence and how does it work?",
+    "Explain the concept of machine learning in simple terms.",
+    "What are the main applications of AI in healthcare?",
+    "How does natural language processing work?",
+    "What is the difference between supervised and unsupervised learning?",
+]
+
+
+# Stage of every service in readiness.default_checks
+_STAGE_SERVICES = {"tei-embedding": "embedding", "retriever": "retrieval", "tei-reranking": "rerank",
+                   "vllm": "llm", "tgi": "llm"}
+
+
+def stage_endpoints(service_url: str, env: Mapping[str, str] = os.environ) -> Dict[str, str]:
+    """Base URL of every stage's service, resolved like the readiness checks"""
+    return {_STAGE_SERVICES[check.name]: check.base_url for check in default_checks(service_url, env)
+            if check.name in _STAGE_SERVICES}
+
+
+class StageClient:
+    """Runs the ChatQnA payload flow stage by stage, timing every stage
+
+    test_query_async has the signature and result fields of ChatQnAEvaluator's, so the
+    performance_evaluation closed loop drives both.
+    """
+
+    def __init__(self, endpoints: Dict[str, str], llm_model: str, k: int = 4, top_n: int = 1,
+                 max_tokens: int = 128, keep_alive: bool = True):
+        self.endpoints = endpoints
+        self.llm_model = llm_model
+        self.k = k
+        self.top_n = top_n
+        self.max_tokens = max_tokens
+        self.keep_alive = keep_alive
+
+    async def _post_json(self, session, url: str, payload: Dict[str, Any], timeout: int):
+        # The trace config of the shared session records connection reuse into trace_request_ctx
+        async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout),
+                                trace_request_ctx={}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"{url}: HTTP {response.status} {(await response.text())[:200]}")
+            return await response.json(content_type=None)
+
+    async def embed(self, session, query: str, timeout: int) -> List[float]:
+        embeddings = await self._post_json(session, f"{self.endpoints['embedding']}/embed", {"inputs": query}, timeout)
+        return embeddings[0]
+
+    async def retrieve(self, session, query: str, embedding: List[float], timeout: int) -> List[str]:
+        payload = {"text": query, "embedding": embedding, "search_type": "similarity", "k": self.k}
+        response = await self._post_json(session, f"{self.endpoints['retrieval']}/v1/retrieval", payload, timeout)
+        return [doc.get("text", "") for doc in response.get("retrieved_docs", [])]
+
+    async def rerank(self, session, query: str, docs: List[str], timeout: int) -> List[str]:
+        scores = await self._post_json(session, f"{self.endpoints['rerank']}/rerank",
+                                       {"query": query, "texts": docs}, timeout)
+        ranked = sorted(scores, key=lambda item: item["score"], reverse=True)
+        return [docs[item["index"]] for item in ranked[:self.top_n]]
+
+    async def generate(self, session, query: str, docs: List[str], timeout: int) -> Dict[str, Any]:
+        """Stream the answer; returns ttft, output_chunks and the answer"""
+        payload = {
+            "model": self.llm_model,
+            "messages": [{"role": "user", "content": RAG_PROMPT.format(context="\n".join(docs), question=query)}],
+            "max_tokens": self.max_tokens,
+            "stream": True,
+        }
+        start = time.perf_counter()
+        ttft = None
+        chunks = []
+        async with session.post(f"{self.endpoints['llm']}/v1/chat/completions", json=payload,
+                                timeout=aiohttp.ClientTimeout(total=timeout), trace_request_ctx={}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"llm: HTTP {response.status} {(await response.text())[:200]}")
+            async for line in response.content:
+                data = sse_data(line)
+                if not data:
+                    continue
+                if data == DONE_MARKER:
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    chunks.append(content)
+            await response.content.read()
+        return {"ttft": ttft if ttft is not None else time.perf_counter() - start,
+                "output_chunks": len(chunks), "response": "".join(chunks)}
+
+    async def test_query_async(self, session, query: str, timeout: int = 120) -> Dict[str, Any]:
+        """One pass through all stages; stages holds the seconds every stage took"""
+        stages = {}
+        stage = STAGES[0]
+        start = time.perf_counter()
+        try:
+            stage_start = time.perf_counter()
+            embedding = await self.embed(session, query, timeout)
+            stages["embedding"] = time.perf_counter() - stage_start
+
+            stage, stage_start = "retrieval", time.perf_counter()
+            docs = await self.retrieve(session, query, embedding, timeout)
+            stages["retrieval"] = time.perf_counter() - stage_start
+
+            stage, stage_start = "rerank", time.perf_counter()
+            # Like the megaservice, an empty retrieval goes to the LLM without context
+            docs = await self.rerank(session, query, docs, timeout) if docs else []
+            stages["rerank"] = time.perf_counter() - stage_start
+
+            stage, stage_start = "llm", time.perf_counter()
+            generation = await self.generate(session, query, docs, timeout)
+            stages["llm"] = time.perf_counter() - stage_start
+        except Exception as e:
+            return {"query": query, "response": "", "response_time": time.perf_counter() - start,
+                    "status": "exception", "failed_stage": stage, "stages": stages,
+                    "error": str(e) or e.__class__.__name__}
+        return {"query": query, "response": generation["response"], "response_time": time.perf_counter() - start,
+                "status": "success", "stages": stages, "ttft": generation["ttft"],
+                "output_chunks": generation["output_chunks"], "retrieved_docs": len(docs)}
+
+
+def level_report(concurrency: int, pipeline: Dict[str, Any], e2e: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Stage distributions and the attribution of the end-to-end mean at one concurrency level"""
+    ok = [r for r in pipeline["results"] if r["status"] == "success"]
+    stages = {stage: describe([r["stages"][stage] for r in ok]) for stage in STAGES}
+    stage_sum = sum(stats["mean"] for stats in stages.values())
+    failures: Dict[str, Dict[str, Any]] = {}
+    for r in pipeline["results"]:
+        if r["status"] != "success":
+            failure = failures.setdefault(r["failed_stage"], {"count": 0, "error": r["error"]})
+            failure["count"] += 1
+
+    report = {
+        "concurrency": concurrency,
+        "requests": len(pipeline["results"]),
+        "successful": len(ok),
+        "failures_by_stage": failures,
+        "pipeline_throughput": len(ok) / pipeline["elapsed"] if pipeline["elapsed"] > 0 else 0,
+        "stages": stages,
+        "llm_ttft": describe([r["ttft"] for r in ok]),
+        "stage_sum_mean": stage_sum,
+        "e2e": None,
+    }
+    if e2e is not None:
+        e2e_ok = [r for r in e2e["results"] if r["status"] == "success"]
+        e2e_stats = describe([r["response_time"] for r in e2e_ok])
+        reference = e2e_stats["mean"] if e2e_ok else stage_sum
+        report["e2e"] = {
+            "latency": e2e_stats,
+            "ttft": describe([r["ttft"] for r in e2e_ok]),
+            "throughput": len(e2e_ok) / e2e["elapsed"] if e2e["elapsed"] > 0 else 0,
+            "overhead_mean": reference - stage_sum,
+        }
+    else:
+        reference = stage_sum
+    report["attribution"] = {stage: stats["mean"] / reference if reference else 0 for stage, stats in stages.items()}
+    if e2e is not None:
+        report["attribution"]["overhead"] = report["e2e"]["overhead_mean"] / reference if reference else 0
+    return report
+
+
+def saturation(levels: List[Dict[str, Any]], factor: float) -> Dict[str, Any]:
+    """Per stage: median latency inflation over the lowest level and where it first reaches factor"""
+    base = levels[0]
+    stages = {}
+    for stage in STAGES:
+        base_p50 = base["stages"][stage]["p50"]
+        inflation = [level["stages"][stage]["p50"] / base_p50 if base_p50 else 0 for level in levels]
+        saturated = next((level["concurrency"] for level, value in zip(levels, inflation) if value >= factor), None)
+        stages[stage] = {"inflation": inflation, "saturated_at": saturated}
+    saturating = [stage for stage in STAGES if stages[stage]["saturated_at"] is not None]
+    first = min(saturating, key=lambda stage: (stages[stage]["saturated_at"],
+                                               -max(stages[stage]["inflation"]))) if saturating else None
+    return {"factor": factor, "stages": stages, "first_to_saturate": first}
+
+
+def print_breakdown(report: Dict[str, Any]):
+    levels = report["levels"]
+    print("\n" + "="*100)
+    print("STAGE LATENCY BREAKDOWN (p50 ms; share of the end-to-end mean)")
+    print("="*100)
+    header = f"{'conc':>5} " + " ".join(f"{stage:>17}" for stage in STAGES) + f" {'LLM TTFT':>9} {'sum':>8} {'e2e':>8} {'overhead':>9}"
+    print(header)
+    for level in levels:
+        cells = " ".join(f"{level['stages'][stage]['p50'] * 1000:>9.1f} ({level['attribution'][stage] * 100:>4.0f}%)"
+                         for stage in STAGES)
+        e2e = level["e2e"]
+        e2e_cells = (f"{e2e['latency']['mean'] * 1000:>8.1f} {e2e['overhead_mean'] * 1000:>9.1f}"
+                     if e2e else f"{'-':>8} {'-':>9}")
+        print(f"{level['concurrency']:>5} {cells} {level['llm_ttft']['p50'] * 1000:>9.1f} "
+              f"{level['stage_sum_mean'] * 1000:>8.1f} {e2e_cells}")
+        for stage, failure in level["failures_by_stage"].items():
+            print(f"      ⚠️  {failure['count']} failed at {stage}: {failure['error'][:80]}")
+
+    sat = report["saturation"]
+    print(f"\nMedian latency inflation vs concurrency {levels[0]['concurrency']} "
+          f"(saturated at >= {sat['factor']:g}x):")
+    for stage in STAGES:
+        info = sat["stages"][stage]
+        where = f"saturated at concurrency {info['saturated_at']}" if info["saturated_at"] else "not saturated"
+        print(f"  {stage:<10} " + " ".join(f"{value:>5.2f}x" for value in info["inflation"]) + f"  {where}")
+    if sat["first_to_saturate"]:
+        print(f"\n🔥 First stage to saturate: {sat['first_to_saturate']} "
+              f"(concurrency {sat['stages'][sat['first_to_saturate']]['saturated_at']})")
+    else:
+        print("\n✅ No stage saturated over the tested concurrency levels")
+
+
+def run_breakdown(service_url: str, concurrency_levels: List[int], requests_per_level: int, queries: List[str],
+                  llm_model: str, max_tokens: int = 128, k: int = 4, top_n: int = 1, e2e: bool = True,
+                  query_timeout: int = 120, saturation_factor: float = 2.0) -> Dict[str, Any]:
+    endpoints = stage_endpoints(service_url)
+    missing = [stage for stage in STAGES if stage not in endpoints]
+    if missing:
+        raise ValueError(f"No ports for the {', '.join(missing)} stages of {service_url}, "
+                         "source set_env.sh or set_env_vllm.sh")
+    client = StageClient(endpoints, llm_model, k, top_n, max_tokens)
+    evaluator = ChatQnAEvaluator(service_url, max_tokens=max_tokens) if e2e else None
+    print(f"🚀 Stage breakdown of {service_url} at concurrency {concurrency_levels}")
+    for stage in STAGES:
+        print(f"  {stage}: {endpoints[stage]}")
+
+    levels = []
+    for concurrency in concurrency_levels:
+        requests = max(requests_per_level, concurrency)
+        print(f"\n▶️  Concurrency {concurrency}: {requests} pipeline passes"
+              + (" and end-to-end requests" if e2e else ""))
+        pipeline = asyncio.run(run_load(client, queries, concurrency, query_timeout, requests=requests, seed=0))
+        e2e_run = asyncio.run(run_load(evaluator, queries, concurrency, query_timeout, requests=requests,
+                                       seed=0)) if e2e else None
+        levels.append(level_report(concurrency, pipeline, e2e_run))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "service_url": service_url,
+        "endpoints": endpoints,
+        "llm_model": llm_model,
+        "max_tokens": max_tokens,
+        "levels": levels,
+        "saturation": saturation(levels, saturation_factor),
+    }
+    print_breakdown(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatQnA per-stage latency breakdown")
+    parser.add_argument("--service-url", default="http://localhost:8890",
+                       help="ChatQnA backend URL; the stage services are on the same host")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8],
+                       help="Concurrency levels, lowest first")
+    parser.add_argument("--requests-per-level", type=int, default=20,
+                       help="Pipeline passes per level (at least the concurrency)")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES,
+                       help="Queries sent through the pipeline")
+    parser.add_argument("--llm-model", default=default_model() or "Qwen/Qwen2.5-7B-Instruct-1M",
+                       help="Model name sent to the LLM service (default: $LLM_MODEL)")
+    parser.add_argument("--max-tokens", type=int, default=128,
+                       help="max_tokens of the LLM and end-to-end requests")
+    parser.add_argument("--k", type=int, default=4, help="Documents retrieved per query")
+    parser.add_argument("--top-n", type=int, default=1, help="Documents kept by the reranker")
+    parser.add_argument("--no-e2e", action="store_true",
+                       help="Skip the end-to-end /v1/chatqna requests")
+    parser.add_argument("--query-timeout", type=int, default=120,
+                       help="Per-request timeout in seconds")
+    parser.add_argument("--saturation-factor", type=float, default=2.0,
+                       help="Median latency inflation over the lowest level that counts as saturated")
+    parser.add_argument("--output", default=None, help="Write the report as JSON to this file")
+
+    args = parser.parse_args()
+    if aiohttp is None:
+        print("❌ aiohttp is required for the stage breakdown (pip install aiohttp)")
+        return
+    try:
+        report = run_breakdown(args.service_url, sorted(args.concurrency), args.requests_per_level, args.queries,
+                               args.llm_model, args.max_tokens, args.k, args.top_n, not args.no_e2e,
+                               args.query_timeout, args.saturation_factor)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,32 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: Apache-2.0
 
-import json
 import logging
 import os
-import re
+import random
 import sys
 import threading
 import time
 
 import gevent
-import sseclient
-import transformers
+import gevent.pool
 from locust import HttpUser, between, events, task
 from locust.runners import STATE_CLEANUP, STATE_STOPPED, STATE_STOPPING, MasterRunner, WorkerRunner
+from requests.adapters import HTTPAdapter
+
+try:
+    # Keeps locust's adapter behaviour (CA certificates loaded once)
+    from locust.clients import LocustHttpAdapter
+except ImportError:
+    LocustHttpAdapter = None
 
 cwd = os.path.dirname(__file__)
 sys.path.append(cwd)
 
+from response_extractors import get_extractor  # noqa: E402
+from streaming_stats import RequestStatsAggregator, format_summary  # noqa: E402
+from tokenization import DEFAULT_CACHE_DIR, BatchedStatics, load_tokenizer  # noqa: E402
+
 
 @events.init_command_line_parser.add_listener
 def _(parser):
@@ -115,20 +124,188 @@ def _(parser):
         env_var="OPEA_EVAL_CHAT_TEMPLATE",
         help="Specify the chat template for the service",
     )
+    parser.add_argument(
+        "--exact-stats",
+        type=str,
+        env_var="OPEA_EVAL_EXACT_STATS",
+        default="false",
+        help="Keep every request data sample on the master for the bench target's exact report instead of "
+        "printing the bounded-memory quantile sketch summary",
+    )
+    parser.add_argument(
+        "--reqdata-log",
+        type=str,
+        env_var="OPEA_EVAL_REQDATA_LOG",
+        default="",
+        help="Append every request data sample received by the master to this JSON-lines file",
+    )
+    parser.add_argument(
+        "--report-batch-size",
+        type=int,
+        env_var="OPEA_EVAL_REPORT_BATCH_SIZE",
+        default=100,
+        help="Number of request data samples a worker buffers before sending them to the master",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        env_var="OPEA_EVAL_REPORT_INTERVAL",
+        default=1.0,
+        help="Seconds between worker report flushes and master request count broadcasts",
+    )
+    parser.add_argument(
+        "--open-loop-rate",
+        type=float,
+        env_var="OPEA_EVAL_OPEN_LOOP_RATE",
+        default=0,
+        help="Requests per second each user issues on an open-loop schedule, 0 keeps the closed loop",
+    )
+    parser.add_argument(
+        "--open-loop-distribution",
+        type=str,
+        env_var="OPEA_EVAL_OPEN_LOOP_DISTRIBUTION",
+        default="poisson",
+        choices=["poisson", "constant"],
+        help="Inter-arrival time distribution of the open-loop schedule",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        env_var="OPEA_EVAL_MAX_IN_FLIGHT",
+        default=64,
+        help="Maximum number of outstanding open-loop requests per user",
+    )
+    parser.add_argument(
+        "--tokenizer-cache-dir",
+        type=str,
+        env_var="OPEA_EVAL_TOKENIZER_CACHE",
+        default=DEFAULT_CACHE_DIR,
+        help="Host-local directory the tokenizer is saved to once and loaded from by every process",
+    )
+    parser.add_argument(
+        "--token-count-batch-size",
+        type=int,
+        env_var="OPEA_EVAL_TOKEN_COUNT_BATCH_SIZE",
+        default=64,
+        help="Finished requests tokenized per batch off the request path, 0 counts tokens inline",
+    )
+    parser.add_argument(
+        "--token-count-stage",
+        type=str,
+        env_var="OPEA_EVAL_TOKEN_COUNT_STAGE",
+        default="worker",
+        choices=["worker", "master"],
+        help="Where responses are tokenized; master ships raw response text so workers only do I/O",
+    )
 
 
 reqlist = []
+request_stats = None  # RequestStatsAggregator, master only
+reporter = None  # WorkerReporter, every runner that runs users
+request_lease = None  # RequestLease, every runner that runs users
+batched_statics = None  # BatchedStatics, unless token counting runs inline
+master_statics = None  # BatchedStatics on the master, --token-count-stage master
 start_ts = 0
 end_ts = 0
 req_total = 0
+req_granted = 0
 last_resp_ts = 0
 
 bench_package = ""
+response_extractor = None  # Chosen from --bench-target at init
 console_logger = logging.getLogger("locust.stats_logger")
 LLM_MODEL = os.getenv("LLM_MODEL", "Qwen/Qwen2.5-14B-Instruct")
 tokenizer = None  # Will be loaded at runtime
 
 
+class WorkerReporter:
+    """Buffers the sent-request counter and request data of a worker.
+
+    Both are sent to the master in batches, when batch_size samples are pending or
+    every interval seconds, instead of one message per request. Request data is either
+    respStatics output (worker_reqdata) or the raw request and response for the master
+    to tokenize (worker_rawdata).
+    """
+
+    def __init__(self, runner, batch_size, interval):
+        self.runner = runner
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending_sent = 0
+        self._batches = {"worker_reqdata": [], "worker_rawdata": []}
+        self._lock = threading.Lock()
+
+    def request_sent(self):
+        with self._lock:
+            self.pending_sent += 1
+
+    def request_done(self, reqdata):
+        self._add("worker_reqdata", reqdata)
+
+    def request_raw(self, req_data, resp_data, extra=None):
+        self._add("worker_rawdata", [req_data, resp_data, extra])
+
+    def _add(self, msg_type, item):
+        with self._lock:
+            self._batches[msg_type].append(item)
+            full = len(self._batches[msg_type]) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            sent, self.pending_sent = self.pending_sent, 0
+            batches = {msg_type: batch for msg_type, batch in self._batches.items() if batch}
+            for msg_type in batches:
+                self._batches[msg_type] = []
+        if sent:
+            self.runner.send_message("worker_reqsent", sent)
+        for msg_type, batch in batches.items():
+            self.runner.send_message(msg_type, batch)
+
+    def run(self):
+        while True:
+            gevent.sleep(self.interval)
+            self.flush()
+
+
+class RequestLease:
+    """Request credits granted by the master when --max-request is set.
+
+    A worker only sends a request while it holds a credit, so the total over all workers
+    never exceeds --max-request even though sent counters are reported in batches.
+    The next lease is requested ahead of time, when half of the current one is used.
+    """
+
+    def __init__(self, runner, lease_size):
+        self.runner = runner
+        self.lease_size = max(1, lease_size)
+        self.credits = 0
+        self.exhausted = False
+        self._requested = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            acquired = self.credits > 0
+            if acquired:
+                self.credits -= 1
+            ask = not self._requested and not self.exhausted and self.credits <= self.lease_size // 2
+            if ask:
+                self._requested = True
+        # Sent outside the lock, the local runner delivers the grant synchronously
+        if ask:
+            self.runner.send_message("worker_lease", self.lease_size)
+        return acquired
+
+    def grant(self, credits):
+        with self._lock:
+            self._requested = False
+            self.credits += credits
+            if credits == 0:
+                self.exhausted = True
+
+
 class AiStressUser(HttpUser):
     request = 0
     _lock = threading.Lock()
@@ -137,11 +314,30 @@ class AiStressUser(HttpUser):
         super().__init__(*args, **kwargs)
         global tokenizer
         self.environment.tokenizer = tokenizer
+        if self.environment.parsed_options.open_loop_rate > 0:
+            # Up to --max-in-flight greenlets share this session; requests' default pool keeps
+            # only 10 connections and would discard and reopen the others on every request
+            pool_size = self.environment.parsed_options.max_in_flight
+            for prefix in ("http://", "https://"):
+                if LocustHttpAdapter is not None:
+                    adapter = LocustHttpAdapter(None, pool_maxsize=pool_size)
+                else:
+                    adapter = HTTPAdapter(pool_maxsize=pool_size)
+                self.client.mount(prefix, adapter)
 
     @task
     def bench_main(self):
         max_request = self.environment.parsed_options.max_request
-        if max_request >= 0 and AiStressUser.request >= max_request:
+        if self.environment.parsed_options.open_loop_rate > 0:
+            if max_request < 0 or not request_lease.exhausted:
+                self.run_open_loop()
+            time.sleep(1)
+            return
+        if max_request >= 0 and not request_lease.acquire():
+            if not request_lease.exhausted:
+                # Next lease from the master is on its way
+                time.sleep(0.01)
+                return
             # For custom load shape based on arrival_rate, new users spawned after exceeding max_request is reached will be stopped.
             # TODO: user should not care about load shape
             if "arrival_rate" in self.environment.parsed_options:
@@ -149,9 +345,49 @@ class AiStressUser(HttpUser):
 
             time.sleep(1)
             return
+        self.send_request()
+
+        # For custom load shape based on arrival_rate, a user only sends single request before it sleeps.
+        # TODO: user should not care about load shape, use --open-loop-rate instead
+        if "arrival_rate" in self.environment.parsed_options:
+            time.sleep(365 * 60 * 60)
+
+    def run_open_loop(self):
+        """Issue requests on an open-loop timeline of --open-loop-rate requests per second.
+
+        Each request is dispatched from a bounded greenlet pool at its scheduled time,
+        whether or not earlier ones have completed. When the pool is full or a
+        --max-request lease is pending the dispatch is late; that delay is reported as
+        schedule_lag next to the latency instead of being hidden in it.
+        """
+        options = self.environment.parsed_options
+        rate = options.open_loop_rate
+        poisson = options.open_loop_distribution == "poisson"
+        rng = random.Random()
+        pool = gevent.pool.Pool(options.max_in_flight)
+        # Random phase so the users of a constant-rate run do not fire in lockstep
+        next_ts = time.perf_counter() + (rng.expovariate(rate) if poisson else rng.uniform(0, 1 / rate))
+        try:
+            while True:
+                delay = next_ts - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                while options.max_request >= 0 and not request_lease.acquire():
+                    if request_lease.exhausted:
+                        pool.join()
+                        return
+                    time.sleep(0.01)
+                pool.wait_available()
+                pool.spawn(self.send_request, time.perf_counter() - next_ts)
+                next_ts += rng.expovariate(rate) if poisson else 1 / rate
+        finally:
+            # The user is being stopped, do not leave requests running behind it
+            pool.kill(block=False)
+
+    def send_request(self, schedule_lag=None):
         with AiStressUser._lock:
             AiStressUser.request += 1
-            self.environment.runner.send_message("worker_reqsent", 1)
+        reporter.request_sent()
         reqData = bench_package.getReqData()
         url = bench_package.getUrl()
         streaming_bench_target = [
@@ -209,59 +445,13 @@ class AiStressUser(HttpUser):
                         }
                     else:
                         first_token_ts = None
-                        complete_response = ""
-                        if self.environment.parsed_options.bench_target == "llmservefixed":
-                            client = sseclient.SSEClient(resp)
-                            for event in client.events():
-                                if first_token_ts is None:
-                                    first_token_ts = time.perf_counter()
-                                try:
-                                    data = json.loads(event.data)
-                                    if "choices" in data and len(data["choices"]) > 0:
-                                        delta = data["choices"][0].get("delta", {})
-                                        content = delta.get("content", "")
-                                        complete_response += content
-                                except json.JSONDecodeError:
-                                    continue
-                        elif self.environment.parsed_options.bench_target in ["faqgenfixed", "faqgenbench"]:
-                            client = sseclient.SSEClient(resp)
-                            for event in client.events():
-                                if first_token_ts is None:
-                                    first_token_ts = time.perf_counter()
-                                try:
-                                    data = json.loads(event.data)
-                                    for op in data["ops"]:
-                                        if op["path"] == "/logs/HuggingFaceEndpoint/final_output":
-                                            generations = op["value"].get("generations", [])
-                                            for generation in generations:
-                                                for item in generation:
-                                                    text = item.get("text", "")
-                                                    complete_response += text
-                                except json.JSONDecodeError:
-                                    continue
-                        else:
-                            client = sseclient.SSEClient(resp)
-                            for event in client.events():
-                                if event.data == "[DONE]":
-                                    break
-                                else:
-                                    if first_token_ts is None:
-                                        first_token_ts = time.perf_counter()
-                                    chunk = event.data.strip()
-                                    if chunk.startswith("b'") and chunk.endswith("'"):
-                                        chunk = chunk[2:-1]
-                                        complete_response += chunk
-                                    elif re.search(r'"type":"LLMResult"', chunk):
-                                        match = re.search(r'"text":"(.*?)"', chunk)
-                                        if match:
-                                            extracted_text = match.group(1)
-                                            complete_response += extracted_text
-                                        break
-                                    else:
-                                        match = re.search(r'"text":"(.*?)"', chunk)
-                                        if match:
-                                            extracted_text = match.group(1)
-                                            complete_response += extracted_text
+                        extractor = response_extractor()
+                        for line in resp.iter_lines():
+                            if extractor.feed_line(line) is not None and first_token_ts is None:
+                                first_token_ts = time.perf_counter()
+                            if extractor.done:
+                                break
+                        complete_response = extractor.text
                         end_ts = time.perf_counter()
                         respData = {
                             "response_string": complete_response,
@@ -269,9 +459,17 @@ class AiStressUser(HttpUser):
                             "total_latency": end_ts - start_ts,
                             "test_start_time": test_start_time,
                         }
-                    reqdata = bench_package.respStatics(self.environment, reqData, respData)
-                    logging.debug(f"Request data collected {reqdata}")
-                    self.environment.runner.send_message("worker_reqdata", reqdata)
+                    extra = {"schedule_lag": schedule_lag * 1000} if schedule_lag is not None else None
+                    if self.environment.parsed_options.token_count_stage == "master":
+                        reporter.request_raw(reqData, respData, extra)
+                    elif batched_statics is not None:
+                        batched_statics.submit(reqData, respData, extra)
+                    else:
+                        reqdata = bench_package.respStatics(self.environment, reqData, respData)
+                        if extra:
+                            reqdata.update(extra)
+                        logging.debug(f"Request data collected {reqdata}")
+                        reporter.request_done(reqdata)
             logging.debug("Finished response analysis...........................")
         except Exception as e:
             # In case of exception occurs, locust lost the statistic for this request.
@@ -280,11 +478,6 @@ class AiStressUser(HttpUser):
             self.environment.runner.stats.log_request("POST", url, time.perf_counter() - start_ts, 0)
             self.environment.runner.stats.log_error("POST", url, "Locust Request error")
 
-        # For custom load shape based on arrival_rate, a user only sends single request before it sleeps.
-        # TODO: user should not care about load shape
-        if "arrival_rate" in self.environment.parsed_options:
-            time.sleep(365 * 60 * 60)
-
     # def on_stop(self) -> None:
 
 
@@ -296,6 +489,12 @@ def on_test_start(environment, **kwargs):
         console_logger.info(f"Http timeout      : {environment.parsed_options.http_timeout}\n")
         console_logger.info(f"Benchmark target  : {environment.parsed_options.bench_target}\n")
         console_logger.info(f"Load shape        : {environment.parsed_options.load_shape}")
+        if environment.parsed_options.open_loop_rate > 0:
+            console_logger.info(
+                f"Open-loop rate    : {environment.parsed_options.open_loop_rate} req/s per user "
+                f"({environment.parsed_options.open_loop_distribution}), "
+                f"max {environment.parsed_options.max_in_flight} in flight per user"
+            )
         console_logger.info(f"Dataset           : {environment.parsed_options.dataset}")
         console_logger.info(f"Customized prompt : {environment.parsed_options.prompts}")
         console_logger.info(f"Max output tokens : {environment.parsed_options.max_output}")
@@ -303,7 +502,7 @@ def on_test_start(environment, **kwargs):
 
 @events.init.add_listener
 def on_locust_init(environment, **_kwargs):
-    global bench_package, tokenizer
+    global bench_package, batched_statics, master_statics, reporter, request_lease, response_extractor, tokenizer
     os.environ["OPEA_EVAL_DATASET"] = environment.parsed_options.dataset
     os.environ["OPEA_EVAL_SEED"] = environment.parsed_options.seed
     os.environ["OPEA_EVAL_PROMPTS"] = environment.parsed_options.prompts
@@ -313,14 +512,20 @@ def on_locust_init(environment, **_kwargs):
     os.environ["OPEA_EVAL_STREAM"] = environment.parsed_options.stream
     os.environ["OPEA_EVAL_MAX_NEW_TOKENS"] = str(environment.parsed_options.max_new_tokens)
     
-    # Load tokenizer at runtime with the correct model
-    try:
-        tokenizer = transformers.AutoTokenizer.from_pretrained(environment.parsed_options.llm_model)
-        console_logger.info(f"Loaded tokenizer for model: {environment.parsed_options.llm_model}")
-    except Exception as e:
-        console_logger.error(f"Failed to load tokenizer for {environment.parsed_options.llm_model}: {e}")
-        # Fallback to a safe default
-        tokenizer = transformers.AutoTokenizer.from_pretrained("Qwen/Qwen2.5-7B-Instruct")
+    count_on_master = environment.parsed_options.token_count_stage == "master"
+    # Load tokenizer at runtime with the correct model, downloaded once per host.
+    # Workers that ship raw responses to the master never tokenize.
+    cache_dir = environment.parsed_options.tokenizer_cache_dir
+    if count_on_master and isinstance(environment.runner, WorkerRunner):
+        tokenizer = None
+    else:
+        try:
+            tokenizer = load_tokenizer(environment.parsed_options.llm_model, cache_dir)
+            console_logger.info(f"Loaded tokenizer for model: {environment.parsed_options.llm_model}")
+        except Exception as e:
+            console_logger.error(f"Failed to load tokenizer for {environment.parsed_options.llm_model}: {e}")
+            # Fallback to a safe default
+            tokenizer = load_tokenizer("Qwen/Qwen2.5-7B-Instruct", cache_dir)
     if environment.parsed_options.retrieval_k is not None and environment.parsed_options.retrieval_k > 0:
         os.environ["OPEA_EVAL_RETRIEVAL_K"] = str(environment.parsed_options.retrieval_k)
     if environment.parsed_options.rerank_top_n is not None and environment.parsed_options.rerank_top_n > 0:
@@ -329,16 +534,53 @@ def on_locust_init(environment, **_kwargs):
         os.environ["OPEA_EVAL_CHAT_TEMPLATE"] = str(environment.parsed_options.chat_template)
 
     bench_package = __import__(environment.parsed_options.bench_target)
+    response_extractor = get_extractor(environment.parsed_options.bench_target)
 
     if not isinstance(environment.runner, WorkerRunner):
+        global request_stats
+        request_stats = RequestStatsAggregator(spill_path=environment.parsed_options.reqdata_log or None)
         gevent.spawn(checker, environment)
+        gevent.spawn(reqcount_broadcaster, environment)
         environment.runner.register_message("worker_reqdata", on_reqdata)
         environment.runner.register_message("worker_reqsent", on_reqsent)
+        environment.runner.register_message("worker_lease", on_lease)
+        if count_on_master:
+            environment.tokenizer = tokenizer
+            master_statics = BatchedStatics(
+                environment,
+                bench_package,
+                lambda reqdata: record_reqdata(environment, reqdata),
+                max(1, environment.parsed_options.token_count_batch_size),
+            )
+            gevent.spawn(master_statics.run)
+            environment.runner.register_message("worker_rawdata", on_rawdata)
     if not isinstance(environment.runner, MasterRunner):
+        reporter = WorkerReporter(
+            environment.runner,
+            environment.parsed_options.report_batch_size,
+            environment.parsed_options.report_interval,
+        )
+        request_lease = RequestLease(environment.runner, environment.parsed_options.report_batch_size)
+        gevent.spawn(reporter.run)
+        if not count_on_master and environment.parsed_options.token_count_batch_size > 0:
+            environment.tokenizer = tokenizer
+            batched_statics = BatchedStatics(
+                environment, bench_package, reporter.request_done, environment.parsed_options.token_count_batch_size
+            )
+            gevent.spawn(batched_statics.run)
         environment.runner.register_message("all_reqcnt", on_reqcount)
+        environment.runner.register_message("lease_grant", on_lease_grant)
         environment.runner.register_message("test_quit", on_quit)
 
 
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if batched_statics is not None:
+        batched_statics.drain()
+    if reporter is not None:
+        reporter.flush()
+
+
 @events.quitting.add_listener
 def on_locust_quitting(environment, **kwargs):
     if isinstance(environment.runner, WorkerRunner):
@@ -346,24 +588,86 @@ def on_locust_quitting(environment, **kwargs):
         return
 
     logging.debug("#####Running in MasterRunner, DO print statistics")
-    bench_package.staticsOutput(environment, reqlist)
-
-
-def on_reqdata(msg, **kwargs):
-    logging.debug(f"Request data: {msg.data}")
-    reqlist.append(msg.data)
+    if reporter is not None:
+        # Local runner: deliver what is still buffered before printing
+        if batched_statics is not None:
+            batched_statics.drain()
+        reporter.flush()
+    if master_statics is not None:
+        master_statics.drain()
+    request_stats.close()
+    if request_stats.spill_path:
+        console_logger.info(f"Request data log  : {request_stats.spill_path}")
+    if exact_stats_enabled(environment):
+        bench_package.staticsOutput(environment, reqlist)
+    else:
+        for line in format_summary(request_stats.summary()):
+            console_logger.info(line)
+
+
+def exact_stats_enabled(environment):
+    return environment.parsed_options.exact_stats.lower() == "true"
+
+
+def record_reqdata(environment, sample):
+    request_stats.add(sample)
+    # The full sample list is only kept for bench_package.staticsOutput
+    if exact_stats_enabled(environment):
+        reqlist.append(sample)
+    # Load shapes that adapt to measured latencies (sweep_load_shape.py) see every sample
+    shape = environment.shape_class
+    if shape is not None and hasattr(shape, "observe"):
+        shape.observe(sample)
+
+
+def on_reqdata(environment, msg, **kwargs):
+    # Workers send batches, a single dict is still accepted
+    samples = msg.data if isinstance(msg.data, list) else [msg.data]
+    logging.debug(f"Request data: {len(samples)} samples")
+    for sample in samples:
+        record_reqdata(environment, sample)
+
+
+def on_rawdata(environment, msg, **kwargs):
+    logging.debug(f"Raw request data: {len(msg.data)} samples")
+    for req_data, resp_data, extra in msg.data:
+        master_statics.submit(req_data, resp_data, extra)
 
 
 def on_reqsent(environment, msg, **kwargs):
     logging.debug(f"request sent: {msg.data}")
     global req_total
-    req_total += 1
-    environment.runner.send_message("all_reqcnt", req_total)
+    req_total += msg.data
+
+
+def on_lease(environment, msg, **kwargs):
+    global req_granted
+    remaining = max(0, environment.parsed_options.max_request - req_granted)
+    # Shrink leases towards the end so no worker holds credits the others could use
+    workers = getattr(environment.runner, "worker_count", 1) or 1
+    granted = min(msg.data, remaining, max(1, remaining // workers))
+    req_granted += granted
+    logging.debug(f"Lease of {granted} requests for {msg.node_id}, {req_granted} granted in total")
+    environment.runner.send_message("lease_grant", granted, client_id=msg.node_id)
+
+
+def reqcount_broadcaster(environment):
+    last_sent = None
+    while environment.runner.state not in [STATE_STOPPING, STATE_STOPPED, STATE_CLEANUP]:
+        gevent.sleep(environment.parsed_options.report_interval)
+        if req_total != last_sent:
+            last_sent = req_total
+            environment.runner.send_message("all_reqcnt", req_total)
 
 
 def on_reqcount(msg, **kwargs):
     logging.debug(f"Update total request: {msg.data}")
-    AiStressUser.request = msg.data
+    # Requests this worker has not reported yet are not in the master's total
+    AiStressUser.request = msg.data + reporter.pending_sent
+
+
+def on_lease_grant(msg, **kwargs):
+    request_lease.grant(msg.data)
 
 
 def on_quit(environment, msg, **kwargs):
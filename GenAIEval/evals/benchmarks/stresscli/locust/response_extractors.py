@@ -0,0 +1,142 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Per bench-target extractors for streamed responses.
+
+aistress picks the extractor class for --bench-target once at init and creates one
+instance per response. Every extractor follows the SSEStreamDecoder interface:
+feed_line() per raw SSE line, `done` once the stream signalled completion and `text`
+for the accumulated answer. JSON payloads are parsed with orjson when it is installed.
+
+Run this module directly for a micro-benchmark of the parse cost per token:
+
+    python response_extractors.py
+"""
+
+import json
+import os
+import sys
+import timeit
+from typing import Dict, Optional, Type
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from sse_decoder import DONE_MARKER, SSEStreamDecoder  # noqa: E402
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    JSON_PARSER = "orjson"
+except ImportError:
+    json_loads = json.loads
+    JSON_PARSER = "json"
+
+_EXTRACTORS: Dict[str, Type[SSEStreamDecoder]] = {}
+
+
+def register_extractor(*bench_targets):
+    """Class decorator registering an extractor for the given bench targets."""
+
+    def decorator(cls):
+        for bench_target in bench_targets:
+            _EXTRACTORS[bench_target] = cls
+        return cls
+
+    return decorator
+
+
+def get_extractor(bench_target: str) -> Type[SSEStreamDecoder]:
+    """Extractor class for a bench target, ChatQnA-style SSE decoding by default."""
+    return _EXTRACTORS.get(bench_target, SSEStreamDecoder)
+
+
+class JSONEventExtractor(SSEStreamDecoder):
+    """Base class for streams whose events are JSON documents."""
+
+    def feed(self, data: str) -> Optional[str]:
+        if not data:
+            return None
+        if data == DONE_MARKER:
+            self.done = True
+            return None
+        try:
+            event = json_loads(data)
+        except ValueError:
+            # Still an event from the server, it just carries no text
+            return ""
+        text = self.extract(event)
+        self._chunks.append(text)
+        return text
+
+    def extract(self, event) -> str:
+        raise NotImplementedError
+
+
+@register_extractor("llmservefixed")
+class OpenAIChatExtractor(JSONEventExtractor):
+    """OpenAI-compatible /v1/chat/completions chunks (vLLM, TGI)."""
+
+    def extract(self, event) -> str:
+        choices = event.get("choices")
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+
+@register_extractor("faqgenfixed", "faqgenbench")
+class LangchainLogExtractor(JSONEventExtractor):
+    """Langchain astream_log patches, only the final HuggingFaceEndpoint output carries text."""
+
+    FINAL_OUTPUT_PATH = "/logs/HuggingFaceEndpoint/final_output"
+
+    def extract(self, event) -> str:
+        texts = []
+        for op in event.get("ops", ()):
+            if op["path"] == self.FINAL_OUTPUT_PATH:
+                for generation in op["value"].get("generations", []):
+                    for item in generation:
+                        texts.append(item.get("text", ""))
+        return "".join(texts)
+
+
+def _sample_events():
+    """One representative SSE line per bench target format."""
+    openai_chunk = (
+        '{"id":"chatcmpl-1","object":"chat.completion.chunk","created":1,"model":"m",'
+        '"choices":[{"index":0,"delta":{"content":" token"},"logprobs":null,"finish_reason":null}]}'
+    )
+    faqgen_chunk = (
+        '{"ops":[{"op":"add","path":"/logs/HuggingFaceEndpoint/final_output",'
+        '"value":{"generations":[[{"text":" token","generation_info":null}]]}}]}'
+    )
+    return {
+        "chatqnafixed (bytes literal)": ("chatqnafixed", "data: b' token'"),
+        "chatqnafixed (json text)": ("chatqnafixed", 'data: {"type":"chunk","text":" token"}'),
+        "llmservefixed": ("llmservefixed", "data: " + openai_chunk),
+        "faqgenfixed": ("faqgenfixed", "data: " + faqgen_chunk),
+    }
+
+
+def main(num_tokens: int = 1000):
+    streams = _sample_events()
+    print(f"JSON parser: {JSON_PARSER}, {num_tokens} tokens per stream")
+    for name, (bench_target, line) in streams.items():
+        extractor_cls = get_extractor(bench_target)
+        lines = [line] * num_tokens + ["data: [DONE]"]
+
+        def parse():
+            extractor = extractor_cls()
+            for raw in lines:
+                extractor.feed_line(raw)
+                if extractor.done:
+                    break
+            return extractor.text
+
+        runs = 20
+        per_token_ns = min(timeit.repeat(parse, number=runs, repeat=3)) / runs / num_tokens * 1e9
+        print(f"  {name:<30} {extractor_cls.__name__:<22} {per_token_ns:8.0f} ns/token")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Bounded-memory aggregation of per-request benchmark data.
+
+The aistress master folds every request data sample sent by the workers into
+relative-error quantile sketches instead of keeping the samples in a list, and can
+spill the raw samples to an append-only JSON-lines log so a crashed or very long run
+can still be analysed afterwards:
+
+    python streaming_stats.py reqdata.jsonl
+"""
+
+import json
+import math
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional
+
+# Fields of bench_package.respStatics() samples that are summarised by default,
+# schedule_lag is only present for open-loop runs
+DEFAULT_FIELDS = ("first_token", "next_token", "total_latency", "tokens_input", "tokens_output", "schedule_lag")
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with a bounded relative error on every quantile.
+
+    Values are counted in buckets whose bounds grow geometrically (the HDR histogram /
+    DDSketch layout), so memory depends on the dynamic range of the data, not on the
+    number of samples: 1 ms to 1 h at 1% relative error needs fewer than 800 buckets.
+    """
+
+    def __init__(self, relative_error: float = 0.01):
+        self.relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self._zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._zero_count += other._zero_count
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return min(self.min, 0.0)
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                estimate = 2 * self._gamma**index / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        result = {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+        }
+        for q in QUANTILES:
+            result[f"p{q * 100:g}"] = self.quantile(q)
+        return result
+
+
+class RequestStatsAggregator:
+    """Folds request data samples into one QuantileSketch per numeric field.
+
+    With spill_path set every sample is also appended to that file as one JSON line;
+    the file is flushed at least every flush_interval seconds.
+    """
+
+    def __init__(self, spill_path: Optional[str] = None, fields=DEFAULT_FIELDS, flush_interval: float = 1.0):
+        self.fields = tuple(fields)
+        self.sketches = {field: QuantileSketch() for field in self.fields}
+        self.num_samples = 0
+        self.spill_path = spill_path
+        self.flush_interval = flush_interval
+        self._spill = open(spill_path, "a", encoding="utf-8") if spill_path else None
+        self._last_flush = time.monotonic()
+
+    def add(self, sample: Dict[str, Any]):
+        self.num_samples += 1
+        for field in self.fields:
+            value = sample.get(field)
+            if isinstance(value, (int, float)) and not math.isnan(value):
+                self.sketches[field].add(value)
+        if self._spill is not None:
+            self._spill.write(json.dumps(sample) + "\n")
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._spill.flush()
+                self._last_flush = now
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "num_samples": self.num_samples,
+            "fields": {field: sketch.summary() for field, sketch in self.sketches.items()},
+        }
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+def read_reqdata_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Samples from a spill log; a truncated last line (crash mid-write) is skipped"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def format_summary(summary: Dict[str, Any]):
+    """Lines of a fixed-width table for a RequestStatsAggregator summary"""
+    columns = ["mean", "min", "p50", "p90", "p99", "p99.9", "max"]
+    lines = [
+        f"Requests aggregated : {summary['num_samples']}",
+        f"{'field':<16}{'count':>10}" + "".join(f"{c:>12}" for c in columns),
+    ]
+    for field, stats in summary["fields"].items():
+        if stats["count"] == 0:
+            continue
+        lines.append(f"{field:<16}{stats['count']:>10}" + "".join(f"{stats[c]:>12.2f}" for c in columns))
+    return lines
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: {argv[0]} <reqdata.jsonl>")
+        return 1
+    aggregator = RequestStatsAggregator()
+    for sample in read_reqdata_log(argv[1]):
+        aggregator.add(sample)
+    for line in format_summary(aggregator.summary()):
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,231 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Adaptive concurrency sweep that finds the saturation knee of a service in one run.
+
+Load it next to aistress.py:
+
+    locust -f aistress.py,sweep_load_shape.py --headless -H http://localhost:8890 \\
+        --sweep-ttft-slo 2000 --sweep-output sweep.json
+
+Concurrency starts at --sweep-start-users and grows by --sweep-factor per step. Each
+step is measured for --sweep-step-time seconds once all its users are running; the
+aistress master hands every request data sample to observe(). The sweep stops when the
+p99 TTFT breaches the SLO, throughput stops growing by more than --sweep-plateau, or
+--sweep-max-users is reached, and reports the throughput/latency curve with its knee:
+the lowest concurrency that delivers (1 - plateau) of the best throughput within the SLO.
+"""
+
+import json
+import logging
+import math
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from locust import LoadTestShape, events
+
+sys.path.append(os.path.dirname(__file__))
+
+from streaming_stats import QuantileSketch  # noqa: E402
+
+console_logger = logging.getLogger("locust.stats_logger")
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--sweep-start-users",
+        type=int,
+        env_var="OPEA_EVAL_SWEEP_START_USERS",
+        default=1,
+        help="Concurrency of the first sweep step",
+    )
+    parser.add_argument(
+        "--sweep-factor",
+        type=float,
+        env_var="OPEA_EVAL_SWEEP_FACTOR",
+        default=2.0,
+        help="Concurrency multiplier between sweep steps",
+    )
+    parser.add_argument(
+        "--sweep-max-users",
+        type=int,
+        env_var="OPEA_EVAL_SWEEP_MAX_USERS",
+        default=256,
+        help="Highest concurrency the sweep tries",
+    )
+    parser.add_argument(
+        "--sweep-step-time",
+        type=float,
+        env_var="OPEA_EVAL_SWEEP_STEP_TIME",
+        default=60,
+        help="Seconds each sweep step is measured once its users are running",
+    )
+    parser.add_argument(
+        "--sweep-ttft-slo",
+        type=float,
+        env_var="OPEA_EVAL_SWEEP_TTFT_SLO",
+        default=0,
+        help="p99 time to first token SLO in ms, 0 disables the SLO check",
+    )
+    parser.add_argument(
+        "--sweep-plateau",
+        type=float,
+        env_var="OPEA_EVAL_SWEEP_PLATEAU",
+        default=0.05,
+        help="Relative throughput gain below which the sweep considers throughput saturated",
+    )
+    parser.add_argument(
+        "--sweep-output",
+        type=str,
+        env_var="OPEA_EVAL_SWEEP_OUTPUT",
+        default="",
+        help="Write the sweep curve and knee point to this JSON file",
+    )
+
+
+@dataclass
+class SweepStep:
+    users: int
+    duration: float
+    requests: int
+    throughput: float  # requests/s
+    token_throughput: float  # output tokens/s
+    ttft_p50: float  # ms
+    ttft_p99: float  # ms
+    latency_p99: float  # ms
+
+
+class SweepWindow:
+    """Request data samples completed during one sweep step"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.requests = 0
+        self.tokens_output = 0
+        self.ttft = QuantileSketch()
+        self.latency = QuantileSketch()
+
+    def add(self, sample):
+        self.requests += 1
+        tokens_output = sample.get("tokens_output")
+        if isinstance(tokens_output, (int, float)):
+            self.tokens_output += tokens_output
+        first_token = sample.get("first_token")
+        if isinstance(first_token, (int, float)):
+            self.ttft.add(first_token)
+        total_latency = sample.get("total_latency")
+        if isinstance(total_latency, (int, float)):
+            self.latency.add(total_latency)
+
+    def result(self, users) -> SweepStep:
+        duration = time.monotonic() - self.start
+        return SweepStep(
+            users=users,
+            duration=duration,
+            requests=self.requests,
+            throughput=self.requests / duration,
+            token_throughput=self.tokens_output / duration,
+            ttft_p50=self.ttft.quantile(0.5),
+            ttft_p99=self.ttft.quantile(0.99),
+            latency_p99=self.latency.quantile(0.99),
+        )
+
+
+def find_knee(steps: List[SweepStep], ttft_slo: float, plateau: float) -> Optional[SweepStep]:
+    """Lowest concurrency within (1 - plateau) of the best throughput that meets the SLO"""
+    candidates = [step for step in steps if not ttft_slo or step.ttft_p99 <= ttft_slo]
+    if not candidates:
+        return None
+    best = max(step.throughput for step in candidates)
+    return min(
+        (step for step in candidates if step.throughput >= (1 - plateau) * best), key=lambda step: step.users
+    )
+
+
+class SweepLoadShape(LoadTestShape):
+    """Geometric concurrency ramp that stops at throughput saturation or an SLO breach"""
+
+    def __init__(self):
+        super().__init__()
+        self.steps: List[SweepStep] = []
+        self.users = 0
+        self.window: Optional[SweepWindow] = None
+        self.stop_reason = None
+
+    def observe(self, sample):
+        """Called by the aistress master for every request data sample"""
+        if self.window is not None:
+            self.window.add(sample)
+
+    def tick(self):
+        if self.stop_reason is not None:
+            return None
+        options = self.runner.environment.parsed_options
+        if self.users == 0:
+            self.users = max(1, options.sweep_start_users)
+            console_logger.info(f"Sweep step        : {self.users} users")
+        elif self.window is None:
+            # Measure once every user of the step is running
+            if self.get_current_user_count() >= self.users:
+                self.window = SweepWindow()
+        elif time.monotonic() - self.window.start >= options.sweep_step_time:
+            step = self.window.result(self.users)
+            self.window = None
+            self.steps.append(step)
+            console_logger.info(
+                f"Sweep result      : {step.users} users, {step.throughput:.2f} req/s, "
+                f"{step.token_throughput:.1f} tokens/s, p99 TTFT {step.ttft_p99:.1f} ms"
+            )
+            self.stop_reason = self.check_stop(step, options)
+            if self.stop_reason is not None:
+                self.report(options)
+                return None
+            self.users = min(options.sweep_max_users, math.ceil(self.users * options.sweep_factor))
+            console_logger.info(f"Sweep step        : {self.users} users")
+        return self.users, self.users
+
+    def check_stop(self, step, options):
+        if options.sweep_ttft_slo and step.ttft_p99 > options.sweep_ttft_slo:
+            return f"p99 TTFT {step.ttft_p99:.1f} ms breached the {options.sweep_ttft_slo:g} ms SLO"
+        previous = self.steps[:-1]
+        if previous:
+            best = max(s.throughput for s in previous)
+            if step.throughput < best * (1 + options.sweep_plateau):
+                return f"throughput plateaued at {step.throughput:.2f} req/s"
+        if step.users >= options.sweep_max_users:
+            return f"reached --sweep-max-users {options.sweep_max_users}"
+        return None
+
+    def report(self, options):
+        knee = find_knee(self.steps, options.sweep_ttft_slo, options.sweep_plateau)
+        console_logger.info(f"Sweep stopped     : {self.stop_reason}")
+        console_logger.info(
+            f"{'users':>8}{'req/s':>10}{'tokens/s':>12}{'p50 TTFT':>12}{'p99 TTFT':>12}{'p99 latency':>14}"
+        )
+        for step in self.steps:
+            marker = "  <- knee" if step is knee else ""
+            console_logger.info(
+                f"{step.users:>8}{step.throughput:>10.2f}{step.token_throughput:>12.1f}"
+                f"{step.ttft_p50:>12.1f}{step.ttft_p99:>12.1f}{step.latency_p99:>14.1f}{marker}"
+            )
+        if knee is None:
+            console_logger.info("Knee point        : none, no step met the TTFT SLO")
+        else:
+            console_logger.info(f"Knee point        : {knee.users} users, {knee.throughput:.2f} req/s")
+        if options.sweep_output:
+            with open(options.sweep_output, "w") as f:
+                json.dump(
+                    {
+                        "stop_reason": self.stop_reason,
+                        "ttft_slo": options.sweep_ttft_slo,
+                        "knee": asdict(knee) if knee is not None else None,
+                        "steps": [asdict(step) for step in self.steps],
+                    },
+                    f,
+                    indent=2,
+                )
+            console_logger.info(f"Sweep curve       : {options.sweep_output}")
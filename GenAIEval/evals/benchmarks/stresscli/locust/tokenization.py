@@ -0,0 +1,119 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tokenizer loading and batched token counting for the aistress processes.
+
+load_tokenizer() (from tokenizer_cache, shared with the evaluators) resolves a model's
+tokenizer once per host into a local cache directory; every other master/worker process
+on the host loads the saved fast (Rust) tokenizer from disk instead of contacting the hub.
+
+BatchedStatics moves bench_package.respStatics() off the request greenlets: finished
+requests are queued, their texts are tokenized in one batch call on a native thread
+and respStatics then runs against those precomputed encodings.
+"""
+
+import logging
+import os
+import sys
+
+import gevent
+import gevent.queue
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from tokenizer_cache import DEFAULT_CACHE_DIR, load_tokenizer  # noqa: E402,F401
+
+
+class PrecomputedTokenizer:
+    """Tokenizer proxy answering encode() from encodings computed ahead of time.
+
+    Texts that were not precomputed fall through to the wrapped tokenizer, as does
+    every other attribute.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.encodings = {}
+
+    def encode(self, text, add_special_tokens=True, **kwargs):
+        ids = self.encodings.get((text, add_special_tokens)) if not kwargs else None
+        if ids is None:
+            return self.tokenizer.encode(text, add_special_tokens=add_special_tokens, **kwargs)
+        return ids
+
+    def precompute(self, texts, add_special_tokens):
+        """Batch-encode texts; run on a native thread, the Rust tokenizer releases the GIL"""
+        texts = [text for text in set(texts) if (text, add_special_tokens) not in self.encodings]
+        if texts:
+            batch = self.tokenizer(texts, add_special_tokens=add_special_tokens)["input_ids"]
+            for text, ids in zip(texts, batch):
+                self.encodings[(text, add_special_tokens)] = ids
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+
+class BatchedStatics:
+    """Runs bench_package.respStatics for finished requests in batches.
+
+    Request greenlets only submit() their request and response data. A drainer greenlet
+    collects up to batch_size of them, tokenizes the prompt strings and responses in
+    one call on the hub's native thread pool and hands every result to on_result.
+    """
+
+    def __init__(self, environment, bench_package, on_result, batch_size=64):
+        self.environment = environment
+        self.bench_package = bench_package
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.tokenizer = PrecomputedTokenizer(environment.tokenizer)
+        self._queue = gevent.queue.Queue()
+
+    def submit(self, req_data, resp_data, extra=None):
+        """Queue a finished request; extra fields are merged into its statistics"""
+        self._queue.put((req_data, resp_data, extra))
+
+    def run(self):
+        while True:
+            batch = [self._queue.get()]
+            self.process(self._take(batch))
+
+    def drain(self):
+        """Process everything still queued, used when the test stops"""
+        batch = self._take([])
+        while batch:
+            self.process(batch)
+            batch = self._take([])
+
+    def _take(self, batch):
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except gevent.queue.Empty:
+                break
+        return batch
+
+    def process(self, batch):
+        prompts = [value for req_data, _, _ in batch if isinstance(req_data, dict) for value in req_data.values()]
+        responses = [resp_data.get("response_string") for _, resp_data, _ in batch]
+
+        def encode_all():
+            self.tokenizer.precompute([text for text in prompts if isinstance(text, str)], True)
+            self.tokenizer.precompute([text for text in responses if isinstance(text, str)], False)
+
+        try:
+            gevent.get_hub().threadpool.apply(encode_all)
+        except Exception as e:
+            # respStatics still works, it falls back to encoding one text at a time
+            logging.error(f"Batch tokenization failed: {e}")
+
+        self.environment.tokenizer = self.tokenizer
+        for req_data, resp_data, extra in batch:
+            try:
+                reqdata = self.bench_package.respStatics(self.environment, req_data, resp_data)
+                if extra:
+                    reqdata.update(extra)
+                self.on_result(reqdata)
+            except Exception as e:
+                logging.error(f"Failed to collect request statistics: {e}")
+        self.tokenizer.encodings.clear()
@@ -0,0 +1,138 @@
+"""
+Token Metrics
+Token-level throughput and goodput of evaluator results.
+
+Responses are counted in tokens of the served model's tokenizer rather than characters,
+so backends with the same model (TGI on 8889, vLLM on 8890) can be compared directly:
+  - prompt_tokens: tokens of the query as sent; the retrieved context the backend adds is not visible here
+  - output_tokens: tokens of the streamed answer
+  - output_tokens_per_second: output_tokens over the request's response time, and in aggregate
+    all output tokens over the run's wall time
+  - goodput: fraction (and rate) of all requests that succeeded within the TTFT and TPOT SLOs
+
+The tokenizer is loaded once per run through tokenizer_cache, the per-host cache stresscli uses,
+and every distinct text is encoded only once. Without a tokenizer (no model configured,
+transformers missing, model not downloadable) output tokens fall back to the number of
+streamed chunks and prompt tokens are left out; the report's token_source says which applies.
+"""
+
+import os
+from typing import Any, Dict, List, Mapping, Optional
+
+from eval_stats import describe
+from tokenizer_cache import DEFAULT_CACHE_DIR, load_tokenizer
+
+# Goodput SLOs in seconds
+DEFAULT_TTFT_SLO = 2.0
+DEFAULT_TPOT_SLO = 0.1
+
+
+def default_model(env: Mapping[str, str] = os.environ) -> Optional[str]:
+    """Model exported by set_env*.sh, if any"""
+    return env.get("LLM_MODEL") or env.get("CHATQNA_LLM_MODEL_ID")
+
+
+class TokenCounter:
+    """Counts tokens with a model's tokenizer, remembering the count of every text it has seen"""
+
+    def __init__(self, model: Optional[str] = None, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.model = model
+        self.tokenizer = None
+        if model:
+            try:
+                self.tokenizer = load_tokenizer(model, cache_dir)
+            except Exception as e:
+                print(f"⚠️  Could not load the tokenizer of {model} ({e}), counting streamed chunks instead")
+        self.source = "tokenizer" if self.tokenizer is not None else "chunks"
+        self._counts: Dict[tuple, int] = {}
+
+    def count_many(self, texts: List[str], add_special_tokens: bool = False) -> List[Optional[int]]:
+        """Token counts of texts, None without a tokenizer; new texts are encoded in one batch"""
+        if self.tokenizer is None:
+            return [None] * len(texts)
+        new = list({text for text in texts if (text, add_special_tokens) not in self._counts})
+        if new:
+            encoded = self.tokenizer(new, add_special_tokens=add_special_tokens)["input_ids"]
+            for text, ids in zip(new, encoded):
+                self._counts[(text, add_special_tokens)] = len(ids)
+        return [self._counts[(text, add_special_tokens)] for text in texts]
+
+
+def annotate(results: List[Dict[str, Any]], counter: TokenCounter):
+    """Add prompt_tokens, output_tokens, output_tokens_per_second and output_tpot to successful results
+
+    output_tpot spreads the time between the first and last streamed chunk over the output
+    tokens after the first, like tpot does over chunks.
+    """
+    ok = [r for r in results if r.get("status") == "success"]
+    prompt_tokens = counter.count_many([r["query"] for r in ok], add_special_tokens=True)
+    output_tokens = counter.count_many([r["response"] for r in ok])
+    for result, prompt, output in zip(ok, prompt_tokens, output_tokens):
+        if output is None:
+            output = result.get("output_chunks", 0)
+        if prompt is not None:
+            result["prompt_tokens"] = prompt
+        result["output_tokens"] = output
+        result["output_tokens_per_second"] = output / result["response_time"] if result["response_time"] > 0 else 0
+        if "tpot" in result:
+            decode_time = result["tpot"] * max(result["output_chunks"] - 1, 0)
+            result["output_tpot"] = decode_time / (output - 1) if output > 1 else 0
+
+
+def goodput(results: List[Dict[str, Any]], duration: Optional[float], ttft_slo: float = DEFAULT_TTFT_SLO,
+            tpot_slo: float = DEFAULT_TPOT_SLO) -> Optional[Dict[str, Any]]:
+    """Requests that succeeded within both SLOs; None when the results carry no streaming timings"""
+    ok = [r for r in results if r.get("status") == "success"]
+    if not ok or not all("ttft" in r and "output_tpot" in r for r in ok):
+        return None
+    good = sum(1 for r in ok if r["ttft"] <= ttft_slo and r["output_tpot"] <= tpot_slo)
+    return {
+        "ttft_slo": ttft_slo,
+        "tpot_slo": tpot_slo,
+        "good_requests": good,
+        "fraction": good / len(results),
+        "requests_per_second": good / duration if duration else None,
+    }
+
+
+def token_summary(results: List[Dict[str, Any]], counter: TokenCounter, duration: Optional[float] = None,
+                  ttft_slo: float = DEFAULT_TTFT_SLO, tpot_slo: float = DEFAULT_TPOT_SLO) -> Dict[str, Any]:
+    """Annotate the results and summarize their tokens; duration is the run's wall time in seconds"""
+    annotate(results, counter)
+    ok = [r for r in results if r.get("status") == "success"]
+    total_output = sum(r["output_tokens"] for r in ok)
+    summary = {
+        "token_source": counter.source,
+        "tokenizer_model": counter.model if counter.tokenizer is not None else None,
+        "output_tokens": {"total": total_output, **describe([r["output_tokens"] for r in ok])},
+        "output_tokens_per_second": describe([r["output_tokens_per_second"] for r in ok]),
+        "aggregate_output_tokens_per_second": total_output / duration if duration else None,
+        "output_tpot": describe([r["output_tpot"] for r in ok if "output_tpot" in r and r["output_tokens"] > 1]),
+        "goodput": goodput(results, duration, ttft_slo, tpot_slo),
+    }
+    if ok and all("prompt_tokens" in r for r in ok):
+        summary["prompt_tokens"] = {"total": sum(r["prompt_tokens"] for r in ok),
+                                    **describe([r["prompt_tokens"] for r in ok])}
+    return summary
+
+
+def format_token_summary(summary: Dict[str, Any]) -> List[str]:
+    """Report lines of a token_summary()"""
+    per_request = summary["output_tokens_per_second"]
+    lines = [f"Output Tokens ({summary['token_source']}): {summary['output_tokens']['total']} total, "
+             f"{summary['output_tokens']['mean']:.1f} per request"]
+    if "prompt_tokens" in summary:
+        lines.append(f"Prompt Tokens: {summary['prompt_tokens']['total']} total, "
+                     f"{summary['prompt_tokens']['mean']:.1f} per request")
+    line = f"Output Tokens/s: {per_request['mean']:.1f} per request (p50 {per_request['p50']:.1f})"
+    if summary["aggregate_output_tokens_per_second"] is not None:
+        line += f", {summary['aggregate_output_tokens_per_second']:.1f} aggregate"
+    lines.append(line)
+    good = summary["goodput"]
+    if good:
+        line = (f"Goodput: {good['good_requests']} requests ({good['fraction'] * 100:.1f}%) within "
+                f"TTFT <= {good['ttft_slo'] * 1000:.0f} ms and TPOT <= {good['tpot_slo'] * 1000:.0f} ms")
+        if good["requests_per_second"] is not None:
+            line += f", {good['requests_per_second']:.2f} req/s"
+        lines.append(line)
+    return lines
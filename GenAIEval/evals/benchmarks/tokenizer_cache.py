@@ -0,0 +1,59 @@
+"""
+Tokenizer Cache
+Loads a model's fast tokenizer once per host into a local cache directory.
+
+Shared by the ChatQnA evaluators (token_metrics.py) and the locust stress harness
+(stresscli/locust/tokenization.py). The first process on the host downloads the tokenizer
+and saves it; a lock file makes concurrent processes wait for it instead of all downloading,
+and every later process loads the saved fast (Rust) tokenizer from disk. Saves are renamed
+into place complete, so a crashed writer never leaves a directory that is trusted.
+"""
+
+import fcntl
+import glob
+import os
+import shutil
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "opea_eval", "tokenizers")
+
+# Written last into a saved tokenizer; a directory without it is from an older or crashed writer
+COMPLETE_MARKER = ".complete"
+
+
+def load_tokenizer(model: str, cache_dir: str = DEFAULT_CACHE_DIR):
+    """Fast tokenizer of a model, saved to and loaded from cache_dir
+
+    The tokenizer is saved into a temporary directory next to its final one and renamed
+    into place under the lock, so a process that finds the directory never reads a
+    half-written tokenizer.
+    """
+    import transformers
+
+    name = model.replace("/", "--")
+    local_dir = os.path.join(cache_dir, name)
+    marker = os.path.join(local_dir, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        return transformers.AutoTokenizer.from_pretrained(local_dir, use_fast=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(local_dir + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(marker):
+                return transformers.AutoTokenizer.from_pretrained(local_dir, use_fast=True)
+            # Only the lock holder writes here: leftovers are partial saves of a crashed writer
+            for stale in glob.glob(os.path.join(cache_dir, name + ".tmp*")) + [local_dir]:
+                shutil.rmtree(stale, ignore_errors=True)
+            tokenizer = transformers.AutoTokenizer.from_pretrained(model, use_fast=True)
+            tmp_dir = tempfile.mkdtemp(prefix=name + ".tmp", dir=cache_dir)
+            try:
+                tokenizer.save_pretrained(tmp_dir)
+                open(os.path.join(tmp_dir, COMPLETE_MARKER), "w").close()
+                os.rename(tmp_dir, local_dir)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            return tokenizer
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
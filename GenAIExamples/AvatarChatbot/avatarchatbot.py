@@ -2,13 +2,28 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import asyncio
+import base64
+import hashlib
+import io
+import json
+import math
 import os
+import re
+import shutil
 import sys
+import unicodedata
+import uuid
+import wave
+from collections import OrderedDict
 
+import aiohttp
+import numpy as np
 from comps import MegaServiceEndpoint, MicroService, ServiceOrchestrator, ServiceRoleType, ServiceType
 from comps.cores.proto.api_protocol import AudioChatCompletionRequest, ChatCompletionResponse
 from comps.cores.proto.docarray import LLMParams
 from fastapi import Request
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Gauge
 
 MEGA_SERVICE_PORT = int(os.getenv("MEGA_SERVICE_PORT", 8888))
 WHISPER_SERVER_HOST_IP = os.getenv("WHISPER_SERVER_HOST_IP", "0.0.0.0")
@@ -20,6 +35,39 @@ SPEECHT5_SERVER_PORT = int(os.getenv("SPEECHT5_SERVER_PORT", 7055))
 ANIMATION_SERVICE_HOST_IP = os.getenv("ANIMATION_SERVICE_HOST_IP", "0.0.0.0")
 ANIMATION_SERVICE_PORT = int(os.getenv("ANIMATION_SERVICE_PORT", 9066))
 
+# Streaming mode: the answer is animated segment by segment while the LLM is still generating
+MIN_SENTENCE_CHARS = int(os.getenv("MIN_SENTENCE_CHARS", 20))
+AUDIO_SEGMENT_SECONDS = float(os.getenv("AUDIO_SEGMENT_SECONDS", 4))
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", 2))
+# Comma-separated animation workers (http://host:port), each rendering to its own wav2lip OUTFILE
+ANIMATION_SERVICE_ENDPOINTS = os.getenv(
+    "ANIMATION_SERVICE_ENDPOINTS", f"http://{ANIMATION_SERVICE_HOST_IP}:{ANIMATION_SERVICE_PORT}"
+).split(",")
+# Segments in flight per worker, across all requests; keep 1 with wav2lip's single OUTFILE
+ANIMATION_CONCURRENCY = int(os.getenv("ANIMATION_CONCURRENCY", 1))
+STREAM_TIMEOUT = int(os.getenv("STREAM_TIMEOUT", 600))
+HLS_ENABLED = os.getenv("HLS_ENABLED", "true").lower() == "true" and shutil.which("ffmpeg") is not None
+# CJK text has no space after full-width punctuation
+SENTENCE_END_RE = re.compile(r"(?<=[.?!;:])\s+|(?<=[。！？；])\s*|\n+")
+# Per-request clips of streamed answers, kept for the clients until they exceed STREAM_OUTPUT_MAX_MB
+STREAM_OUTPUT_DIR = os.getenv("STREAM_OUTPUT_DIR", "/outputs/avatar_streams")
+STREAM_OUTPUT_MAX_MB = int(os.getenv("STREAM_OUTPUT_MAX_MB", 1024))
+
+# Response cache: rendered answers to repeated questions, on the /outputs mount shared with wav2lip
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "/outputs/avatar_cache")
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", 2048))
+# Clients may still be reading an evicted answer they were just given, so it is deleted later
+RESPONSE_CACHE_EVICT_DELAY = int(os.getenv("RESPONSE_CACHE_EVICT_DELAY", 300))
+# Part of the cache key: the avatar figure and the model that wrote the answers
+AVATAR = os.getenv("FACE", "default")
+LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "default")
+
+CACHE_HITS = Counter("avatarchatbot_response_cache_hits_total", "Requests answered from the response cache")
+CACHE_MISSES = Counter("avatarchatbot_response_cache_misses_total", "Requests not found in the response cache")
+CACHE_EVICTIONS = Counter("avatarchatbot_response_cache_evictions_total", "Answers evicted from the response cache")
+CACHE_BYTES = Gauge("avatarchatbot_response_cache_bytes", "Size of the clips in the response cache")
+
 
 def align_inputs(self, inputs, cur_node, runtime_graph, llm_parameters_dict, **kwargs):
     if self.services[cur_node].service_type == ServiceType.LLM:
@@ -47,6 +95,282 @@ def align_inputs(self, inputs, cur_node, runtime_graph, llm_parameters_dict, **k
     return inputs
 
 
+class SentenceSegmenter:
+    """Cuts streamed LLM text into sentences of at least min_chars characters; shorter ones are merged."""
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences, start = [], 0
+        for match in SENTENCE_END_RE.finditer(self.buffer):
+            sentence = self.buffer[start : match.start()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        sentence, self.buffer = self.buffer.strip(), ""
+        return [sentence] if sentence else []
+
+
+def split_wav(wav_bytes, segment_seconds=AUDIO_SEGMENT_SECONDS, search_seconds=0.5):
+    """Split a WAV into (WAV bytes, seconds) pieces of about segment_seconds.
+
+    Each cut is placed at the quietest 20 ms within search_seconds of the target boundary, so words
+    are not cut in half. Audio that is not 16-bit PCM is returned as a single piece.
+    """
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as wav:
+            params = wav.getparams()
+            frames = wav.readframes(params.nframes)
+    except (wave.Error, EOFError):
+        return [(wav_bytes, None)]
+    rate = params.framerate
+    if params.sampwidth != 2 or segment_seconds <= 0 or params.nframes <= 1.5 * segment_seconds * rate:
+        return [(wav_bytes, params.nframes / rate)]
+
+    samples = np.frombuffer(frames, dtype="<i2").reshape(-1, params.nchannels)
+    energy = np.abs(samples.astype(np.int32)).sum(axis=1)
+    window = max(int(0.02 * rate), 1)
+    target = max(int(segment_seconds * rate), 1)
+    # Search within the current segment only, so that every cut moves forward
+    search = min(int(search_seconds * rate), target // 2)
+    cuts = [0]
+    while params.nframes - cuts[-1] > 1.5 * target:
+        low = cuts[-1] + max(target - search, 1)
+        high = min(cuts[-1] + target + search, params.nframes)
+        if high - low < window:
+            cuts.append(cuts[-1] + target)
+            continue
+        loudness = np.convolve(energy[low:high], np.ones(window), mode="valid")
+        cuts.append(low + int(np.argmin(loudness)) + window // 2)
+    cuts.append(params.nframes)
+
+    pieces = []
+    for start, end in zip(cuts, cuts[1:]):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as piece:
+            piece.setparams(params)
+            piece.writeframes(samples[start:end].tobytes())
+        pieces.append((buf.getvalue(), (end - start) / rate))
+    return pieces
+
+
+class HLSPlaylist:
+    """HLS event playlist that grows by one MPEG-TS segment per rendered clip, so players start on the first one."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, "index.m3u8")
+        self.segments = []
+
+    async def append(self, clip_path, duration):
+        name = f"segment_{len(self.segments):03d}.ts"
+        command = ["ffmpeg", "-loglevel", "error", "-y", "-i", clip_path, "-c", "copy", "-f", "mpegts"]
+        process = await asyncio.create_subprocess_exec(*command, os.path.join(self.directory, name))
+        if await process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not remux {clip_path} into an HLS segment")
+        self.segments.append((name, duration or AUDIO_SEGMENT_SECONDS))
+        self._write(ended=False)
+
+    def close(self):
+        self._write(ended=True)
+
+    def _write(self, ended):
+        target_duration = math.ceil(max([1.5 * AUDIO_SEGMENT_SECONDS] + [duration for _, duration in self.segments]))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:EVENT"]
+        lines += [f"#EXT-X-TARGETDURATION:{target_duration}", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for number, (name, duration) in enumerate(self.segments):
+            # Every clip is a separately encoded video
+            if number:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        # Replace atomically, players poll the playlist while it grows
+        with open(f"{self.path}.tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+class StreamOutputs:
+    """Per-request directories under root for the clips rendered for a client.
+
+    Clients read the clips after their event was sent, so a finished request's directory is kept
+    until the finished ones exceed max_bytes; then the oldest are deleted. Directories of running
+    requests are never deleted. Leftovers of a previous run are indexed by age at startup.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.finished = OrderedDict()
+        self.size = 0
+        os.makedirs(root, exist_ok=True)
+        for name in sorted(os.listdir(root), key=lambda name: os.path.getmtime(os.path.join(root, name))):
+            self.release(name)
+
+    def directory(self, request_id):
+        path = os.path.join(self.root, request_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release(self, request_id):
+        """Mark a request as finished and delete the oldest finished requests beyond max_bytes."""
+        path = os.path.join(self.root, request_id)
+        if not os.path.isdir(path):
+            return
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+        self.finished[request_id] = size
+        self.size += size
+        while self.size > self.max_bytes and self.finished:
+            request_id, size = self.finished.popitem(last=False)
+            self.size -= size
+            shutil.rmtree(os.path.join(self.root, request_id), ignore_errors=True)
+
+
+def base64_json_body(field, data):
+    """JSON body {field: base64 of data}, encoded straight from bytes.
+
+    The ASR and animation services take audio as base64 in JSON; building the body from the base64
+    bytes skips the str decode, JSON escaping scan and re-encode copies of a multi-megabyte string.
+    """
+    return b'{"%s":"%s"}' % (field.encode("utf-8"), base64.b64encode(data))
+
+
+class ResponseCache:
+    """Rendered answers keyed by the normalized transcript and everything else that shapes the video.
+
+    The index is an in-memory LRU; the clips live on disk under cache_dir/<key>/ next to a manifest,
+    so the cache survives restarts. Least recently used answers are evicted once the clips exceed
+    max_bytes; their files are deleted evict_delay seconds later, as clients may still be reading
+    them. Disk I/O runs in worker threads, the index is only touched on the event loop.
+    """
+
+    def __init__(self, cache_dir, max_bytes, evict_delay=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.evict_delay = evict_delay
+        self.entries = OrderedDict()
+        self.size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        loaded = []
+        for key in os.listdir(cache_dir):
+            manifest = os.path.join(cache_dir, key, "manifest.json")
+            try:
+                with open(manifest) as f:
+                    loaded.append((os.path.getmtime(manifest), key, json.load(f)))
+            except (OSError, ValueError):
+                shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        for _, key, entry in sorted(loaded, key=lambda item: item[0]):
+            self._add(key, entry)
+        self._evict()
+
+    @staticmethod
+    def key(query, **settings):
+        """Cache key of a transcript; case, punctuation and spacing do not matter."""
+        normalized = unicodedata.normalize("NFKC", query).casefold()
+        normalized = " ".join(re.sub(r"[^\w\s]", " ", normalized).split())
+        blob = json.dumps({"query": normalized, **settings}, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key):
+        """Cached segments of an answer, or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            CACHE_MISSES.inc()
+            return None
+        self.entries.move_to_end(key)
+        CACHE_HITS.inc()
+        return entry["segments"]
+
+    async def put(self, key, segments):
+        """Copy the clips of a rendered answer into the cache; segments carry each clip's video_path."""
+        if not all(os.path.isfile(segment["video_path"]) for segment in segments):
+            print(f"Response cache: clips of {key} are not on this host, not caching")
+            return
+        entry = await asyncio.to_thread(self._store, key, segments)
+        if key in self.entries:
+            self.size -= self.entries.pop(key)["bytes"]
+        self._add(key, entry)
+        self._evict()
+
+    def _store(self, key, segments):
+        directory = os.path.join(self.cache_dir, key)
+        os.makedirs(directory, exist_ok=True)
+        cached = []
+        for index, segment in enumerate(segments):
+            path = os.path.join(directory, f"{index:03d}{os.path.splitext(segment['video_path'])[1]}")
+            shutil.copyfile(segment["video_path"], path)
+            cached.append({**segment, "video_path": path})
+        entry = {"segments": cached, "bytes": sum(os.path.getsize(segment["video_path"]) for segment in cached)}
+        manifest = os.path.join(directory, "manifest.json")
+        with open(f"{manifest}.tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(f"{manifest}.tmp", manifest)
+        return entry
+
+    def _add(self, key, entry):
+        self.entries[key] = entry
+        self.size += entry["bytes"]
+        CACHE_BYTES.set(self.size)
+
+    def _evict(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # At startup no client has the paths yet
+            loop = None
+        while self.size > self.max_bytes and self.entries:
+            key, entry = self.entries.popitem(last=False)
+            self.size -= entry["bytes"]
+            if loop is not None and self.evict_delay > 0:
+                loop.call_later(self.evict_delay, self._delete, key)
+            else:
+                self._delete(key)
+            CACHE_EVICTIONS.inc()
+        CACHE_BYTES.set(self.size)
+
+    def _delete(self, key):
+        # Unless the answer was cached again in the meantime
+        if key not in self.entries:
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+
+async def post_json(session, url, payload):
+    """POST a JSON payload, or a body already encoded as JSON bytes, and return the JSON response."""
+    if isinstance(payload, bytes):
+        request = session.post(url, data=payload, headers={"Content-Type": "application/json"})
+    else:
+        request = session.post(url, json=payload)
+    async with request as response:
+        response.raise_for_status()
+        return await response.json()
+
+
+async def stream_chat_completion(session, url, payload):
+    """Yield the content deltas of an OpenAI-compatible streaming chat completion."""
+    async with session.post(url, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
 def check_env_vars(env_var_list):
     for var in env_var_list:
         if os.getenv(var) is None:
@@ -61,7 +385,27 @@ class AvatarChatbotService:
         self.port = port
         ServiceOrchestrator.align_inputs = align_inputs
         self.megaservice = ServiceOrchestrator()
+        self.answer_megaservice = ServiceOrchestrator()
         self.endpoint = str(MegaServiceEndpoint.AVATAR_CHATBOT)
+        # One pool of animation worker slots shared by all requests
+        self.animation_workers = asyncio.Queue()
+        for endpoint in ANIMATION_SERVICE_ENDPOINTS * ANIMATION_CONCURRENCY:
+            self.animation_workers.put_nowait(f"{endpoint}/v1/animation")
+        # Renders still holding a worker, including those of cancelled requests
+        self.renders = set()
+        self.outputs = None
+        try:
+            self.outputs = StreamOutputs(STREAM_OUTPUT_DIR, STREAM_OUTPUT_MAX_MB * 1024 * 1024)
+        except OSError as e:
+            print(f"Streamed clips are not kept, {STREAM_OUTPUT_DIR} is not usable: {e}")
+        self.cache = None
+        if RESPONSE_CACHE_ENABLED:
+            try:
+                self.cache = ResponseCache(
+                    RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_MB * 1024 * 1024, RESPONSE_CACHE_EVICT_DELAY
+                )
+            except OSError as e:
+                print(f"Response cache disabled, {RESPONSE_CACHE_DIR} is not usable: {e}")
 
     def add_remote_service(self):
         asr = MicroService(
@@ -100,11 +444,217 @@ class AvatarChatbotService:
         self.megaservice.flow_to(asr, llm)
         self.megaservice.flow_to(llm, tts)
         self.megaservice.flow_to(tts, animation)
+        # With the response cache, ASR runs first on its own and only cache misses go through this flow;
+        # their animation runs on the shared animation workers, see handle_request
+        self.answer_megaservice.add(llm).add(tts)
+        self.answer_megaservice.flow_to(llm, tts)
 
-    async def handle_request(self, request: Request):
-        data = await request.json()
+    def cache_key(self, query, parameters, voice, stream):
+        settings = {
+            "voice": voice,
+            "avatar": AVATAR,
+            "model": LLM_MODEL_ID,
+            "max_tokens": parameters.max_tokens,
+            "top_k": parameters.top_k,
+            "top_p": parameters.top_p,
+            "temperature": parameters.temperature,
+            "repetition_penalty": parameters.repetition_penalty,
+            # Streamed answers are cached as segments, which depend on the segmentation
+            "segments": [MIN_SENTENCE_CHARS, AUDIO_SEGMENT_SECONDS] if stream else None,
+        }
+        return ResponseCache.key(query, **settings)
+
+    async def transcribe(self, session, asr_payload):
+        asr_url = f"http://{WHISPER_SERVER_HOST_IP}:{WHISPER_SERVER_PORT}/v1/asr"
+        return (await post_json(session, asr_url, asr_payload))["asr_result"]
+
+    def start_animation(self, worker, wav_bytes, clip_path):
+        """Task rendering wav_bytes on a worker taken from animation_workers, which gets it back at the end.
+
+        wav2lip always renders to its OUTFILE, so the clip is copied to clip_path before the worker is
+        free to render the next one over it. Once the POST has started, the render is shielded from the
+        task's cancellation: wav2lip keeps rendering a segment whose client went away, so the worker
+        only comes back with its response or after STREAM_TIMEOUT. A task cancelled before it ran gives
+        the worker back right away.
+        """
+        rendering = None
+
+        async def render():
+            try:
+                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=STREAM_TIMEOUT)) as session:
+                    animation_result = await post_json(session, worker, base64_json_body("byte_str", wav_bytes))
+                video_path = animation_result["video_path"]
+                if clip_path is not None and not task.cancelled() and os.path.isfile(video_path):
+                    await asyncio.to_thread(shutil.copyfile, video_path, clip_path)
+                    return clip_path
+                return video_path
+            finally:
+                self.animation_workers.put_nowait(worker)
+
+        async def animate():
+            nonlocal rendering
+            rendering = asyncio.create_task(render())
+            self.renders.add(rendering)
+            rendering.add_done_callback(forget)
+            return await asyncio.shield(rendering)
+
+        def forget(render_task):
+            self.renders.discard(render_task)
+            # Nobody awaits the render of a cancelled task, so its error is retrieved here
+            if not render_task.cancelled():
+                render_task.exception()
+
+        def release_unstarted(_):
+            if rendering is None:
+                self.animation_workers.put_nowait(worker)
 
-        chat_request = AudioChatCompletionRequest.model_validate(data)
+        task = asyncio.create_task(animate())
+        task.add_done_callback(release_unstarted)
+        return task
+
+    def clip_path(self, request_id, index):
+        if self.outputs is None:
+            return None
+        return os.path.join(self.outputs.directory(request_id), f"{index:03d}.mp4")
+
+    async def stream_avatar(self, asr_payload, parameters, voice):
+        """Animate the answer segment by segment and yield one SSE event per rendered clip, in order.
+
+        Every completed sentence of the streamed LLM output goes to TTS right away. Its audio is cut
+        into segments of about AUDIO_SEGMENT_SECONDS, which are animated concurrently on all
+        animation workers, so the first clip is ready after about one segment instead of after the
+        whole answer has been generated, spoken and rendered. With ffmpeg available the clips are
+        also appended to an HLS playlist as they finish.
+        """
+        llm_url = f"http://{LLM_SERVER_HOST_IP}:{LLM_SERVER_PORT}/v1/chat/completions"
+        tts_url = f"http://{SPEECHT5_SERVER_HOST_IP}:{SPEECHT5_SERVER_PORT}/v1/tts"
+        tts_slots = asyncio.Semaphore(TTS_CONCURRENCY)
+        spoken = asyncio.Queue()
+        clips = asyncio.Queue()
+        tasks = []
+        request_id = uuid.uuid4().hex[:8]
+
+        async def speak(sentence):
+            async with tts_slots:
+                tts_result = await post_json(session, tts_url, {"text": sentence, "voice": voice})
+            return await asyncio.to_thread(split_wav, base64.b64decode(tts_result["tts_result"]))
+
+        async def produce(query):
+            segmenter = SentenceSegmenter()
+
+            async def enqueue(sentences):
+                for sentence in sentences:
+                    tasks.append(asyncio.create_task(speak(sentence)))
+                    await spoken.put((sentence, tasks[-1]))
+
+            try:
+                payload = {
+                    "model": "tgi",
+                    "messages": [{"role": "user", "content": query}],
+                    "max_tokens": parameters.max_tokens,
+                    "top_p": parameters.top_p,
+                    "temperature": parameters.temperature,
+                    "stream": True,
+                }
+                async for delta in stream_chat_completion(session, llm_url, payload):
+                    await enqueue(segmenter.feed(delta))
+                await enqueue(segmenter.flush())
+            finally:
+                await spoken.put(None)
+
+        async def dispatch():
+            # Segments take the animation workers in answer order, whichever audio arrives first
+            try:
+                index = 0
+                while (item := await spoken.get()) is not None:
+                    sentence, speech = item
+                    for wav_bytes, duration in await speech:
+                        clip_path = self.clip_path(request_id, index)
+                        worker = await self.animation_workers.get()
+                        tasks.append(self.start_animation(worker, wav_bytes, clip_path))
+                        await clips.put((sentence, duration, tasks[-1]))
+                        index += 1
+            finally:
+                await clips.put(None)
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=STREAM_TIMEOUT)) as session:
+            query = await self.transcribe(session, asr_payload)
+            cache_key = self.cache_key(query, parameters, voice, stream=True) if self.cache else None
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached is not None:
+                for event in cached:
+                    yield f"data: {json.dumps({**event, 'cached': True})}\n\n"
+                yield "data: [DONE]\n\n"
+                return
+
+            producer = asyncio.create_task(produce(query))
+            dispatcher = asyncio.create_task(dispatch())
+            playlist = None
+            events = []
+            try:
+                index = 0
+                while (item := await clips.get()) is not None:
+                    sentence, duration, clip = item
+                    event = {"segment": index, "text": sentence, "duration": duration, "video_path": await clip}
+                    if HLS_ENABLED and self.outputs is not None and os.path.isfile(event["video_path"]):
+                        if playlist is None:
+                            playlist = HLSPlaylist(os.path.join(self.outputs.directory(request_id), "hls"))
+                        await playlist.append(event["video_path"], duration)
+                        event["playlist"] = playlist.path
+                    events.append(event)
+                    yield f"data: {json.dumps(event)}\n\n"
+                    index += 1
+                await producer
+                await dispatcher
+                if playlist is not None:
+                    playlist.close()
+                if self.cache is not None and events:
+                    await self.cache.put(cache_key, [{k: v for k, v in e.items() if k != "playlist"} for e in events])
+                yield "data: [DONE]\n\n"
+            finally:
+                for task in [producer, dispatcher, *tasks]:
+                    task.cancel()
+                if self.outputs is not None:
+                    self.outputs.release(request_id)
+
+    async def answer_cached(self, asr_payload, parameters, voice):
+        """Video of the answer from the response cache, or rendered and cached on a miss."""
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=STREAM_TIMEOUT)) as session:
+            query = await self.transcribe(session, asr_payload)
+            cache_key = self.cache_key(query, parameters, voice, stream=False)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached[0]["video_path"]
+            result_dict, runtime_graph = await self.answer_megaservice.schedule(
+                initial_inputs={"asr_result": query},
+                llm_parameters=parameters,
+                voice=voice,
+            )
+            tts_result = result_dict[runtime_graph.all_leaves()[-1]]["tts_result"]
+            # Rendered on a shared worker and copied out of its OUTFILE before another request can
+            # overwrite it, so that the cache stores this answer's video
+            request_id = uuid.uuid4().hex[:8]
+            clip_path = self.clip_path(request_id, 0)
+            worker = await self.animation_workers.get()
+            try:
+                response = await self.start_animation(worker, base64.b64decode(tts_result), clip_path)
+            finally:
+                if self.outputs is not None:
+                    self.outputs.release(request_id)
+        if response == clip_path:
+            await self.cache.put(cache_key, [{"video_path": response}])
+        return response
+
+    async def handle_request(self, request: Request):
+        if request.headers.get("content-type", "").startswith(("audio/", "application/octet-stream")):
+            # Binary upload: the WAV is the body and the other request fields are query parameters
+            wav_bytes = await request.body()
+            chat_request = AudioChatCompletionRequest.model_validate({**request.query_params, "audio": ""})
+            asr_payload = base64_json_body("audio", wav_bytes)
+        else:
+            data = await request.json()
+            chat_request = AudioChatCompletionRequest.model_validate(data)
+            asr_payload = {"audio": chat_request.audio}
         parameters = LLMParams(
             # relatively lower max_tokens for audio conversation
             max_tokens=chat_request.max_tokens if chat_request.max_tokens else 128,
@@ -112,14 +662,25 @@ class AvatarChatbotService:
             top_p=chat_request.top_p if chat_request.top_p else 0.95,
             temperature=chat_request.temperature if chat_request.temperature else 0.01,
             repetition_penalty=chat_request.presence_penalty if chat_request.presence_penalty else 1.03,
-            stream=False,  # TODO add stream LLM output as input to TTS
+            stream=False,  # streaming requests bypass the orchestrator, see stream_avatar
         )
         # print(parameters)
+        voice = chat_request.voice if hasattr(chat_request, "voice") else "default"
+
+        if getattr(chat_request, "stream", False):
+            return StreamingResponse(
+                self.stream_avatar(asr_payload, parameters, voice), media_type="text/event-stream"
+            )
+
+        if self.cache is not None:
+            return await self.answer_cached(asr_payload, parameters, voice)
 
+        if isinstance(asr_payload, bytes):
+            asr_payload = {"audio": base64.b64encode(wav_bytes).decode("utf-8")}
         result_dict, runtime_graph = await self.megaservice.schedule(
-            initial_inputs={"audio": chat_request.audio},
+            initial_inputs=asr_payload,
             llm_parameters=parameters,
-            voice=chat_request.voice if hasattr(chat_request, "voice") else "default",
+            voice=voice,
         )
 
         last_node = runtime_graph.all_leaves()[-1]
@@ -102,6 +102,23 @@ function validate_megaservice() {
 }
 
 
+function validate_repeated_question() {
+    cd $WORKPATH
+    # The same question again is answered from the response cache, with a video of its own
+    # rather than wav2lip's OUTFILE, which the UI would otherwise show for the previous answer
+    result=$(http_proxy="" curl http://${ip_address}:3009/v1/avatarchatbot -X POST -d @assets/audio/sample_whoareyou.json -H 'Content-Type: application/json')
+    echo "repeated result is === $result"
+    video_path=$(echo $result | tr -d '"')
+    if [[ $video_path == "/outputs/avatar_cache/"*".mp4" ]] && [[ -s docker_compose/amd/gpu/rocm/${video_path#/outputs/} ]]; then
+        echo "Repeated result correct."
+    else
+        docker logs avatarchatbot-backend-server > $LOG_PATH/avatarchatbot-backend-server.log
+        echo "Repeated result wrong."
+        exit 1
+    fi
+}
+
+
 function stop_docker() {
     cd $WORKPATH/docker_compose/amd/gpu/rocm
     docker compose down && docker compose rm -f
@@ -124,6 +141,7 @@ function main() {
 
     echo "::group::validate_megaservice"
     validate_megaservice
+    validate_repeated_question
     echo "::endgroup::"
 
     echo "::group::stop_docker"
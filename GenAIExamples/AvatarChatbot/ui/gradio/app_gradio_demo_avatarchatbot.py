@@ -4,6 +4,7 @@
 import asyncio
 import base64
 import io
+import json
 import os
 import shutil
 import subprocess
@@ -17,6 +18,9 @@ import numpy as np
 import soundfile as sf
 from PIL import Image
 
+# Host directory mounted as /outputs into wav2lip-service and the backend: the ${PWD} docker compose was started in
+OUTPUTS_DIR = os.getenv("AVATAR_OUTPUTS_DIR", "docker_compose/amd/gpu/rocm")
+
 
 # %% Docker Management
 def update_env_var_in_container(container_name, env_var, new_value):
@@ -25,7 +29,8 @@ def update_env_var_in_container(container_name, env_var, new_value):
 
 # %% AudioQnA functions
 def preprocess_audio(audio):
-    """The audio data is a 16-bit integer array with values ranging from -32768 to 32767 and the shape of the audio data array is (samples,)"""
+    """The audio data is a 16-bit integer array with values ranging from -32768 to 32767 and the shape of the audio data array is (samples,)
+    Returns the WAV file bytes, which are uploaded as is (no base64 JSON)"""
     sr, y = audio
 
     # Convert to normalized float32 audio
@@ -35,12 +40,7 @@ def preprocess_audio(audio):
     # Save to memory
     buf = io.BytesIO()
     sf.write(buf, y, sr, format="WAV")
-    buf.seek(0)  # Reset the buffer position to the beginning
-
-    # Encode the WAV file to base64 string
-    base64_bytes = base64.b64encode(buf.read())
-    base64_string = base64_bytes.decode("utf-8")
-    return base64_string
+    return buf.getvalue()
 
 
 def base64_to_int16(base64_string):
@@ -55,16 +55,18 @@ async def transcribe(audio_input, face_input, model_choice):
     global ai_chatbot_url, chat_history, count
     chat_history = ""
     # Preprocess the audio
-    base64bytestr = preprocess_audio(audio_input)
+    wav_bytes = preprocess_audio(audio_input)
 
-    # Send the audio to the AvatarChatbot backend server endpoint
-    initial_inputs = {"audio": base64bytestr, "max_tokens": 64}
+    # Send the audio to the AvatarChatbot backend server endpoint as the request body, parameters in the query
+    params = {"max_tokens": 64}
 
     # TO-DO: update wav2lip-service with the chosen face_input
     # update_env_var_in_container("wav2lip-service", "DEVICE", "new_device_value")
 
     async with aiohttp.ClientSession() as session:
-        async with session.post(ai_chatbot_url, json=initial_inputs) as response:
+        async with session.post(
+            ai_chatbot_url, data=wav_bytes, params=params, headers={"Content-Type": "audio/wav"}
+        ) as response:
 
             # Check the response status code
             if response.status == 200:
@@ -82,11 +84,27 @@ async def transcribe(audio_input, face_input, model_choice):
                 # return (sampling_rate, audio_int16)  # handle the response
 
                 result = await response.text()
-                return "docker_compose/intel/hpu/gaudi/result.mp4"
+                return host_video_path(result)
             else:
                 return {"error": "Failed to transcribe audio", "status_code": response.status_code}
 
 
+def host_video_path(result):
+    """Path on this host of the video the backend returned
+
+    The backend answers with the path of this request's video inside the /outputs mount (a cached
+    answer or its own copy of the render), not the wav2lip OUTFILE, which a later request overwrites.
+    """
+    try:
+        video_path = json.loads(result)
+    except json.JSONDecodeError:
+        video_path = result.strip()
+    relative = os.path.relpath(video_path, "/outputs")
+    if relative.startswith(os.pardir):
+        return video_path
+    return os.path.join(OUTPUTS_DIR, relative)
+
+
 def resize_image(image_pil, size=(720, 720)):
     """Resize the image to the specified size."""
     return image_pil.resize(size, Image.LANCZOS)
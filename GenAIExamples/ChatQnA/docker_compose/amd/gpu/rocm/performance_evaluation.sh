@@ -37,6 +37,9 @@ print_section() {
 }
 
 # Configuration
+BASEDIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/../../../../../.." && pwd)"
+PERF_EVAL="$BASEDIR/GenAIEval/evals/benchmarks/performance_evaluation.py"
+RESULT_STORE="$BASEDIR/GenAIEval/evals/benchmarks/result_store.py"
 BACKEND_URL="http://localhost:8890/v1/chatqna"
 DATAPREP_URL="http://localhost:18104/v1/dataprep/ingest"
 RESULTS_DIR="./performance_results"
@@ -89,73 +92,12 @@ measure_latency() {
     print_section "Latency Measurement"
     
     local num_requests=${1:-10}
-    local results_file="$RESULTS_DIR/latency_${TIMESTAMP}.txt"
     
-    print_status "Measuring latency for $num_requests requests..."
+    # Sequential requests timed with a monotonic clock, see performance_evaluation.py
+    python3 "$PERF_EVAL" --url "${BACKEND_URL%/v1/chatqna}" --results-dir "$RESULTS_DIR" --timestamp "$TIMESTAMP" \
+        latency --requests "$num_requests"
     
-    # Test questions for latency measurement
-    questions=(
-        "What is machine learning?"
-        "Explain artificial intelligence"
-        "How does deep learning work?"
-        "What are neural networks?"
-        "Explain natural language processing"
-    )
-    
-    echo "Latency Test Results - $(date)" > "$results_file"
-    echo "=================================" >> "$results_file"
-    
-    total_time=0
-    times=()
-    
-    for i in $(seq 1 $num_requests); do
-        # Select a random question
-        question="${questions[$((RANDOM % ${#questions[@]}))]}"
-        
-        start_time=$(date +%s.%N)
-        response=$(curl -s "$BACKEND_URL" \
-            -H "Content-Type: application/json" \
-            -d "{\"messages\": \"$question\"}" \
-            -w "%{http_code}")
-        end_time=$(date +%s.%N)
-        
-        latency=$(echo "$end_time - $start_time" | bc -l)
-        times+=($latency)
-        total_time=$(echo "$total_time + $latency" | bc -l)
-        
-        echo "Request $i: ${latency}s (HTTP: ${response: -3})" | tee -a "$results_file"
-    done
-    
-    # Calculate statistics
-    avg_time=$(echo "scale=3; $total_time / $num_requests" | bc -l)
-    
-    # Sort times for median calculation
-    IFS=$'\n' sorted_times=($(sort -n <<<"${times[*]}"))
-    unset IFS
-    
-    if [ $((${#times[@]} % 2)) -eq 0 ]; then
-        # Even number of elements
-        mid1=$(((${#times[@]} / 2) - 1))
-        mid2=$((${#times[@]} / 2))
-        median=$(echo "scale=3; (${sorted_times[$mid1]} + ${sorted_times[$mid2]}) / 2" | bc -l)
-    else
-        # Odd number of elements
-        mid=$(((${#times[@]} - 1) / 2))
-        median=${sorted_times[$mid]}
-    fi
-    
-    # Find min and max
-    min_time=${sorted_times[0]}
-    max_time=${sorted_times[-1]}
-    
-    echo "" | tee -a "$results_file"
-    echo "Latency Statistics:" | tee -a "$results_file"
-    echo "  Average: ${avg_time}s" | tee -a "$results_file"
-    echo "  Median:  ${median}s" | tee -a "$results_file"
-    echo "  Min:     ${min_time}s" | tee -a "$results_file"
-    echo "  Max:     ${max_time}s" | tee -a "$results_file"
-    
-    print_status "Latency measurement completed. Results saved to $results_file"
+    print_status "Latency measurement completed. Results saved to $RESULTS_DIR/latency_${TIMESTAMP}.txt"
 }
 
 # Function to measure throughput
@@ -164,81 +106,12 @@ measure_throughput() {
     
     local duration=${1:-60}  # Duration in seconds
     local concurrency=${2:-5}  # Number of concurrent requests
-    local results_file="$RESULTS_DIR/throughput_${TIMESTAMP}.txt"
-    
-    print_status "Measuring throughput for ${duration}s with ${concurrency} concurrent requests..."
     
-    # Test questions for throughput measurement
-    questions=(
-        "What is AI?"
-        "Explain ML"
-        "What is NLP?"
-        "How does DL work?"
-        "What are neural networks?"
-    )
+    # Closed loop keeping $concurrency requests in flight for $duration seconds
+    python3 "$PERF_EVAL" --url "${BACKEND_URL%/v1/chatqna}" --results-dir "$RESULTS_DIR" --timestamp "$TIMESTAMP" \
+        throughput --duration "$duration" --concurrency "$concurrency"
     
-    echo "Throughput Test Results - $(date)" > "$results_file"
-    echo "===================================" >> "$results_file"
-    echo "Duration: ${duration}s" >> "$results_file"
-    echo "Concurrency: ${concurrency}" >> "$results_file"
-    echo "" >> "$results_file"
-    
-    # Start time
-    start_time=$(date +%s)
-    end_time=$((start_time + duration))
-    
-    # Counter for successful requests
-    successful_requests=0
-    failed_requests=0
-    
-    # Run concurrent requests
-    while [ $(date +%s) -lt $end_time ]; do
-        # Start concurrent requests
-        for i in $(seq 1 $concurrency); do
-            question="${questions[$((RANDOM % ${#questions[@]}))]}"
-            
-            # Make request in background
-            (
-                if curl -s "$BACKEND_URL" \
-                    -H "Content-Type: application/json" \
-                    -d "{\"messages\": \"$question\"}" > /dev/null 2>&1; then
-                    echo "success" >> /tmp/throughput_success_$$.tmp
-                else
-                    echo "failed" >> /tmp/throughput_failed_$$.tmp
-                fi
-            ) &
-        done
-        
-        # Wait for all background processes
-        wait
-        
-        # Count results
-        if [ -f /tmp/throughput_success_$$.tmp ]; then
-            successful_requests=$((successful_requests + $(wc -l < /tmp/throughput_success_$$.tmp)))
-            rm /tmp/throughput_success_$$.tmp
-        fi
-        
-        if [ -f /tmp/throughput_failed_$$.tmp ]; then
-            failed_requests=$((failed_requests + $(wc -l < /tmp/throughput_failed_$$.tmp)))
-            rm /tmp/throughput_failed_$$.tmp
-        fi
-        
-        # Small delay to prevent overwhelming
-        sleep 0.1
-    done
-    
-    # Calculate throughput
-    actual_duration=$((end_time - start_time))
-    requests_per_second=$(echo "scale=2; $successful_requests / $actual_duration" | bc -l)
-    
-    echo "Test Results:" | tee -a "$results_file"
-    echo "  Duration: ${actual_duration}s" | tee -a "$results_file"
-    echo "  Successful Requests: $successful_requests" | tee -a "$results_file"
-    echo "  Failed Requests: $failed_requests" | tee -a "$results_file"
-    echo "  Throughput: ${requests_per_second} requests/second" | tee -a "$results_file"
-    echo "  Success Rate: $(echo "scale=2; $successful_requests * 100 / ($successful_requests + $failed_requests)" | bc -l)%" | tee -a "$results_file"
-    
-    print_status "Throughput measurement completed. Results saved to $results_file"
+    print_status "Throughput measurement completed. Results saved to $RESULTS_DIR/throughput_${TIMESTAMP}.txt"
 }
 
 # Function to monitor system resources
@@ -350,7 +223,16 @@ generate_summary() {
         echo "Resource monitoring data available in: $latest_resources" >> "$summary_file"
         echo "" >> "$summary_file"
     fi
-    
+
+    if [ -f "$RESULTS_DIR/results.db" ]; then
+        echo "## All Runs" >> "$summary_file"
+        echo "Per-request results of every run are stored in: $RESULTS_DIR/results.db" >> "$summary_file"
+        echo '```' >> "$summary_file"
+        python3 "$RESULT_STORE" --db "$RESULTS_DIR/results.db" runs --limit 20 >> "$summary_file"
+        echo '```' >> "$summary_file"
+        echo "" >> "$summary_file"
+    fi
+
     echo "## System Information" >> "$summary_file"
     echo "- **Docker Version:** $(docker --version)" >> "$summary_file"
     echo "- **OS:** $(uname -a)" >> "$summary_file"
@@ -461,11 +461,15 @@ run_comparison_eval() {
     # Create results directory
     mkdir -p $EVAL_RESULTS_DIR
     
+    # Both backends serve the same model; count their tokens with its tokenizer
+    local tokenizer_model="${CHATQNA_LLM_MODEL_ID:-Qwen/Qwen2.5-7B-Instruct-1M}"
+    
     # Run evaluations for each service
     if [ "$TGI_RUNNING" = "yes" ]; then
         print_status "Running TGI evaluation..."
         python evals/benchmark/chatqna_simple_eval.py \
             --service-url http://localhost:8889 \
+            --tokenizer-model "$tokenizer_model" \
             --output $EVAL_RESULTS_DIR/chatqna_tgi_comparison.json
         print_status "TGI evaluation completed!"
     fi
@@ -474,6 +478,7 @@ run_comparison_eval() {
         print_status "Running vLLM evaluation..."
         python evals/benchmark/chatqna_simple_eval.py \
             --service-url http://localhost:8890 \
+            --tokenizer-model "$tokenizer_model" \
             --output $EVAL_RESULTS_DIR/chatqna_vllm_comparison.json
         print_status "vLLM evaluation completed!"
     fi
@@ -505,6 +510,12 @@ try:
         rt_stats = summary.get('response_time_stats', {})
         if rt_stats:
             print(f'  ⏱️  Mean Response Time: {rt_stats.get(\"mean\", \"N/A\"):.2f}s')
+        tokens = summary.get('token_stats', {})
+        if tokens:
+            print(f'  🔤 Output Tokens/s: {tokens[\"output_tokens_per_second\"][\"mean\"]:.1f} per request, '
+                  f'{tokens[\"aggregate_output_tokens_per_second\"]:.1f} aggregate ({tokens[\"token_source\"]})')
+            if tokens.get('goodput'):
+                print(f'  🎯 Goodput: {tokens[\"goodput\"][\"fraction\"] * 100:.1f}% within SLOs')
 except Exception as e:
     print('  ❌ Error reading TGI results')
 "
@@ -523,10 +534,23 @@ try:
         rt_stats = summary.get('response_time_stats', {})
         if rt_stats:
             print(f'  ⏱️  Mean Response Time: {rt_stats.get(\"mean\", \"N/A\"):.2f}s')
+        tokens = summary.get('token_stats', {})
+        if tokens:
+            print(f'  🔤 Output Tokens/s: {tokens[\"output_tokens_per_second\"][\"mean\"]:.1f} per request, '
+                  f'{tokens[\"aggregate_output_tokens_per_second\"]:.1f} aggregate ({tokens[\"token_source\"]})')
+            if tokens.get('goodput'):
+                print(f'  🎯 Goodput: {tokens[\"goodput\"][\"fraction\"] * 100:.1f}% within SLOs')
 except Exception as e:
     print('  ❌ Error reading vLLM results')
 "
         
+        echo ""
+        # Statistical comparison of the distributions, vLLM against TGI as the baseline
+        print_status "vLLM vs TGI (Mann-Whitney, bootstrap 95% CI):"
+        python3 "$GENAIEVAL_DIR/evals/benchmarks/regression_gate.py" --report-only \
+            --baseline "$EVAL_RESULTS_DIR/chatqna_tgi_comparison.json" \
+            --candidate "$EVAL_RESULTS_DIR/chatqna_vllm_comparison.json"
+        
         echo ""
         print_status "Full results:"
         print_status "  TGI: $EVAL_RESULTS_DIR/chatqna_tgi_comparison.json"
@@ -660,12 +684,100 @@ run_vllm_benchmark() {
     show_vllm_benchmark_results
 }
 
+# Function to find the max sustainable vLLM concurrency with an adaptive sweep
+run_vllm_sweep() {
+    print_header "Running vLLM Concurrency Sweep"
+    
+    # Check if vLLM services are running
+    if ! docker ps | grep -q "chatqna-vllm-service"; then
+        print_error "vLLM services are not running. Please start them first with: $0 start-vllm"
+        exit 1
+    fi
+    
+    local results_dir="$EVAL_RESULTS_DIR/vllm_sweep_results"
+    mkdir -p $results_dir
+    
+    # Concurrency doubles every step until throughput plateaus or p99 TTFT breaches the SLO
+    print_status "Sweeping concurrency ${SWEEP_START_USERS:-1} to ${SWEEP_MAX_USERS:-256}, p99 TTFT SLO ${SWEEP_TTFT_SLO:-0} ms (0 = none)..."
+    cd $GENAIEVAL_DIR/evals/benchmarks/stresscli/locust
+    locust -f aistress.py,sweep_load_shape.py --headless \
+        -H http://localhost:${CHATQNA_BACKEND_SERVICE_PORT:-8890} \
+        --bench-target chatqnafixed \
+        --llm-model "${CHATQNA_LLM_MODEL_ID:-Qwen/Qwen2.5-7B-Instruct-1M}" \
+        --max-output 512 \
+        --sweep-start-users ${SWEEP_START_USERS:-1} \
+        --sweep-max-users ${SWEEP_MAX_USERS:-256} \
+        --sweep-step-time ${SWEEP_STEP_TIME:-60} \
+        --sweep-ttft-slo ${SWEEP_TTFT_SLO:-0} \
+        --sweep-output $results_dir/sweep.json
+    
+    print_status "vLLM concurrency sweep completed!"
+    print_status "Throughput/latency curve and knee point saved to: $results_dir/sweep.json"
+}
+
+# Function to break vLLM latency down by pipeline stage
+run_vllm_stages() {
+    print_header "Running vLLM Stage Breakdown"
+    
+    # Check if vLLM services are running
+    if ! docker ps | grep -q "chatqna-vllm-service"; then
+        print_error "vLLM services are not running. Please start them first with: $0 start-vllm"
+        exit 1
+    fi
+    
+    local results_dir="$EVAL_RESULTS_DIR/vllm_stage_results"
+    mkdir -p $results_dir
+    
+    # TEI embedding, retriever, TEI reranking and vLLM are called directly on their ports
+    print_status "Benchmarking every stage at concurrency ${STAGE_CONCURRENCY:-1 2 4 8 16}..."
+    python3 "$GENAIEVAL_DIR/evals/benchmarks/stage_breakdown.py" \
+        --service-url http://localhost:${CHATQNA_BACKEND_SERVICE_PORT:-8890} \
+        --llm-model "${CHATQNA_LLM_MODEL_ID:-Qwen/Qwen2.5-7B-Instruct-1M}" \
+        --concurrency ${STAGE_CONCURRENCY:-1 2 4 8 16} \
+        --requests-per-level ${STAGE_REQUESTS:-20} \
+        --output $results_dir/stage_breakdown.json
+    
+    print_status "vLLM stage breakdown completed!"
+    print_status "Per-stage latency, attribution and saturation saved to: $results_dir/stage_breakdown.json"
+}
+
+# Function to gate a run on performance regressions against a baseline
+run_regression_gate() {
+    print_header "Running Performance Regression Gate"
+    
+    local baseline=$1
+    shift || true
+    if [ -z "$baseline" ] || [ $# -eq 0 ]; then
+        print_error "Usage: $0 regression-gate BASELINE CANDIDATE... (run id, label=NAME or JSON report)"
+        exit 2
+    fi
+    
+    # Run ids and labels refer to the result store the evaluators append to with --results-db
+    local results_db="${OPEA_EVAL_RESULTS_DB:-$EVAL_RESULTS_DIR/results.db}"
+    mkdir -p $EVAL_RESULTS_DIR
+    local status=0
+    python3 "$GENAIEVAL_DIR/evals/benchmarks/regression_gate.py" --db "$results_db" \
+        --baseline "$baseline" --candidate "$@" \
+        --tolerance ${GATE_TOLERANCE:-0.05} --alpha ${GATE_ALPHA:-0.05} \
+        --output $EVAL_RESULTS_DIR/regression_gate.json || status=$?
+    
+    if [ $status -eq 0 ]; then
+        print_status "Performance gate passed"
+    elif [ $status -eq 1 ]; then
+        print_error "Performance gate failed: significant regression against $baseline"
+    else
+        print_error "Performance gate could not compare the runs"
+    fi
+    print_status "Comparison saved to: $EVAL_RESULTS_DIR/regression_gate.json"
+    exit $status
+}
+
 # Function to create TGI benchmark configuration
 create_tgi_benchmark_config() {
     cd $GENAIEVAL_DIR/evals/benchmark/
     
-    # Create the benchmark configuration file
-    cat > benchmark_tgi.yaml << 'EOF'
+    # Create the benchmark configuration file for the deployed model
+    cat > benchmark_tgi.yaml << EOF
 test_suite_config:
   namespace: "default"
   examples: ["chatqna"]
@@ -675,7 +787,7 @@ test_suite_config:
   test_output_dir: "/root/evaluation_results/tgi_benchmark_results"
   run_time: null
   collect_service_metric: true
-  llm_model: "Qwen/Qwen2.5-14B-Instruct"
+  llm_model: "${CHATQNA_LLM_MODEL_ID:-Qwen/Qwen2.5-7B-Instruct-1M}"
   deployment_type: "docker"
   service_ip: "localhost"
   service_port: 8889
@@ -709,8 +821,8 @@ EOF
 create_vllm_benchmark_config() {
     cd $GENAIEVAL_DIR/evals/benchmark/
     
-    # Create the benchmark configuration file
-    cat > benchmark_vllm.yaml << 'EOF'
+    # Create the benchmark configuration file for the deployed model
+    cat > benchmark_vllm.yaml << EOF
 test_suite_config:
   namespace: "default"
   examples: ["chatqna"]
@@ -720,7 +832,7 @@ test_suite_config:
   test_output_dir: "/root/evaluation_results/vllm_benchmark_results"
   run_time: null
   collect_service_metric: true
-  llm_model: "Qwen/Qwen2.5-14B-Instruct"
+  llm_model: "${CHATQNA_LLM_MODEL_ID:-Qwen/Qwen2.5-7B-Instruct-1M}"
   deployment_type: "docker"
   service_ip: "localhost"
   service_port: 8890
@@ -909,6 +1021,9 @@ show_help() {
     echo "  16) compare-eval   - Compare TGI vs vLLM performance"
     echo "  17) tgi-benchmark  - Comprehensive TGI benchmark (Locust load testing)"
     echo "  18) vllm-benchmark - Comprehensive vLLM benchmark (Locust load testing)"
+    echo "      vllm-sweep     - vLLM concurrency sweep to the saturation knee (SWEEP_TTFT_SLO=ms)"
+    echo "      vllm-stages    - vLLM latency per pipeline stage and the first stage to saturate"
+    echo "      regression-gate BASELINE CANDIDATE... - Fail on a significant performance regression"
     echo ""
     echo "Logs and Status:"
     echo "  17) logs-tgi       - Show TGI service logs"
@@ -927,6 +1042,9 @@ show_help() {
     echo "  $0 compare-eval    # Compare TGI vs vLLM"
     echo "  $0 tgi-benchmark   # Run comprehensive TGI benchmark"
     echo "  $0 vllm-benchmark  # Run comprehensive vLLM benchmark"
+    echo "  SWEEP_TTFT_SLO=2000 $0 vllm-sweep  # Find max vLLM concurrency within a 2s p99 TTFT"
+    echo "  STAGE_CONCURRENCY=\"1 4 16\" $0 vllm-stages  # Which of TEI, retriever, reranker, vLLM saturates first"
+    echo "  $0 regression-gate label=vllm-old label=vllm-new  # Gate a TAG upgrade on the stored runs"
     echo "  $0 menu            # Interactive menu"
 }
 
@@ -1046,6 +1164,9 @@ main() {
         "compare-eval") run_comparison_eval ;;
         "tgi-benchmark") run_tgi_benchmark ;;
         "vllm-benchmark") run_vllm_benchmark ;;
+        "vllm-sweep") run_vllm_sweep ;;
+        "vllm-stages") run_vllm_stages ;;
+        "regression-gate") shift; run_regression_gate "$@" ;;
         
         # Logs and Status
         "logs-tgi") show_tgi_logs ;;